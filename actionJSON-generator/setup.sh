@@ -45,7 +45,7 @@ echo ""
 
 # Install Fluxa in editable mode
 echo "Installing Fluxa..."
-pip install -e .
+pip install -e ".[executor]"
 echo "✓ Fluxa installed"
 echo ""
 
@@ -5,13 +5,16 @@ Fluxa CLI - Convert tutorials to Photoshop API JSON
 import os
 import sys
 import json
+import time
 from pathlib import Path
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import click
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.panel import Panel
 from rich.syntax import Syntax
+from rich.table import Table
 from rich import print as rprint
 from dotenv import load_dotenv
 
@@ -19,6 +22,7 @@ from .extractors.factory import ExtractorFactory
 from .generators.photoshop_action_generator import PhotoshopActionGenerator
 from .utils.formatter import format_output, add_metadata
 from .utils.validator import validate_json
+from .utils.optimizer import optimize_actions, format_report
 
 
 # Load environment variables
@@ -26,6 +30,9 @@ load_dotenv()
 
 console = Console()
 
+# Directory holding the executors (actions.py), for "fluxa run"
+EXECUTOR_DIR = os.getenv('FLUXA_EXECUTOR_DIR', str(Path(__file__).resolve().parents[3]))
+
 
 def load_config() -> dict:
     """Load configuration from config file"""
@@ -41,7 +48,284 @@ def load_config() -> dict:
         }
 
 
-@click.command()
+class DefaultCommandGroup(click.Group):
+    """
+    Command group that falls back to a default subcommand.
+    
+    ``fluxa URL ...`` keeps working as ``fluxa generate URL ...`` while
+    other subcommands (``fluxa run``) sit next to it.
+    """
+    
+    def __init__(self, *args, default_command: str = 'generate', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+    
+    def parse_args(self, ctx: click.Context, args: List[str]) -> List[str]:
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args.insert(0, self.default_command)
+        return super().parse_args(ctx, args)
+
+
+def print_banner() -> None:
+    """Display welcome banner"""
+    console.print(Panel.fit(
+        "[bold cyan]Fluxa AI Tool[/bold cyan]\n"
+        "Tutorial → Photoshop API JSON",
+        border_style="cyan"
+    ))
+
+
+def require_api_key(api_key: Optional[str]) -> None:
+    """Exit with a hint if no OpenAI API key is configured"""
+    if not api_key:
+        console.print("[red]Error:[/red] OpenAI API key not found.", style="bold")
+        console.print("Set the OPENAI_API_KEY environment variable or use --api-key option.")
+        console.print("\nExample: export OPENAI_API_KEY='your-key-here'")
+        sys.exit(1)
+
+
+def make_generator(config: dict, api_key: str, model: Optional[str]) -> PhotoshopActionGenerator:
+    """Create the action generator, using the configured model by default"""
+    return PhotoshopActionGenerator(
+        api_key=api_key,
+        model=model or config['openai']['model'],
+        temperature=config['openai']['temperature'],
+        max_tokens=config['openai']['max_tokens'],
+        timeout=config['openai']['timeout']
+    )
+
+
+def extract_content(url: str, config: dict, verbose: bool) -> dict:
+    """Step 1: Extract tutorial content (exits on failure)"""
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console
+    ) as progress:
+        task = progress.add_task("[cyan]Extracting tutorial content...", total=None)
+        
+        try:
+            extracted = ExtractorFactory.extract(url, config['extraction'])
+            progress.update(task, completed=True)
+            console.print("[green]✓[/green] Content extracted successfully")
+            
+            if verbose:
+                console.print(f"\n[dim]Source:[/dim] {extracted['source']}")
+                console.print(f"[dim]Type:[/dim] {extracted['type']}")
+                if 'title' in extracted:
+                    console.print(f"[dim]Title:[/dim] {extracted['title']}")
+                console.print(f"[dim]Content length:[/dim] {len(extracted['content'])} characters\n")
+            
+            return extracted
+        except Exception as e:
+            progress.update(task, completed=True)
+            console.print(f"[red]✗[/red] Extraction failed: {str(e)}")
+            sys.exit(1)
+
+
+def generate_actions(generator: PhotoshopActionGenerator, extracted: dict, verbose: bool) -> dict:
+    """Step 3: Generate actions with the model (exits on failure)"""
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console
+    ) as progress:
+        task = progress.add_task("[cyan]Generating Photoshop actions with AI...", total=None)
+        
+        try:
+            result = generator.generate(
+                content=extracted['content'],
+                source=extracted['source'],
+                source_type=extracted['type']
+            )
+            progress.update(task, completed=True)
+            console.print("[green]✓[/green] Actions generated successfully")
+            
+            if verbose:
+                console.print(f"[dim]Model:[/dim] {result['model']}")
+                console.print(f"[dim]Attempts:[/dim] {result['attempt']}")
+                console.print(f"[dim]Actions count:[/dim] {len(result['actions'])}\n")
+            
+            return result
+        except Exception as e:
+            progress.update(task, completed=True)
+            console.print(f"[red]✗[/red] Generation failed: {str(e)}")
+            sys.exit(1)
+
+
+def report_validation(actions: List[Dict[str, Any]], validation_errors: List[str]) -> None:
+    """Step 4: Validate actions and print warnings"""
+    is_valid, errors = validate_json(actions)
+    validation_errors.extend(errors)
+    
+    if validation_errors:
+        console.print("\n[yellow]⚠ Validation warnings:[/yellow]")
+        for error in validation_errors[:5]:  # Show first 5 errors
+            console.print(f"  • {error}")
+        if len(validation_errors) > 5:
+            console.print(f"  [dim]... and {len(validation_errors) - 5} more[/dim]")
+        console.print()
+    else:
+        console.print("[green]✓[/green] Validation passed")
+
+
+def build_actions(
+    url: str,
+    config: dict,
+    api_key: str,
+    model: Optional[str],
+    verbose: bool,
+    validate: bool,
+    optimize: bool,
+    timings: Dict[str, float]
+) -> Tuple[List[Dict[str, Any]], dict]:
+    """
+    Extract, generate, validate and optionally optimize actions for a tutorial.
+    
+    The wall time of each stage is recorded into ``timings`` in seconds.
+    
+    Returns:
+        Tuple of (actions, extracted content)
+    """
+    stage_start = time.perf_counter()
+    extracted = extract_content(url, config, verbose)
+    timings['extract'] = time.perf_counter() - stage_start
+    
+    stage_start = time.perf_counter()
+    result = generate_actions(make_generator(config, api_key, model), extracted, verbose)
+    timings['generate'] = time.perf_counter() - stage_start
+    
+    actions = result['actions']
+    if validate:
+        stage_start = time.perf_counter()
+        report_validation(actions, result.get('validation_errors', []))
+        timings['validate'] = time.perf_counter() - stage_start
+    
+    if optimize:
+        stage_start = time.perf_counter()
+        actions, report = optimize_actions(actions)
+        console.print(f"[green]✓[/green] Optimized: {format_report(report)}")
+        timings['optimize'] = time.perf_counter() - stage_start
+    
+    return actions, extracted
+
+
+def load_executor():
+    """
+    Import the R2 executor (actions.py) from the repository root in-process.
+    
+    Its directory defaults to the one containing actionJSON-generator/ and
+    can be overridden with FLUXA_EXECUTOR_DIR.
+    """
+    if EXECUTOR_DIR not in sys.path:
+        sys.path.insert(0, EXECUTOR_DIR)
+    try:
+        import actions
+    except ImportError as e:
+        console.print(f"[red]✗[/red] Could not load the executor from {EXECUTOR_DIR}: {str(e)}")
+        console.print('Install its dependencies with: pip install -e ".[executor]"')
+        sys.exit(1)
+    return actions
+
+
+def parse_renditions(specs: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """
+    Parse --rendition specs with the executor's renditions module, so a
+    typo fails before any generation or upload.
+    
+    Returns:
+        List of rendition dicts (empty for the executor's default output)
+    
+    Raises:
+        click.BadParameter: If a spec is not valid
+    """
+    if not specs:
+        return []
+    if EXECUTOR_DIR not in sys.path:
+        sys.path.insert(0, EXECUTOR_DIR)
+    import renditions
+    try:
+        return renditions.parse_renditions(list(specs))
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="'--rendition'")
+
+
+def _timed(timings: Dict[str, float], stage: str, func: Callable[..., Any], *args: Any) -> Any:
+    stage_start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = time.perf_counter() - stage_start
+
+
+def build_and_prefetch(
+    executor: Any,
+    input_images: List[str],
+    build: Callable[[], Tuple[List[Dict[str, Any]], dict]],
+    timings: Dict[str, float]
+) -> Tuple[List[Dict[str, Any]], Any, Any, Optional[str]]:
+    """
+    Run ``build`` (extract + generate) while the executor uploads the inputs
+    and fetches an access token in background threads.
+    
+    The job can then be submitted as soon as the actions are ready, so the
+    critical path is about max(generate, upload) instead of their sum.
+    Background stage times are recorded as "upload (overlapped)" and
+    "token (overlapped)", and the time spent waiting for them after
+    generation as "wait". If ``build`` fails, uploaded temporary inputs are
+    deleted again.
+    
+    Returns:
+        Tuple of (actions, r2_client, uploaded inputs, access_token)
+    """
+    r2_client = executor.get_r2_client()
+    prefetch_timings: Dict[str, float] = {}
+    handed_over = False
+    upload = None
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='fluxa-prefetch')
+    try:
+        upload = pool.submit(
+            _timed, prefetch_timings, 'upload (overlapped)',
+            executor.upload_inputs, r2_client, input_images, executor.make_key_prefix()
+        )
+        token = pool.submit(_timed, prefetch_timings, 'token (overlapped)', executor.get_access_token)
+        
+        actions, _ = build()
+        
+        stage_start = time.perf_counter()
+        uploaded = upload.result()
+        access_token = token.result()
+        timings.update(prefetch_timings)
+        timings['wait'] = time.perf_counter() - stage_start
+        handed_over = True
+        return actions, r2_client, uploaded, access_token
+    finally:
+        pool.shutdown(wait=True)
+        if not handed_over and upload is not None and upload.done() and upload.exception() is None:
+            executor.discard_uploaded(r2_client, upload.result())
+
+
+def print_timings(timings: Dict[str, float]) -> None:
+    """Print per-stage wall times"""
+    table = Table(title="Stage timings", show_header=True, header_style="bold")
+    table.add_column("Stage")
+    table.add_column("Seconds", justify="right")
+    for stage, seconds in timings.items():
+        table.add_row(stage, f"{seconds:.2f}")
+    console.print(table)
+
+
+@click.group(cls=DefaultCommandGroup, default_command='generate')
+def main() -> None:
+    """
+    Fluxa - Convert Photoshop tutorials to API JSON
+    
+    Run "fluxa URL" (same as "fluxa generate URL") to write the actions to
+    a file, or "fluxa run URL IMAGE..." to generate and apply them in one go.
+    """
+
+
+@main.command()
 @click.argument('url', type=str)
 @click.option(
     '--output', '-o',
@@ -79,7 +363,12 @@ def load_config() -> dict:
     is_flag=True,
     help='Show cost estimate and exit without generating'
 )
-def main(
+@click.option(
+    '--optimize',
+    is_flag=True,
+    help='Remove or merge redundant steps before saving'
+)
+def generate(
     url: str,
     output: Optional[str],
     model: Optional[str],
@@ -87,10 +376,11 @@ def main(
     verbose: bool,
     no_metadata: bool,
     no_validate: bool,
-    estimate_cost: bool
+    estimate_cost: bool,
+    optimize: bool
 ) -> None:
     """
-    Fluxa - Convert Photoshop tutorials to API JSON
+    Convert a tutorial to Photoshop API JSON.
     
     Accepts YouTube video URLs or web article URLs and generates
     executable Photoshop API action JSON files.
@@ -100,61 +390,18 @@ def main(
     """
     config = load_config()
     
-    # Display welcome banner
-    console.print(Panel.fit(
-        "[bold cyan]Fluxa AI Tool[/bold cyan]\n"
-        "Tutorial → Photoshop API JSON",
-        border_style="cyan"
-    ))
-    
-    # Validate API key
-    if not api_key:
-        console.print("[red]Error:[/red] OpenAI API key not found.", style="bold")
-        console.print("Set the OPENAI_API_KEY environment variable or use --api-key option.")
-        console.print("\nExample: export OPENAI_API_KEY='your-key-here'")
-        sys.exit(1)
-    
-    # Set defaults from config
-    if not model:
-        model = config['openai']['model']
+    print_banner()
+    require_api_key(api_key)
     
     if not output:
         output = 'output.json'
     
     try:
         # Step 1: Extract content
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console
-        ) as progress:
-            task = progress.add_task("[cyan]Extracting tutorial content...", total=None)
-            
-            try:
-                extracted = ExtractorFactory.extract(url, config['extraction'])
-                progress.update(task, completed=True)
-                console.print("[green]✓[/green] Content extracted successfully")
-                
-                if verbose:
-                    console.print(f"\n[dim]Source:[/dim] {extracted['source']}")
-                    console.print(f"[dim]Type:[/dim] {extracted['type']}")
-                    if 'title' in extracted:
-                        console.print(f"[dim]Title:[/dim] {extracted['title']}")
-                    console.print(f"[dim]Content length:[/dim] {len(extracted['content'])} characters\n")
-                
-            except Exception as e:
-                progress.update(task, completed=True)
-                console.print(f"[red]✗[/red] Extraction failed: {str(e)}")
-                sys.exit(1)
+        extracted = extract_content(url, config, verbose)
         
         # Step 2: Cost estimate (if requested)
-        generator = PhotoshopActionGenerator(
-            api_key=api_key,
-            model=model,
-            temperature=config['openai']['temperature'],
-            max_tokens=config['openai']['max_tokens'],
-            timeout=config['openai']['timeout']
-        )
+        generator = make_generator(config, api_key, model)
         
         cost_estimate = generator.estimate_cost(len(extracted['content']))
         
@@ -169,51 +416,20 @@ def main(
             sys.exit(0)
         
         # Step 3: Generate actions
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console
-        ) as progress:
-            task = progress.add_task("[cyan]Generating Photoshop actions with AI...", total=None)
-            
-            try:
-                result = generator.generate(
-                    content=extracted['content'],
-                    source=extracted['source'],
-                    source_type=extracted['type']
-                )
-                progress.update(task, completed=True)
-                console.print("[green]✓[/green] Actions generated successfully")
-                
-                if verbose:
-                    console.print(f"[dim]Model:[/dim] {result['model']}")
-                    console.print(f"[dim]Attempts:[/dim] {result['attempt']}")
-                    console.print(f"[dim]Actions count:[/dim] {len(result['actions'])}\n")
-                
-            except Exception as e:
-                progress.update(task, completed=True)
-                console.print(f"[red]✗[/red] Generation failed: {str(e)}")
-                sys.exit(1)
+        result = generate_actions(generator, extracted, verbose)
         
         # Step 4: Validate
         actions = result['actions']
-        validation_errors = result.get('validation_errors', [])
         
         if not no_validate and config['output']['validate']:
-            is_valid, errors = validate_json(actions)
-            validation_errors.extend(errors)
-            
-            if validation_errors:
-                console.print("\n[yellow]⚠ Validation warnings:[/yellow]")
-                for error in validation_errors[:5]:  # Show first 5 errors
-                    console.print(f"  • {error}")
-                if len(validation_errors) > 5:
-                    console.print(f"  [dim]... and {len(validation_errors) - 5} more[/dim]")
-                console.print()
-            else:
-                console.print("[green]✓[/green] Validation passed")
+            report_validation(actions, result.get('validation_errors', []))
+        
+        # Step 5: Optimize (if requested)
+        if optimize:
+            actions, report = optimize_actions(actions)
+            console.print(f"[green]✓[/green] Optimized: {format_report(report)}")
         
-        # Step 5: Format output
+        # Step 6: Format output
         if not no_metadata and config['output']['add_metadata']:
             output_data = add_metadata(
                 actions,
@@ -225,7 +441,7 @@ def main(
         
         formatted_output = format_output(output_data, indent=config['output']['indent'])
         
-        # Step 6: Save to file
+        # Step 7: Save to file
         output_path = Path(output)
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
@@ -256,6 +472,151 @@ def main(
         sys.exit(1)
 
 
+@main.command()
+@click.argument('url', type=str)
+@click.argument('images', nargs=-1, required=True)
+@click.option(
+    '--output', '-o',
+    type=click.Path(),
+    help='Output image path (default: output_images/<image>_output.psd)'
+)
+@click.option(
+    '--save-actions',
+    type=click.Path(),
+    help='Also write the generated actions to this file'
+)
+@click.option(
+    '--rendition',
+    'renditions',
+    multiple=True,
+    help='Output rendition, e.g. psd or jpeg:quality=8,width=2048 (repeatable)'
+)
+@click.option(
+    '--model', '-m',
+    type=str,
+    help='OpenAI model to use (default: gpt-4o)'
+)
+@click.option(
+    '--api-key',
+    type=str,
+    envvar='OPENAI_API_KEY',
+    help='OpenAI API key (or set OPENAI_API_KEY env variable)'
+)
+@click.option(
+    '--verbose', '-v',
+    is_flag=True,
+    help='Show detailed processing information'
+)
+@click.option(
+    '--no-validate',
+    is_flag=True,
+    help='Skip validation'
+)
+@click.option(
+    '--optimize',
+    is_flag=True,
+    help='Remove or merge redundant steps before executing'
+)
+@click.option(
+    '--sequential',
+    is_flag=True,
+    help='Upload inputs only after generation instead of during it'
+)
+def run(
+    url: str,
+    images: Tuple[str, ...],
+    output: Optional[str],
+    save_actions: Optional[str],
+    renditions: Tuple[str, ...],
+    model: Optional[str],
+    api_key: Optional[str],
+    verbose: bool,
+    no_validate: bool,
+    optimize: bool,
+    sequential: bool
+) -> None:
+    """
+    Generate actions for a tutorial and apply them to images.
+    
+    The generated actions go straight to the executor (actions.py) in this
+    process, without intermediate files. Several images (space- or
+    comma-separated) are sent as one multi-input job. Inputs are uploaded
+    and an Adobe token is fetched while the actions are being generated.
+    
+    Example:
+        fluxa run https://www.youtube.com/watch?v=... input_images/photo.jpg
+    """
+    started = time.perf_counter()
+    rendition_list = parse_renditions(renditions)
+    config = load_config()
+    
+    print_banner()
+    require_api_key(api_key)
+    
+    input_images = [path.strip() for arg in images for path in arg.split(',') if path.strip()]
+    missing = [path for path in input_images if not os.path.exists(path)]
+    if missing:
+        console.print(f"[red]Error:[/red] Image not found: {', '.join(missing)}")
+        sys.exit(1)
+    timings: Dict[str, float] = {}
+    
+    def build() -> Tuple[List[Dict[str, Any]], dict]:
+        return build_actions(
+            url, config, api_key, model, verbose,
+            validate=not no_validate and config['output']['validate'],
+            optimize=optimize,
+            timings=timings
+        )
+    
+    try:
+        executor = load_executor()
+        # Bad inputs fail here, before any generation or upload
+        input_images = executor.prepare_inputs(input_images)
+        if sequential:
+            actions, _ = build()
+            r2_client = uploaded = access_token = None
+        else:
+            actions, r2_client, uploaded, access_token = build_and_prefetch(
+                executor, input_images, build, timings
+            )
+        
+        if save_actions:
+            save_path = Path(save_actions)
+            save_path.parent.mkdir(parents=True, exist_ok=True)
+            save_path.write_text(format_output(actions, indent=config['output']['indent']), encoding='utf-8')
+            console.print(f"[green]✓[/green] Actions saved to: [bold]{save_path.absolute()}[/bold]")
+        
+        executor_timings: Dict[str, float] = {}
+        result = executor.process_with_actionjson(
+            input_images, actions, output, r2_client=r2_client, access_token=access_token,
+            timings=executor_timings, renditions=rendition_list, uploaded=uploaded
+        )
+        if uploaded is not None:
+            # Inputs were already uploaded; only the output URLs were presigned
+            executor_timings = {
+                'presign' if stage == 'upload' else stage: seconds
+                for stage, seconds in executor_timings.items()
+            }
+        timings.update(executor_timings)
+        timings['total'] = time.perf_counter() - started
+        
+        print_timings(timings)
+        if not result:
+            console.print("\n[red]✗[/red] Failed to process images")
+            sys.exit(1)
+        console.print(f"\n[green bold]✓ Complete![/green bold] Output: [bold]{result}[/bold]")
+        
+    except KeyboardInterrupt:
+        console.print("\n\n[yellow]Interrupted by user[/yellow]")
+        sys.exit(1)
+    except Exception as e:
+        console.print(f"\n[red bold]Error:[/red bold] {str(e)}")
+        if verbose:
+            import traceback
+            console.print("\n[dim]" + traceback.format_exc() + "[/dim]")
+        sys.exit(1)
+
+
 if __name__ == '__main__':
     main()
 
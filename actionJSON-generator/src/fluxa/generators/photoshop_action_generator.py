@@ -2,7 +2,6 @@
 AI-powered Photoshop Action JSON generator
 """
 
-import json
 import re
 from typing import Dict, Any, List, Optional
 from openai import OpenAI
@@ -12,6 +11,7 @@ from ..prompts.photoshop_actions import (
     get_few_shot_examples
 )
 from ..utils.validator import validate_json_string
+from ..utils.jsonc import loads_jsonc
 
 
 class PhotoshopActionGenerator:
@@ -167,7 +167,7 @@ class PhotoshopActionGenerator:
             json_candidate = match.group(1)
             # Quick validation that it looks like JSON
             try:
-                json.loads(json_candidate)
+                loads_jsonc(json_candidate)
                 return json_candidate
             except:
                 pass
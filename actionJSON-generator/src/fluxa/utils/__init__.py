@@ -4,7 +4,18 @@ Utility functions for validation, formatting, and helpers
 
 from .validator import validate_json, ActionValidator
 from .formatter import format_output, add_metadata
+from .jsonc import loads_jsonc, load_jsonc_file
+from .optimizer import optimize_actions, ActionOptimizer
 
-__all__ = ["validate_json", "ActionValidator", "format_output", "add_metadata"]
+__all__ = [
+    "validate_json",
+    "ActionValidator",
+    "format_output",
+    "add_metadata",
+    "loads_jsonc",
+    "load_jsonc_file",
+    "optimize_actions",
+    "ActionOptimizer",
+]
 
 
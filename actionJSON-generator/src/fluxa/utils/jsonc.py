@@ -0,0 +1,126 @@
+"""
+JSON-with-comments (JSONC) loading for action files
+"""
+
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple, Union
+
+# One alternation scanned left to right. Everything that is not a comment
+# (including whole string literals, so "//" or "/*" inside a string is never
+# mistaken for a comment) is matched as one run, which keeps the number of
+# Python-level callbacks proportional to the number of comments.
+_TOKEN_PATTERN = re.compile(
+    r'((?:[^"/]+|"[^"\\]*(?:\\.[^"\\]*)*"|/(?![/*]))+)'  # code and strings (kept)
+    r'|//[^\n]*'                                         # line comment
+    r'|/\*[\s\S]*?\*/'                                   # block comment
+)
+
+_CACHE_MAX_ENTRIES = 256
+_cache: "OrderedDict[str, Tuple[Tuple[int, int], Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _replace(match: "re.Match[str]") -> str:
+    kept = match.group(1)
+    if kept is not None:
+        return kept
+    # Keep line numbers in parse errors stable and tokens separated
+    return "\n" * match.group(0).count("\n") or " "
+
+
+def strip_comments(text: str) -> str:
+    """
+    Remove // and /* */ comments from JSONC text in a single pass
+
+    Args:
+        text: JSONC source
+
+    Returns:
+        Plain JSON text
+    """
+    if "/" not in text:
+        return text
+    return _TOKEN_PATTERN.sub(_replace, text)
+
+
+def loads_jsonc(text: Union[str, bytes]) -> Any:
+    """
+    Parse JSONC text
+
+    Args:
+        text: JSONC source
+
+    Returns:
+        Parsed data
+
+    Raises:
+        json.JSONDecodeError: If the text is not valid JSON once comments are removed
+    """
+    if isinstance(text, bytes):
+        text = text.decode("utf-8-sig")
+    elif text.startswith("\ufeff"):
+        text = text[1:]
+    return json.loads(strip_comments(text))
+
+
+def load_jsonc_file(path: Union[str, "os.PathLike[str]"], use_cache: bool = True) -> Any:
+    """
+    Load a JSONC file, reusing the parsed result while the file is unchanged
+
+    Entries are keyed by absolute path and invalidated when the file's mtime
+    or size changes. The cached object is shared between callers, so treat
+    the result as read-only.
+
+    Args:
+        path: Path to the JSONC file
+        use_cache: Set to False to always re-read the file
+
+    Returns:
+        Parsed data
+
+    Raises:
+        OSError: If the file cannot be read
+        json.JSONDecodeError: If the file is not valid JSONC
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    if use_cache:
+        with _cache_lock:
+            entry = _cache.get(abs_path)
+            if entry is not None and entry[0] == signature:
+                _cache.move_to_end(abs_path)
+                return entry[1]
+
+    with open(abs_path, "rb") as f:
+        data = loads_jsonc(f.read())
+
+    if use_cache:
+        with _cache_lock:
+            _cache[abs_path] = (signature, data)
+            _cache.move_to_end(abs_path)
+            while len(_cache) > _CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+    return data
+
+
+def clear_cache() -> None:
+    """Drop every cached parse result"""
+    with _cache_lock:
+        _cache.clear()
+
+
+def cache_info() -> Dict[str, int]:
+    """
+    Describe the parse cache
+
+    Returns:
+        Dictionary with the number of cached files and the entry limit
+    """
+    with _cache_lock:
+        return {"entries": len(_cache), "max_entries": _CACHE_MAX_ENTRIES}
@@ -0,0 +1,224 @@
+"""
+Peephole optimizer for Photoshop action JSON chains
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# Reference keys that name one specific object regardless of the current
+# selection, as opposed to ordinal references such as forwardEnum
+ABSOLUTE_REF_KEYS = ("_name", "_id", "_index")
+# Objects whose ``set`` only updates the properties it names
+MERGEABLE_SET_REFS = ("layer", "document")
+
+
+def _is_absolute_ref(ref: Any) -> bool:
+    if not isinstance(ref, dict) or "_ref" not in ref:
+        return False
+    if any(key in ref for key in ABSOLUTE_REF_KEYS):
+        return True
+    return "_enum" in ref and ref["_enum"] != "ordinal"
+
+
+def _target_refs(step: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    target = step.get("_target")
+    if isinstance(target, list) and target and all(isinstance(ref, dict) for ref in target):
+        return target
+    return None
+
+
+def _has_only(step: Dict[str, Any], keys: Tuple[str, ...]) -> bool:
+    return all(key in keys for key in step)
+
+
+class ActionOptimizer:
+    """
+    Removes or merges redundant steps in an action list.
+
+    Every rewrite only looks at two adjacent steps and produces a chain with
+    the same end state:
+
+    - merge_set: two ``set`` steps on the same layer or document whose
+      ``to`` values are descriptors of the same type become one ``set``
+      whose ``to`` holds the union of both, with the later values winning;
+      of two sets of the same property (e.g. the selection), which replace
+      the whole value, only the later one is kept
+    - drop_select: a ``select`` that is immediately followed by an absolute
+      ``select`` of the same kind of object (by name, id, index or
+      enumerated value, without a selection modifier) is dropped
+    - merge_make_adjustment: ``make adjustmentLayer`` followed by a ``set``
+      of the new adjustment layer with the same adjustment type becomes one
+      ``make`` carrying the final settings, unless both set the same
+      list-valued key
+
+    Steps with keys the rules do not understand are left untouched. The
+    input list is never modified.
+    """
+
+    RULES = ("merge_set", "drop_select", "merge_make_adjustment")
+
+    def optimize(self, actions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Optimize an action list
+
+        Args:
+            actions: Array of action objects
+
+        Returns:
+            Tuple of (optimized_actions, report) where report has
+            original_steps, optimized_steps, removed and a per-rule count
+        """
+        rewrites = {rule: 0 for rule in self.RULES}
+        optimized: List[Dict[str, Any]] = []
+
+        for step in actions:
+            # A merge can enable another with the step before it, so keep
+            # folding the new last step backwards
+            while optimized and isinstance(step, dict):
+                rule, merged = self._combine(optimized[-1], step)
+                if rule is None:
+                    break
+                rewrites[rule] += 1
+                optimized.pop()
+                if merged is None:
+                    break
+                step = merged
+            optimized.append(step)
+
+        report = {
+            "original_steps": len(actions),
+            "optimized_steps": len(optimized),
+            "removed": len(actions) - len(optimized),
+            "rewrites": rewrites,
+        }
+        return optimized, report
+
+    def _combine(
+        self, previous: Any, step: Dict[str, Any]
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Try each rule on a pair of adjacent steps
+
+        Returns:
+            (rule, replacement) when a rule applies; the previous step is
+            removed and ``step`` is replaced by ``replacement`` (or kept as is
+            when replacement is None). (None, None) when nothing applies.
+        """
+        if not isinstance(previous, dict):
+            return None, None
+
+        merged = self._merge_set(previous, step)
+        if merged is not None:
+            return "merge_set", merged
+        if self._select_superseded(previous, step):
+            return "drop_select", None
+        merged = self._merge_make_adjustment(previous, step)
+        if merged is not None:
+            return "merge_make_adjustment", merged
+        return None, None
+
+    def _merge_set(self, previous: Dict[str, Any], step: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        allowed = ("_obj", "_target", "to")
+        if previous.get("_obj") != "set" or step.get("_obj") != "set":
+            return None
+        if not (_has_only(previous, allowed) and _has_only(step, allowed)):
+            return None
+        target = _target_refs(step)
+        if target is None or previous.get("_target") != target:
+            return None
+
+        previous_to, to = previous.get("to"), step.get("to")
+        if not (isinstance(previous_to, dict) and isinstance(to, dict)):
+            return None
+        # Only descriptors merge key by key; references such as
+        # {_ref, _enum, _value} must be replaced as a whole
+        if "_ref" in previous_to or "_ref" in to:
+            return None
+        if previous_to.get("_obj") is None or previous_to.get("_obj") != to.get("_obj"):
+            return None
+        # Setting a property (selection, ...) replaces its whole value: the
+        # earlier set is dead. Only layer and document sets are partial updates
+        # that can be merged key by key; anything else is left alone
+        if any("_property" in ref for ref in target):
+            return dict(step)
+        if not all(ref.get("_ref") in MERGEABLE_SET_REFS for ref in target):
+            return None
+        # Renaming an object addressed by name would change what the second
+        # set refers to
+        if "name" in previous_to and any("_name" in ref for ref in target):
+            return None
+
+        return {"_obj": "set", "_target": target, "to": {**previous_to, **to}}
+
+    def _select_superseded(self, previous: Dict[str, Any], step: Dict[str, Any]) -> bool:
+        if previous.get("_obj") != "select" or step.get("_obj") != "select":
+            return False
+        # makeVisible has a side effect that survives the next select
+        if previous.get("makeVisible") or "selectionModifier" in step:
+            return False
+
+        previous_target, target = _target_refs(previous), _target_refs(step)
+        if previous_target is None or target is None or len(target) != 1:
+            return False
+        if not _is_absolute_ref(target[0]):
+            return False
+        return all(ref.get("_ref") == target[0]["_ref"] for ref in previous_target)
+
+    def _merge_make_adjustment(
+        self, previous: Dict[str, Any], step: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        if previous.get("_obj") != "make" or step.get("_obj") != "set":
+            return None
+        if not _has_only(step, ("_obj", "_target", "to")):
+            return None
+        if previous.get("_target") != [{"_ref": "adjustmentLayer"}]:
+            return None
+        if step.get("_target") != [
+            {"_enum": "ordinal", "_ref": "adjustmentLayer", "_value": "targetEnum"}
+        ]:
+            return None
+
+        using = previous.get("using")
+        to = step.get("to")
+        if not (isinstance(using, dict) and isinstance(to, dict)):
+            return None
+        adjustment = using.get("type")
+        if not isinstance(adjustment, dict) or adjustment.get("_obj") != to.get("_obj"):
+            return None
+        # A list such as the curves "adjustment" would be replaced wholesale,
+        # not updated, so only fold sets that leave the make's lists alone
+        if any(isinstance(adjustment[key], list) for key in to if key in adjustment):
+            return None
+
+        return {**previous, "using": {**using, "type": {**adjustment, **to}}}
+
+
+def optimize_actions(actions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Convenience function to optimize an action list
+
+    Args:
+        actions: Array of action objects
+
+    Returns:
+        Tuple of (optimized_actions, report)
+    """
+    optimizer = ActionOptimizer()
+    return optimizer.optimize(actions)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """
+    Describe an optimization report in one line
+
+    Args:
+        report: Report returned by optimize_actions
+
+    Returns:
+        Human readable summary
+    """
+    applied = ", ".join(f"{rule}={count}" for rule, count in report["rewrites"].items() if count)
+    summary = (
+        f"{report['original_steps']} -> {report['optimized_steps']} steps "
+        f"({report['removed']} removed)"
+    )
+    return f"{summary}: {applied}" if applied else summary
@@ -5,6 +5,8 @@ JSON validation utilities for Photoshop API actions
 from typing import List, Dict, Any, Tuple
 import json
 
+from .jsonc import loads_jsonc
+
 
 class ActionValidator:
     """Validator for Photoshop API action JSON"""
@@ -163,7 +165,7 @@ def validate_json(json_data: Any) -> Tuple[bool, List[str]]:
 
 def validate_json_string(json_string: str) -> Tuple[bool, List[str], Any]:
     """
-    Validate JSON string
+    Validate JSON string (comments are allowed)
     
     Args:
         json_string: JSON string to validate
@@ -172,7 +174,7 @@ def validate_json_string(json_string: str) -> Tuple[bool, List[str], Any]:
         Tuple of (is_valid, list_of_errors, parsed_data)
     """
     try:
-        data = json.loads(json_string)
+        data = loads_jsonc(json_string)
     except json.JSONDecodeError as e:
         return False, [f"Invalid JSON: {str(e)}"], None
     
@@ -0,0 +1,55 @@
+"""
+Tests for CLI command routing
+"""
+
+from click.testing import CliRunner
+from fluxa import cli
+
+
+def invoke(args, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    return CliRunner().invoke(cli.main, args)
+
+
+class TestDefaultCommand:
+    """Test that a bare URL still runs the generate command"""
+
+    def test_url_routes_to_generate(self, monkeypatch):
+        """Test fluxa URL behaves like fluxa generate URL"""
+        result = invoke(["https://example.com/tutorial"], monkeypatch)
+        assert result.exit_code == 1
+        assert "OpenAI API key not found" in result.output
+
+    def test_options_before_url(self, monkeypatch):
+        """Test options given before the URL are passed to generate"""
+        result = invoke(["-o", "out.json", "https://example.com/tutorial"], monkeypatch)
+        assert "OpenAI API key not found" in result.output
+
+    def test_group_help_lists_commands(self, monkeypatch):
+        """Test --help shows the group rather than generate"""
+        result = invoke(["--help"], monkeypatch)
+        assert result.exit_code == 0
+        assert "generate" in result.output and "run" in result.output
+
+
+class TestRunCommand:
+    """Test the generate-and-execute command"""
+
+    def test_requires_images(self, monkeypatch):
+        """Test run without images is a usage error"""
+        result = invoke(["run", "https://example.com/tutorial"], monkeypatch)
+        assert result.exit_code == 2
+
+    def test_requires_api_key(self, monkeypatch):
+        """Test run stops before extraction without an API key"""
+        result = invoke(["run", "https://example.com/tutorial", "a.jpg"], monkeypatch)
+        assert result.exit_code == 1
+        assert "OpenAI API key not found" in result.output
+
+    def test_rejects_bad_rendition(self, monkeypatch):
+        """Test an invalid --rendition is a usage error before anything else runs"""
+        result = invoke(
+            ["run", "https://example.com/tutorial", "a.jpg", "--rendition", "jpeg:quality=99"], monkeypatch
+        )
+        assert result.exit_code == 2
+        assert "--rendition" in result.output and "JPEG quality" in result.output
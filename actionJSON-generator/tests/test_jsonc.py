@@ -0,0 +1,80 @@
+"""
+Tests for JSONC loading
+"""
+
+import os
+import json
+import pytest
+from fluxa.utils.jsonc import strip_comments, loads_jsonc, load_jsonc_file, clear_cache
+
+
+class TestLoadsJsonc:
+    """Test comment stripping and parsing"""
+
+    def test_plain_json_unchanged(self):
+        """Test plain JSON parses as with json.loads"""
+        text = '[{"_obj": "emboss", "amount": 100}]'
+        assert loads_jsonc(text) == json.loads(text)
+
+    def test_line_and_block_comments(self):
+        """Test // and /* */ comments are removed"""
+        text = """[
+            // leading comment
+            {"_obj": "emboss", /* inline */ "amount": 100} // trailing
+            /* multi
+               line */
+        ]"""
+        assert loads_jsonc(text) == [{"_obj": "emboss", "amount": 100}]
+
+    def test_comment_markers_inside_strings(self):
+        """Test comment-like text inside strings is preserved"""
+        text = '{"url": "https://example.com/a", "note": "keep /* this */", "q": "a\\"//b"} // x'
+        assert loads_jsonc(text) == {
+            "url": "https://example.com/a",
+            "note": "keep /* this */",
+            "q": 'a"//b',
+        }
+
+    def test_comment_between_tokens(self):
+        """Test a block comment separates tokens instead of joining them"""
+        assert strip_comments("1/**/2") == "1 2"
+
+    def test_line_numbers_preserved(self):
+        """Test multi-line comments keep error line numbers stable"""
+        text = '[\n/* a\nb */\n1,\n]'
+        with pytest.raises(json.JSONDecodeError) as exc_info:
+            loads_jsonc(text)
+        assert exc_info.value.lineno == 5
+
+    def test_bytes_with_bom(self):
+        """Test UTF-8 bytes with a byte order mark"""
+        assert loads_jsonc('\ufeff[1] // c'.encode("utf-8")) == [1]
+
+
+class TestLoadJsoncFile:
+    """Test file loading and the parse cache"""
+
+    def test_cached_until_file_changes(self, tmp_path):
+        """Test the parse is reused until mtime or size changes"""
+        clear_cache()
+        path = tmp_path / "action.json"
+        path.write_text('[{"_obj": "emboss"}] // comment')
+
+        first = load_jsonc_file(path)
+        assert load_jsonc_file(path) is first
+
+        path.write_text('[{"_obj": "emboss", "amount": 5}]')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert load_jsonc_file(path) == [{"_obj": "emboss", "amount": 5}]
+
+    def test_cache_disabled(self, tmp_path):
+        """Test use_cache=False always re-parses"""
+        path = tmp_path / "action.json"
+        path.write_text("[1]")
+        assert load_jsonc_file(path, use_cache=False) is not load_jsonc_file(path, use_cache=False)
+
+    def test_missing_file(self, tmp_path):
+        """Test a missing file raises OSError"""
+        with pytest.raises(OSError):
+            load_jsonc_file(tmp_path / "missing.json")
@@ -0,0 +1,210 @@
+"""
+Tests for the action chain optimizer
+"""
+
+import copy
+from fluxa.utils.optimizer import ActionOptimizer, optimize_actions, format_report
+
+CURRENT_LAYER = [{"_enum": "ordinal", "_ref": "layer", "_value": "targetEnum"}]
+CURRENT_ADJUSTMENT = [{"_enum": "ordinal", "_ref": "adjustmentLayer", "_value": "targetEnum"}]
+
+
+def set_layer(target, **props):
+    return {"_obj": "set", "_target": target, "to": {"_obj": "layer", **props}}
+
+
+def select(ref, **options):
+    return {"_obj": "select", "_target": [ref], **options}
+
+
+class TestMergeSet:
+    """Test merging of consecutive set steps"""
+
+    def test_same_target_merged(self):
+        """Test later values win and other properties are kept"""
+        actions = [
+            set_layer(CURRENT_LAYER, opacity=70, name="A"),
+            set_layer(CURRENT_LAYER, opacity=60),
+        ]
+        optimized, report = optimize_actions(actions)
+        assert optimized == [set_layer(CURRENT_LAYER, opacity=60, name="A")]
+        assert report["removed"] == 1
+        assert report["rewrites"]["merge_set"] == 1
+
+    def test_chain_of_sets_collapses(self):
+        """Test three sets on the same target become one"""
+        actions = [set_layer(CURRENT_LAYER, name=str(i)) for i in range(3)]
+        optimized, report = optimize_actions(actions)
+        assert optimized == [set_layer(CURRENT_LAYER, name="2")]
+        assert report["rewrites"]["merge_set"] == 2
+
+    def test_different_targets_kept(self):
+        """Test sets on different targets are not merged"""
+        other = [{"_ref": "layer", "_name": "Background"}]
+        actions = [set_layer(CURRENT_LAYER, opacity=70), set_layer(other, opacity=60)]
+        optimized, report = optimize_actions(actions)
+        assert optimized == actions
+        assert report["removed"] == 0
+
+    def test_rename_of_named_target_kept(self):
+        """Test a rename is not merged into a set that addresses the old name"""
+        target = [{"_ref": "layer", "_name": "Old"}]
+        actions = [set_layer(target, name="New"), set_layer(target, opacity=50)]
+        optimized, _ = optimize_actions(actions)
+        assert optimized == actions
+
+    def test_reference_to_kept(self):
+        """Test sets whose ``to`` is a reference are not merged key by key"""
+        selection = [{"_ref": "channel", "_property": "selection"}]
+        actions = [
+            {"_obj": "set", "_target": selection,
+             "to": {"_ref": "channel", "_enum": "channel", "_value": "transparencyEnum"}},
+            {"_obj": "set", "_target": selection, "to": {"_enum": "ordinal", "_value": "none"}},
+        ]
+        optimized, report = optimize_actions(actions)
+        assert optimized == actions
+        assert report["removed"] == 0
+
+    def test_property_set_replaces_previous(self):
+        """Test a later selection set replaces an earlier one instead of merging with it"""
+        selection = [{"_ref": "channel", "_property": "selection"}]
+
+        def rectangle(**extra):
+            return {"_obj": "rectangle", "top": 0, "left": 0, "bottom": 10, "right": 10, **extra}
+
+        actions = [
+            {"_obj": "set", "_target": selection, "to": rectangle(radius=5)},
+            {"_obj": "set", "_target": selection, "to": rectangle()},
+        ]
+        optimized, report = optimize_actions(actions)
+        assert optimized == actions[1:]
+        assert report["rewrites"]["merge_set"] == 1
+
+    def test_other_targets_kept(self):
+        """Test sets on objects other than layers and documents are not merged"""
+        text = [{"_enum": "ordinal", "_ref": "textLayer", "_value": "targetEnum"}]
+        actions = [
+            {"_obj": "set", "_target": text, "to": {"_obj": "textLayer", "textKey": "A", "size": 12}},
+            {"_obj": "set", "_target": text, "to": {"_obj": "textLayer", "textKey": "B"}},
+        ]
+        optimized, _ = optimize_actions(actions)
+        assert optimized == actions
+
+    def test_extra_keys_kept(self):
+        """Test sets with keys the optimizer does not understand are left alone"""
+        first = {**set_layer(CURRENT_LAYER, opacity=70), "_options": {"dialogOptions": "dontDisplay"}}
+        actions = [first, set_layer(CURRENT_LAYER, opacity=60)]
+        optimized, _ = optimize_actions(actions)
+        assert optimized == actions
+
+
+class TestDropSelect:
+    """Test removal of superseded selects"""
+
+    def test_absolute_reselect_drops_previous(self):
+        """Test a select followed by an absolute select of the same kind is dropped"""
+        actions = [
+            select({"_enum": "ordinal", "_ref": "layer", "_value": "forwardEnum"}, makeVisible=False),
+            select({"_ref": "layer", "_name": "Background"}, makeVisible=False),
+        ]
+        optimized, report = optimize_actions(actions)
+        assert optimized == actions[1:]
+        assert report["rewrites"]["drop_select"] == 1
+
+    def test_relative_reselect_kept(self):
+        """Test a relative select depends on the previous one"""
+        forward = select({"_enum": "ordinal", "_ref": "layer", "_value": "forwardEnum"})
+        actions = [forward, copy.deepcopy(forward)]
+        optimized, _ = optimize_actions(actions)
+        assert optimized == actions
+
+    def test_different_kind_kept(self):
+        """Test selecting a channel does not supersede selecting a layer"""
+        actions = [
+            select({"_enum": "ordinal", "_ref": "layer", "_value": "backwardEnum"}),
+            select({"_enum": "channel", "_ref": "channel", "_value": "RGB"}),
+        ]
+        optimized, _ = optimize_actions(actions)
+        assert optimized == actions
+
+    def test_make_visible_and_modifier_kept(self):
+        """Test selects with side effects or selection modifiers are kept"""
+        named = {"_ref": "layer", "_name": "A"}
+        visible = [select(named, makeVisible=True), select({"_ref": "layer", "_name": "B"})]
+        additive = [
+            select(named),
+            select({"_ref": "layer", "_name": "B"},
+                   selectionModifier={"_enum": "selectionModifierType", "_value": "addToSelection"}),
+        ]
+        assert optimize_actions(visible)[0] == visible
+        assert optimize_actions(additive)[0] == additive
+
+
+class TestMergeMakeAdjustment:
+    """Test folding a set into the make adjustmentLayer before it"""
+
+    def test_make_then_set_merged(self):
+        """Test the final settings move into the make step"""
+        make = {
+            "_obj": "make",
+            "_target": [{"_ref": "adjustmentLayer"}],
+            "using": {"_obj": "adjustmentLayer", "type": {"_obj": "curves", "presetKind": "default"}},
+        }
+        update = {
+            "_obj": "set",
+            "_target": CURRENT_ADJUSTMENT,
+            "to": {"_obj": "curves", "presetKind": "custom", "adjustment": [1, 2]},
+        }
+        optimized, report = optimize_actions([make, update])
+        assert optimized == [{
+            "_obj": "make",
+            "_target": [{"_ref": "adjustmentLayer"}],
+            "using": {
+                "_obj": "adjustmentLayer",
+                "type": {"_obj": "curves", "presetKind": "custom", "adjustment": [1, 2]},
+            },
+        }]
+        assert report["rewrites"]["merge_make_adjustment"] == 1
+
+    def test_different_adjustment_type_kept(self):
+        """Test a set of a different adjustment type is not merged"""
+        make = {
+            "_obj": "make",
+            "_target": [{"_ref": "adjustmentLayer"}],
+            "using": {"_obj": "adjustmentLayer", "type": {"_obj": "levels"}},
+        }
+        update = {"_obj": "set", "_target": CURRENT_ADJUSTMENT, "to": {"_obj": "curves"}}
+        optimized, _ = optimize_actions([make, update])
+        assert optimized == [make, update]
+
+
+    def test_shared_list_key_kept(self):
+        """Test a set replacing a list the make already has is not folded"""
+        make = {
+            "_obj": "make",
+            "_target": [{"_ref": "adjustmentLayer"}],
+            "using": {"_obj": "adjustmentLayer", "type": {"_obj": "curves", "adjustment": [1]}},
+        }
+        update = {"_obj": "set", "_target": CURRENT_ADJUSTMENT, "to": {"_obj": "curves", "adjustment": [2]}}
+        optimized, _ = optimize_actions([make, update])
+        assert optimized == [make, update]
+
+
+class TestOptimizer:
+    """Test general optimizer behaviour"""
+
+    def test_input_not_modified(self):
+        """Test the input list and its steps are left unchanged"""
+        actions = [set_layer(CURRENT_LAYER, opacity=70), set_layer(CURRENT_LAYER, opacity=60)]
+        original = copy.deepcopy(actions)
+        ActionOptimizer().optimize(actions)
+        assert actions == original
+
+    def test_report_format(self):
+        """Test the one-line report lists applied rules"""
+        _, report = optimize_actions(
+            [set_layer(CURRENT_LAYER, opacity=70), set_layer(CURRENT_LAYER, opacity=60)]
+        )
+        assert format_report(report) == "2 -> 1 steps (1 removed): merge_set=1"
+        _, report = optimize_actions([{"_obj": "emboss"}])
+        assert format_report(report) == "1 -> 1 steps (0 removed)"
@@ -7,13 +7,32 @@ import os
 import sys
 import json
 import time
-import requests
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 from datetime import datetime
 import uuid
 
+from ims_token import get_token_provider
+from http_session import get_session
+from job_poller import poll_job
+from rate_limit import limited_request
+import r2_cas
+import r2_transfer
+from r2_cleanup import schedule_delete
+from result_cache import get_result_cache, result_key
+import renditions as rend
+import preview
+from preprocess import InputError, prepare_inputs
+import job_journal
+from job_journal import get_job_journal, journal_key
+
+# Shared JSONC loader from the fluxa package in actionJSON-generator/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'actionJSON-generator', 'src'))
+from fluxa.utils.jsonc import load_jsonc_file
+from fluxa.utils.optimizer import optimize_actions, format_report
+
 # Load environment variables
 load_dotenv()
 
@@ -25,35 +44,37 @@ R2_BUCKET_NAME = os.getenv('R2_BUCKET_NAME')
 R2_ACCESS_KEY_ID = os.getenv('R2_ACCESS_KEY_ID')
 R2_SECRET_ACCESS_KEY = os.getenv('R2_SECRET_ACCESS_KEY')
 R2_REGION = os.getenv('R2_REGION', 'auto')
+# Endpoint overrides, e.g. for the local mock server in benchmarks/
+R2_ENDPOINT_URL = os.getenv('R2_ENDPOINT_URL')
+PHOTOSHOP_API_URL = os.getenv('PHOTOSHOP_API_URL', 'https://image.adobe.io')
+R2_MAX_POOL_CONNECTIONS = int(os.getenv('R2_MAX_POOL_CONNECTIONS', '64'))
+DEDUP_INPUTS = os.getenv('R2_DEDUP_INPUTS', '1') not in ('0', 'false', 'no')
+OPTIMIZE_ACTIONS = os.getenv('OPTIMIZE_ACTIONS', '0') in ('1', 'true', 'yes')
+PRESIGN_EXPIRATION = 3600
+# Presigned URLs of a resumed job are re-minted when they expire within this many seconds
+PRESIGN_REMINT_MARGIN = int(os.getenv('R2_PRESIGN_REMINT_MARGIN', '600'))
 
 
 def get_access_token():
-    """Get Adobe access token."""
-    params = {
-        'client_secret': CLIENT_SECRET,
-        'grant_type': 'client_credentials',
-        'scope': 'openid,AdobeID,read_organizations,firefly_api,ff_apis'
-    }
-    response = requests.post(
-        f'https://ims-na1.adobelogin.com/ims/token/v2?client_id={CLIENT_ID}',
-        data=params
-    )
-    return response.json().get('access_token')
+    """Get Adobe access token (cached until shortly before expiry)."""
+    return get_token_provider(CLIENT_ID, CLIENT_SECRET).get()
 
 
 def get_r2_client():
     """Create boto3 S3 client for Cloudflare R2."""
-    endpoint_url = f"https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
+    endpoint_url = R2_ENDPOINT_URL or f"https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
     return boto3.client(
         's3',
         endpoint_url=endpoint_url,
         aws_access_key_id=R2_ACCESS_KEY_ID,
         aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-        region_name=R2_REGION
+        region_name=R2_REGION,
+        # Parallel part transfers from several jobs share this pool
+        config=Config(max_pool_connections=R2_MAX_POOL_CONNECTIONS)
     )
 
 
-def generate_r2_presigned_url(s3_client, object_key, operation='put_object', expiration=3600):
+def generate_r2_presigned_url(s3_client, object_key, operation='put_object', expiration=PRESIGN_EXPIRATION):
     """Generate pre-signed URL for R2."""
     return s3_client.generate_presigned_url(
         operation,
@@ -63,85 +84,103 @@ def generate_r2_presigned_url(s3_client, object_key, operation='put_object', exp
 
 
 def upload_to_r2(s3_client, local_path, object_key):
-    """Upload file to R2."""
-    s3_client.upload_file(local_path, R2_BUCKET_NAME, object_key)
+    """Upload file to R2 (multipart with parallel parts for large files)."""
+    r2_transfer.upload_file(s3_client, R2_BUCKET_NAME, local_path, object_key)
     return generate_r2_presigned_url(s3_client, object_key, operation='get_object')
 
 
 def download_from_r2(s3_client, object_key, local_path):
-    """Download file from R2."""
-    s3_client.download_file(R2_BUCKET_NAME, object_key, local_path)
+    """Download file from R2 with parallel ranged GETs. Returns throughput stats."""
+    return r2_transfer.download_file(s3_client, R2_BUCKET_NAME, object_key, local_path)
 
 
-def process_with_actionjson(input_images, action_json_file, output_path=None):
+def load_action_json(action_json_file, optimize=None):
     """
-    Process images using Adobe actionJSON endpoint with multiple inputs.
-    
-    According to Adobe docs, for multiple images:
-    - First image goes in inputs[0]
-    - Additional images go in options.additionalImages[]
-    - Reference additional images in actionJSON using ACTION_JSON_OPTIONS_ADDITIONAL_IMAGES_X
+    Load an action JSON file (comments allowed). Parses are cached until the file changes.
+
+    With ``optimize`` (default: OPTIMIZE_ACTIONS) redundant steps are removed
+    or merged before the actions are submitted.
     """
-    print(f"\n[START] Processing {len(input_images)} images with actionJSON")
-    
-    # Validate inputs
-    if not all([CLIENT_ID, CLIENT_SECRET, R2_ACCOUNT_ID, R2_BUCKET_NAME, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY]):
-        print("Error: Missing required environment variables")
-        return None
-    
-    for img_path in input_images:
-        if not os.path.exists(img_path):
-            print(f"Error: Image not found: {img_path}")
-            return None
-    
-    if not os.path.exists(action_json_file):
-        print(f"Error: Action JSON file not found: {action_json_file}")
-        return None
-    
-    # Load action JSON
-    with open(action_json_file, 'r') as f:
-        action_json = json.load(f)
-    
-    print(f"Action JSON loaded: {len(action_json)} steps")
-    
-    # Initialize R2 client
-    r2_client = get_r2_client()
+    action_json = load_jsonc_file(action_json_file)
+    if optimize is None:
+        optimize = OPTIMIZE_ACTIONS
+    if optimize:
+        action_json, report = optimize_actions(action_json)
+        print(f"[OPTIMIZE] {format_report(report)}")
+    return action_json
+
+
+def make_key_prefix():
+    """Unique prefix for the temporary R2 keys of one job."""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     unique_id = str(uuid.uuid4())[:8]
+    return f"{timestamp}_{unique_id}"
+
+
+def upload_inputs(r2_client, input_images, key_prefix, dedup=None):
+    """
+    Upload input images to R2 and return their presigned GET URLs.
     
-    # Upload all input images to R2 and get URLs
-    print("\n[UPLOAD] Uploading images to R2...")
+    With deduplication (the default, see R2_DEDUP_INPUTS), inputs are stored
+    under their content hash and reused across jobs and runs; they expire by
+    TTL rather than being deleted with the job.
+    
+    Returns:
+        Tuple of (input_urls, temp_keys) where temp_keys are the per-job
+        objects the caller must delete
+    """
+    if dedup is None:
+        dedup = DEDUP_INPUTS
     input_urls = []
     r2_keys = []
     
     for idx, img_path in enumerate(input_images):
         filename = os.path.basename(img_path)
-        r2_key = f"temp_input_{timestamp}_{unique_id}_{idx}_{filename}"
+        if dedup:
+            url, _, uploaded = r2_cas.upload_input(r2_client, R2_BUCKET_NAME, img_path)
+            input_urls.append(url)
+            action = "Uploaded" if uploaded else "Reused"
+            print(f"  {action} {idx + 1}/{len(input_images)}: {filename}")
+            continue
+        
+        r2_key = f"temp_input_{key_prefix}_{idx}_{filename}"
         r2_keys.append(r2_key)
         
         url = upload_to_r2(r2_client, img_path, r2_key)
         input_urls.append(url)
         print(f"  Uploaded {idx + 1}/{len(input_images)}: {filename}")
     
-    # Prepare output path in R2
-    output_filename = os.path.basename(input_images[0])
-    base_name = os.path.splitext(output_filename)[0]
-    output_r2_key = f"output_{timestamp}_{unique_id}_{base_name}.psd"
-    output_url = generate_r2_presigned_url(r2_client, output_r2_key, operation='put_object')
-    
-    print(f"\n[OUTPUT] Output will be: {output_r2_key}")
+    return input_urls, r2_keys
+
+
+def output_key_for(input_image, key_prefix, renditions=None, index=0):
+    """R2 key for output ``index`` of a job whose primary input is ``input_image``."""
+    renditions = renditions or rend.DEFAULT_RENDITIONS
+    base_name = os.path.splitext(os.path.basename(input_image))[0]
+    suffix = f"_{index}" if index else ''
+    return f"output_{key_prefix}_{base_name}{suffix}{rend.extension(renditions[index])}"
+
+
+def output_keys_for(input_image, key_prefix, renditions=None):
+    """R2 keys for every output rendition of a job."""
+    renditions = renditions or rend.DEFAULT_RENDITIONS
+    return [output_key_for(input_image, key_prefix, renditions, idx) for idx in range(len(renditions))]
+
+
+def build_actionjson_request(input_urls, action_json, output_urls, renditions=None):
+    """
+    Build the actionJSON request body.
     
-    # Get Adobe access token
-    print("\n[ADOBE] Getting access token...")
-    access_token = get_access_token()
-    if not access_token:
-        print("Error: Failed to get access token")
-        return None
+    For multiple inputs with actionJSON:
+    - First image in inputs[0]
+    - Additional images in options.additionalImages[]
     
-    # Prepare API request
-    # For multiple inputs with actionJSON:
-    # - First image in inputs[0]
-    # - Additional images in options.additionalImages[]
+    ``output_urls`` holds one presigned PUT URL per rendition (default: a
+    single PSD); a single URL string is also accepted.
+    """
+    renditions = renditions or rend.DEFAULT_RENDITIONS
+    if isinstance(output_urls, str):
+        output_urls = [output_urls]
     data = {
         "inputs": [{
             "storage": "external",
@@ -150,11 +189,9 @@ def process_with_actionjson(input_images, action_json_file, output_path=None):
         "options": {
             "actionJSON": action_json
         },
-        "outputs": [{
-            "storage": "external",
-            "type": "image/vnd.adobe.photoshop",
-            "href": output_url
-        }]
+        "outputs": [
+            rend.output_spec(rendition, url) for rendition, url in zip(renditions, output_urls)
+        ]
     }
     
     # Add additional images if present
@@ -162,12 +199,14 @@ def process_with_actionjson(input_images, action_json_file, output_path=None):
         data["options"]["additionalImages"] = [
             {"storage": "external", "href": url} for url in input_urls[1:]
         ]
-        print(f"\n[INFO] Using {len(input_urls)} inputs: 1 primary + {len(input_urls) - 1} additional")
     
-    # Call Adobe actionJSON API
-    print("\n[ADOBE] Calling actionJSON API...")
-    response = requests.post(
-        'https://image.adobe.io/pie/psdService/actionJSON',
+    return data
+
+
+def submit_actionjson_job(access_token, data):
+    """Submit an actionJSON job and return its status URL, or None on failure."""
+    response = limited_request(
+        get_session(), 'POST', f'{PHOTOSHOP_API_URL}/pie/psdService/actionJSON',
         headers={
             'Authorization': f'Bearer {access_token}',
             'x-api-key': CLIENT_ID,
@@ -176,81 +215,500 @@ def process_with_actionjson(input_images, action_json_file, output_path=None):
         json=data
     )
     
+    if response.status_code == 401:
+        # Token was revoked or expired early; make the next job fetch a new one
+        get_token_provider(CLIENT_ID, CLIENT_SECRET).invalidate()
+    
     if response.status_code not in [200, 202]:
         print(f"Error: API call failed: {response.status_code}")
         print(response.text)
         return None
     
     result = response.json()
-    print(f"Job submitted: {result.get('_links', {}).get('self', {}).get('href', 'N/A')}")
+    return result.get('_links', {}).get('self', {}).get('href')
+
+
+def api_headers(access_token=None):
+    """Photoshop API request headers; without a token, the cached one is used."""
+    return {
+        'Authorization': f'Bearer {access_token or get_access_token()}',
+        'x-api-key': CLIENT_ID
+    }
+
+
+def wait_for_job(job_href, access_token=None, timeout=120):
+    """
+    Poll a job with adaptive backoff until it reaches a terminal status.
+    
+    Returns:
+        Tuple of (status, job_result); status is "timeout" if the job is still running after ``timeout`` seconds
+    """
+    return poll_job(
+        job_href,
+        lambda: api_headers(access_token),
+        timeout=timeout,
+        session=get_session(),
+        on_status=lambda status: print(f"  Status: {status}")
+    )
+
+
+def input_keys_for(input_images, r2_keys):
+    """R2 keys of a job's inputs: its temporary keys, or the content-addressed ones."""
+    if r2_keys:
+        return list(r2_keys)
+    return [r2_cas.cas_key(path) for path in input_images]
+
+
+def presign_job_urls(r2_client, job):
+    """(Re-)mint a job's input GET and output PUT URLs and note when they were minted."""
+    if job.get('input_keys'):
+        job['input_urls'] = [
+            generate_r2_presigned_url(r2_client, key, operation='get_object', expiration=PRESIGN_EXPIRATION)
+            for key in job['input_keys']
+        ]
+    job['output_urls'] = [
+        generate_r2_presigned_url(r2_client, key, operation='put_object', expiration=PRESIGN_EXPIRATION)
+        for key in job['output_keys']
+    ]
+    job['urls_minted_at'] = time.time()
+
+
+def refresh_presigned_urls(r2_client, job, margin=PRESIGN_REMINT_MARGIN):
+    """
+    Re-mint a job's presigned URLs if they expire within ``margin`` seconds.
+    
+    Returns:
+        True if the URLs were re-minted
+    """
+    if time.time() - job.get('urls_minted_at', 0) < PRESIGN_EXPIRATION - margin:
+        return False
+    print("  Re-minting presigned URLs close to expiry")
+    presign_job_urls(r2_client, job)
+    return True
+
+
+def journal_stage(job, stage, status=None):
+    """Record a journaled job's stage; a no-op for jobs without a journal id."""
+    journal = get_job_journal()
+    if journal is not None and job.get('journal_id'):
+        journal.record(job['journal_id'], stage, job, status)
+
+
+def start_job(r2_client, input_images, action_json, access_token=None, timings=None, input_urls=None,
+              renditions=None, journal_id=None, uploaded=None):
+    """
+    Upload a job's inputs to R2 and submit it.
+    
+    If ``input_urls`` is given the inputs are already in R2 (e.g. shared by
+    several jobs in fan-out mode): the upload is skipped and the caller stays
+    responsible for deleting them. ``uploaded`` is the result of an earlier
+    upload_inputs call for this job (e.g. run while its actions were still
+    being generated); the job takes over its temporary keys. ``renditions`` lists the outputs to
+    request (default: a single PSD), each under its own R2 key. With a
+    ``journal_id`` each stage is recorded in the job journal so an
+    interrupted run can resume the job (see resume_job).
+    
+    Returns:
+        Job dictionary with its temporary R2 keys and job href, or None on failure
+    """
+    if timings is None:
+        timings = {}
+    key_prefix = make_key_prefix()
+    
+    stage_start = time.perf_counter()
+    input_keys = None
+    if uploaded is not None:
+        input_urls, r2_keys = uploaded
+        input_keys = input_keys_for(input_images, r2_keys)
+    elif input_urls is None:
+        # Upload all input images to R2 and get URLs
+        print("\n[UPLOAD] Uploading images to R2...")
+        input_urls, r2_keys = upload_inputs(r2_client, input_images, key_prefix)
+        input_keys = input_keys_for(input_images, r2_keys)
+    else:
+        r2_keys = []
+    
+    # Prepare output paths in R2, one per rendition
+    renditions = list(renditions or rend.DEFAULT_RENDITIONS)
+    output_keys = output_keys_for(input_images[0], key_prefix, renditions)
+    job = {
+        'input_images': input_images,
+        'r2_keys': r2_keys,
+        'input_keys': input_keys,
+        'input_urls': input_urls,
+        'output_keys': output_keys,
+        'renditions': renditions,
+        'job_href': None,
+        'journal_id': journal_id
+    }
+    presign_job_urls(r2_client, job)
+    timings['upload'] = time.perf_counter() - stage_start
+    
+    print(f"\n[OUTPUT] Output will be: {', '.join(output_keys)}")
+    journal_stage(job, job_journal.STAGE_UPLOADED)
+    return submit_job(r2_client, job, action_json, access_token, timings)
+
+
+def submit_job(r2_client, job, action_json, access_token=None, timings=None):
+    """
+    Submit a job whose inputs are already in R2.
+    
+    Returns:
+        The job dictionary with its job href, or None on failure (the job's
+        temporary objects are deleted)
+    """
+    if timings is None:
+        timings = {}
+    
+    # Get Adobe access token
+    if access_token is None:
+        print("\n[ADOBE] Getting access token...")
+        access_token = get_access_token()
+    if not access_token:
+        print("Error: Failed to get access token")
+        cleanup_job(r2_client, job, timings)
+        journal_stage(job, job_journal.STAGE_FAILED, 'no access token')
+        return None
+    
+    # Prepare API request
+    input_urls = job['input_urls']
+    data = build_actionjson_request(input_urls, action_json, job['output_urls'], job['renditions'])
+    if len(input_urls) > 1:
+        print(f"\n[INFO] Using {len(input_urls)} inputs: 1 primary + {len(input_urls) - 1} additional")
+    
+    # Call Adobe actionJSON API
+    print("\n[ADOBE] Calling actionJSON API...")
+    stage_start = time.perf_counter()
+    job['job_href'] = submit_actionjson_job(access_token, data)
+    timings['submit'] = time.perf_counter() - stage_start
+    if not job['job_href']:
+        cleanup_job(r2_client, job, timings)
+        journal_stage(job, job_journal.STAGE_FAILED, 'submit failed')
+        return None
+    print(f"Job submitted: {job['job_href']}")
+    journal_stage(job, job_journal.STAGE_SUBMITTED)
+    
+    return job
+
+
+def resume_job(r2_client, journal_id, action_json, access_token=None, timings=None):
+    """
+    Pick up a job recorded in the journal by an earlier, interrupted run.
+    
+    - submitted: the job is returned as is, to be polled again
+    - uploaded: URLs close to expiry are re-minted and the job is submitted
+      (jobs on caller-supplied input URLs are started over instead)
+    - done: the job is returned with job['done'] set if its outputs still exist
+    
+    Returns:
+        The job dictionary, or None if there is nothing to resume and the job
+        should be started from scratch
+    """
+    journal = get_job_journal()
+    entry = journal.get(journal_id) if journal is not None and journal_id else None
+    if entry is None:
+        return None
+    
+    job = entry['job']
+    if entry['stage'] == job_journal.STAGE_SUBMITTED:
+        print(f"\n[RESUME] Polling job submitted by an earlier run: {job['job_href']}")
+        return job
+    if entry['stage'] == job_journal.STAGE_UPLOADED and job.get('input_keys'):
+        print("\n[RESUME] Submitting job uploaded by an earlier run")
+        if not job['r2_keys']:
+            # Content-addressed inputs may have been swept since
+            for path in job['input_images']:
+                r2_cas.ensure_uploaded(r2_client, R2_BUCKET_NAME, path)
+        refresh_presigned_urls(r2_client, job)
+        return submit_job(r2_client, job, action_json, access_token, timings)
+    if entry['stage'] == job_journal.STAGE_DONE and all(os.path.exists(p) for p in job.get('output_paths', [])):
+        print(f"\n[RESUME] Already completed: {', '.join(job['output_paths'])}")
+        job['done'] = True
+        return job
+    
+    journal.forget(journal_id)
+    return None
+
+
+def discard_uploaded(r2_client, uploaded):
+    """Delete the temporary keys of inputs uploaded for a job that is not started after all."""
+    if uploaded is not None and uploaded[1]:
+        schedule_delete(r2_client, R2_BUCKET_NAME, uploaded[1])
+
+
+def default_output_path(input_images, renditions=None):
+    """Default local output path for a job whose primary input is input_images[0]."""
+    renditions = renditions or rend.DEFAULT_RENDITIONS
+    base_name = os.path.splitext(os.path.basename(input_images[0]))[0]
+    return f"output_images/{base_name}_output{rend.extension(renditions[0])}"
+
+
+def cached_result(input_images, action_json, output_path, r2_client=None, renditions=None):
+    """
+    Copy cached outputs for these inputs and actions next to ``output_path``.
+    
+    It is a hit only if every requested rendition is cached.
+    
+    Returns:
+        Tuple of (hit, cache_keys); cache_keys has one key per rendition and
+        is None when the cache is disabled
+    """
+    cache = get_result_cache(r2_client, R2_BUCKET_NAME)
+    if cache is None:
+        return False, None
+    renditions = renditions or rend.DEFAULT_RENDITIONS
+    keys = [result_key(input_images, action_json, rend.rendition_id(r)) for r in renditions]
+    paths = rend.rendition_paths(output_path, renditions)
+    return all(cache.get(key, path) for key, path in zip(keys, paths)), keys
+
+
+def store_result(cache_keys, output_paths, r2_client=None):
+    """Add a finished job's outputs (one per cache key) to the result cache."""
+    cache = get_result_cache(r2_client, R2_BUCKET_NAME)
+    if cache is None or cache_keys is None:
+        return
+    if isinstance(cache_keys, str):
+        cache_keys, output_paths = [cache_keys], [output_paths]
+    try:
+        for key, path in zip(cache_keys, output_paths):
+            cache.put(key, path)
+    except OSError as e:
+        print(f"  Warning: Could not cache result: {e}")
+
+
+def download_outputs(r2_client, output_keys, output_paths):
+    """Download each output rendition from R2 to its local path."""
+    for key, path in zip(output_keys, output_paths):
+        print(f"\n[DOWNLOAD] Downloading result to: {path}")
+        os.makedirs(os.path.dirname(path) if os.path.dirname(path) else '.', exist_ok=True)
+        download_from_r2(r2_client, key, path)
+
+
+def finish_job(r2_client, job, output_path=None, timings=None):
+    """
+    Download a succeeded job's outputs from R2, then delete its temporary objects.
+    
+    Every rendition is written next to ``output_path`` (see
+    renditions.rendition_paths); their paths are stored in
+    job['output_paths']. Returns the first rendition's path.
+    """
+    if timings is None:
+        timings = {}
+    renditions = job.get('renditions') or rend.DEFAULT_RENDITIONS
+    
+    # Download results from R2
+    if output_path is None:
+        output_path = default_output_path(job['input_images'], renditions)
+    job['output_paths'] = rend.rendition_paths(output_path, renditions)
+    
+    stage_start = time.perf_counter()
+    download_outputs(r2_client, job['output_keys'], job['output_paths'])
+    timings['download'] = time.perf_counter() - stage_start
+    
+    cleanup_job(r2_client, job, timings)
+    journal_stage(job, job_journal.STAGE_DONE, 'succeeded')
+    return job['output_paths'][0]
+
+
+def cleanup_job(r2_client, job, timings=None):
+    """
+    Queue a job's temporary input and output objects for deletion from R2.
+    
+    The keys are deleted in batches by a background thread (see r2_cleanup.py).
+    """
+    print("\n[CLEANUP] Cleaning up temporary files...")
+    stage_start = time.perf_counter()
+    schedule_delete(r2_client, R2_BUCKET_NAME, job['r2_keys'] + job['output_keys'])
+    if timings is not None:
+        timings['cleanup'] = time.perf_counter() - stage_start
+
+
+def process_with_actionjson(input_images, action_json_file, output_path=None,
+                            r2_client=None, access_token=None, timings=None, optimize=None,
+                            renditions=None, uploaded=None):
+    """
+    Process images using Adobe actionJSON endpoint with multiple inputs.
+    
+    According to Adobe docs, for multiple images:
+    - First image goes in inputs[0]
+    - Additional images go in options.additionalImages[]
+    - Reference additional images in actionJSON using ACTION_JSON_OPTIONS_ADDITIONAL_IMAGES_X
+    
+    ``action_json_file`` may also be an already-loaded list of actions, e.g.
+    straight from the fluxa generator, so nothing is written to disk.
+    
+    An existing R2 client and access token can be passed in to share them
+    across jobs, and ``uploaded`` (from upload_inputs) to use inputs that
+    were uploaded ahead of time. If a ``timings`` dict is given, the wall
+    time of each stage (preprocess, upload, submit, poll, download,
+    cleanup) is recorded into it in seconds.
+    Inputs are checked, and re-encoded if over the input budget, before
+    upload (see preprocess.py).
+    ``optimize`` runs the action chain optimizer before submitting.
+    
+    ``renditions`` lists the outputs to request, e.g.
+    ``[{'format': 'jpeg', 'quality': 8, 'width': 2048}]`` (default: one PSD).
+    With several renditions each is saved next to ``output_path`` with its
+    own extension; the first one's path is returned.
+    
+    Each stage is recorded in the job journal (see job_journal.py), so
+    running the same job again after an interruption resumes polling the
+    submitted job instead of uploading and submitting it a second time.
+    """
+    print(f"\n[START] Processing {len(input_images)} images with actionJSON")
+    if timings is None:
+        timings = {}
+    
+    # Validate inputs
+    if not all([CLIENT_ID, CLIENT_SECRET, R2_ACCOUNT_ID, R2_BUCKET_NAME, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY]):
+        print("Error: Missing required environment variables")
+        return None
+    
+    for img_path in input_images:
+        if not os.path.exists(img_path):
+            print(f"Error: Image not found: {img_path}")
+            return None
+    
+    # Reject inputs the API cannot take before uploading anything
+    stage_start = time.perf_counter()
+    try:
+        input_images = prepare_inputs(input_images)
+    except InputError as e:
+        print(f"Error: {e}")
+        discard_uploaded(r2_client, uploaded)
+        return None
+    timings['preprocess'] = time.perf_counter() - stage_start
+    
+    # Load action JSON
+    if isinstance(action_json_file, list):
+        action_json = action_json_file
+        if optimize is None:
+            optimize = OPTIMIZE_ACTIONS
+        if optimize:
+            action_json, report = optimize_actions(action_json)
+            print(f"[OPTIMIZE] {format_report(report)}")
+    elif not os.path.exists(action_json_file):
+        print(f"Error: Action JSON file not found: {action_json_file}")
+        return None
+    else:
+        action_json = load_action_json(action_json_file, optimize)
+    
+    print(f"Action JSON loaded: {len(action_json)} steps")
+    
+    # Initialize R2 client
+    if r2_client is None:
+        r2_client = get_r2_client()
+    
+    # Same inputs and actions as an earlier run: reuse its output
+    renditions = rend.parse_renditions(renditions)
+    if output_path is None:
+        output_path = default_output_path(input_images, renditions)
+    hit, cache_keys = cached_result(input_images, action_json, output_path, r2_client, renditions)
+    if hit:
+        print(f"\n[CACHE] Reused cached result: {output_path}")
+        discard_uploaded(r2_client, uploaded)
+        return output_path
+    
+    # A journaled run of this job that was interrupted: poll or submit it
+    # instead of starting over
+    journal_id = journal_key(input_images, action_json, output_path, renditions) if get_job_journal() else None
+    job = resume_job(r2_client, journal_id, action_json, access_token, timings)
+    if job is not None:
+        discard_uploaded(r2_client, uploaded)
+        if job.get('done'):
+            return job['output_paths'][0]
+    else:
+        job = start_job(r2_client, input_images, action_json, access_token, timings,
+                        renditions=renditions, journal_id=journal_id, uploaded=uploaded)
+    if job is None:
+        return None
     
     # Poll for completion
     print("\n[ADOBE] Polling for job completion...")
-    status = "pending"
-    max_attempts = 60
-    attempt = 0
-    
-    while status in ["running", "pending"] and attempt < max_attempts:
-        time.sleep(2)
-        attempt += 1
-        
-        job_response = requests.get(
-            result['_links']['self']['href'],
-            headers={
-                'Authorization': f'Bearer {access_token}',
-                'x-api-key': CLIENT_ID
-            }
-        )
-        job_result = job_response.json()
-        status = job_result.get("outputs", [{}])[0].get('status', 'failed')
-        print(f"  Status: {status} (attempt {attempt}/{max_attempts})")
+    stage_start = time.perf_counter()
+    status, job_result = wait_for_job(job['job_href'], access_token)
+    timings['poll'] = time.perf_counter() - stage_start
     
     if status != "succeeded":
         print(f"\nError: Job failed with status: {status}")
         print(json.dumps(job_result, indent=2))
+        cleanup_job(r2_client, job, timings)
+        journal_stage(job, job_journal.STAGE_FAILED, status)
         return None
     
     print("\n[SUCCESS] Job completed successfully!")
     
-    # Download result from R2
-    if output_path is None:
-        os.makedirs("output_images", exist_ok=True)
-        output_path = f"output_images/{base_name}_output.psd"
+    output_path = finish_job(r2_client, job, output_path, timings)
+    store_result(cache_keys, job['output_paths'], r2_client)
     
-    print(f"\n[DOWNLOAD] Downloading result to: {output_path}")
-    os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else '.', exist_ok=True)
-    download_from_r2(r2_client, output_r2_key, output_path)
-    
-    # Cleanup R2 files
-    print("\n[CLEANUP] Cleaning up temporary files...")
-    for key in r2_keys + [output_r2_key]:
-        try:
-            r2_client.delete_object(Bucket=R2_BUCKET_NAME, Key=key)
-        except Exception as e:
-            print(f"  Warning: Could not delete {key}: {e}")
-    
-    print(f"\n[COMPLETE] Output saved to: {output_path}")
+    print(f"\n[COMPLETE] Output saved to: {', '.join(job['output_paths'])}")
     return output_path
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: python actions.py <input_images> <action_json_file> [output_path]")
+    # None leaves the choice to OPTIMIZE_ACTIONS
+    optimize = True if '--optimize' in sys.argv else None
+    try:
+        argv, preview_edge, final = preview.split_preview_args(arg for arg in sys.argv[1:] if arg != '--optimize')
+        args, rendition_specs = rend.split_rendition_args(argv)
+        renditions = rend.parse_renditions(rendition_specs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if final:
+        saved = preview.load_preview('actions')
+        if saved is None:
+            print("Error: No preview to finalize; run with --preview first")
+            sys.exit(1)
+        print(f"[PREVIEW] Running the last preview at full resolution: {saved['action_json_file']}")
+        input_images = saved['input_images']
+        action_json_file = saved['action_json_file']
+        output_path = saved['output_path']
+        renditions = rend.parse_renditions(saved['renditions'])
+        if saved['optimize']:
+            optimize = True
+    elif len(args) < 2:
+        print("Usage: python actions.py <input_images> <action_json_file> [output_path] "
+              "[--optimize] [--rendition SPEC ...] [--preview[=LONG_EDGE]]")
+        print("       python actions.py --final")
         print("\nExamples:")
         print("  Single image:")
         print("    python actions.py input_images/image.jpg action.json")
         print("\n  Multiple images (comma-separated):")
         print("    python actions.py input_images/img1.jpg,input_images/img2.jpg action.json")
+        print("\n  PSD plus a 2048px web JPEG:")
+        print("    python actions.py input_images/image.jpg action.json --rendition psd "
+              "--rendition jpeg:quality=8,width=2048")
+        print("\n  Quick 1024px preview, then the same job at full resolution:")
+        print("    python actions.py input_images/image.jpg action.json --preview")
+        print("    python actions.py --final")
         sys.exit(1)
+    else:
+        # Parse input images
+        input_images = [path.strip() for path in args[0].split(',')]
+        action_json_file = args[1]
+        output_path = args[2] if len(args) > 2 else None
     
-    # Parse input images
-    input_arg = sys.argv[1]
-    input_images = [path.strip() for path in input_arg.split(',')]
-    
-    action_json_file = sys.argv[2]
-    output_path = sys.argv[3] if len(sys.argv) > 3 else None
-    
-    result = process_with_actionjson(input_images, action_json_file, output_path)
+    if preview_edge and not final:
+        input_paths = input_images
+        # Reject missing or unreadable inputs before building proxies from them
+        try:
+            input_images = [preview.make_proxy(path, preview_edge) for path in prepare_inputs(input_paths)]
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        result = process_with_actionjson(
+            input_images, action_json_file, preview.preview_output_path(input_paths[0]),
+            optimize=optimize, renditions=preview.preview_renditions()
+        )
+        if result:
+            preview.save_preview('actions', input_paths, action_json_file, output_path, rendition_specs,
+                                 optimize=optimize, long_edge=preview_edge)
+            print("[PREVIEW] Run `python actions.py --final` for the full-resolution output")
+    else:
+        result = process_with_actionjson(
+            input_images, action_json_file, output_path, optimize=optimize, renditions=renditions
+        )
     
     if result:
         print(f"\n✓ Success! Output: {result}")
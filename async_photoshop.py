@@ -0,0 +1,272 @@
+"""
+Asyncio Photoshop API client.
+Fetches IMS tokens, submits actionJSON jobs, polls them and downloads
+outputs without tying up a thread per job, so one event loop can keep
+hundreds of jobs in flight.
+"""
+
+import os
+import time
+import asyncio
+import aiohttp
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+from job_poller import ACTIVE_STATUSES, Backoff, job_status
+from rate_limit import THROTTLE_RETRIES, get_rate_limiter, observe, retry_after_seconds
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+CLIENT_ID = os.getenv('CLIENT_ID')
+CLIENT_SECRET = os.getenv('CLIENT_SECRET')
+
+IMS_TOKEN_URL = os.getenv('IMS_TOKEN_URL', 'https://ims-na1.adobelogin.com/ims/token/v2')
+ACTION_JSON_URL = f"{os.getenv('PHOTOSHOP_API_URL', 'https://image.adobe.io')}/pie/psdService/actionJSON"
+IMS_SCOPE = 'openid,AdobeID,read_organizations,firefly_api,ff_apis'
+
+
+class AsyncPhotoshopClient:
+    """
+    Asyncio client for the Photoshop actionJSON API.
+
+    Use as an async context manager so the underlying connection pool is
+    opened and closed with the client:
+
+        async with AsyncPhotoshopClient() as client:
+            result = await client.run_job(data)
+    """
+
+    def __init__(self, client_id=None, client_secret=None, max_connections=100,
+                 backoff=None, poll_timeout=600.0, chunk_size=1024 * 1024,
+                 token_provider=None):
+        """
+        Args:
+            client_id: Adobe client ID (default: CLIENT_ID env variable)
+            client_secret: Adobe client secret (default: CLIENT_SECRET env variable)
+            max_connections: Upper bound on concurrently open HTTP connections
+            backoff: job_poller.Backoff schedule for status checks (default: Backoff())
+            poll_timeout: Seconds after which a job that is still running is abandoned
+            chunk_size: Read size for streamed output downloads
+            token_provider: Optional ims_token.TokenProvider; when given, tokens come from
+                its shared memory/disk cache instead of a per-client IMS request
+        """
+        self.client_id = client_id or CLIENT_ID
+        self.client_secret = client_secret or CLIENT_SECRET
+        self.max_connections = max_connections
+        self.backoff = backoff or Backoff()
+        self.poll_timeout = poll_timeout
+        self.chunk_size = chunk_size
+        self.token_provider = token_provider
+        self._session = None
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        self._session = aiohttp.ClientSession(connector=connector)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_access_token(self):
+        """
+        Get an Adobe access token.
+
+        Concurrent callers share a single IMS request, and the token is
+        reused until shortly before it expires.
+        """
+        if self.token_provider is not None:
+            # Only go to a thread when the provider has to touch disk or IMS
+            token = self.token_provider.peek() or await asyncio.to_thread(self.token_provider.get)
+            if not token:
+                raise RuntimeError("IMS token request failed")
+            return token
+
+        async with self._token_lock:
+            if self._token and time.time() < self._token_expires_at:
+                return self._token
+
+            params = {
+                'client_secret': self.client_secret,
+                'grant_type': 'client_credentials',
+                'scope': IMS_SCOPE
+            }
+            async with self._limited(
+                'POST', f'{IMS_TOKEN_URL}?client_id={self.client_id}', service='ims', data=params
+            ) as response:
+                result = await response.json(content_type=None)
+
+            token = result.get('access_token')
+            if not token:
+                raise RuntimeError(f"IMS token request failed: {response.status}")
+
+            # Refresh a minute early so in-flight jobs never use an expired token
+            self._token = token
+            self._token_expires_at = time.time() + float(result.get('expires_in', 3600)) - 60
+            return token
+
+    async def invalidate_token(self):
+        """Drop the cached token, e.g. after the API rejected it with a 401."""
+        if self.token_provider is not None:
+            await asyncio.to_thread(self.token_provider.invalidate)
+        self._token = None
+        self._token_expires_at = 0.0
+
+    async def _headers(self):
+        return {
+            'Authorization': f'Bearer {await self.get_access_token()}',
+            'x-api-key': self.client_id
+        }
+
+    @asynccontextmanager
+    async def _limited(self, method, url, service='photoshop', **kwargs):
+        """Send a request through the service's shared rate limiter and report its outcome."""
+        await get_rate_limiter(service).acquire_async()
+        started = time.perf_counter()
+        try:
+            response = await self._session.request(method, url, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            observe(service, None, time.perf_counter() - started)
+            raise
+        observe(service, response.status, time.perf_counter() - started, retry_after_seconds(response))
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def submit(self, data):
+        """
+        Submit an actionJSON request body and return the job status URL.
+
+        A 429 is re-sent once the rate limiter's Retry-After pause is over.
+        """
+        for attempt in range(THROTTLE_RETRIES + 1):
+            async with self._limited(
+                'POST', ACTION_JSON_URL, headers=await self._headers(), json=data
+            ) as response:
+                if response.status == 429 and attempt < THROTTLE_RETRIES:
+                    continue
+                if response.status == 401:
+                    # Token was revoked or expired early; make the next job fetch a new one
+                    await self.invalidate_token()
+                if response.status not in (200, 202):
+                    raise RuntimeError(
+                        f"API call failed: {response.status} {await response.text()}"
+                    )
+                result = await response.json(content_type=None)
+            return result['_links']['self']['href']
+
+    async def poll(self, job_href):
+        """
+        Poll a job until it reaches a terminal status.
+
+        Polls start fast and back off exponentially with jitter; 429/5xx
+        responses are retried, honouring Retry-After, and so are status
+        checks that fail with a network error.
+
+        Returns:
+            Tuple of (status, job_result)
+        """
+        deadline = time.monotonic() + self.poll_timeout
+        attempt = 0
+        retry_after = None
+        job_result = {}
+
+        while True:
+            wait = self.backoff.delay(attempt)
+            if retry_after is not None:
+                wait = max(wait, retry_after)
+            if time.monotonic() + wait > deadline:
+                return 'timeout', job_result
+            await asyncio.sleep(wait)
+            attempt += 1
+
+            try:
+                async with self._limited('GET', job_href, headers=await self._headers()) as response:
+                    retry_after = retry_after_seconds(response)
+                    if response.status == 429 or response.status >= 500:
+                        continue
+                    if response.status >= 400:
+                        return 'failed', {'http_status': response.status, 'body': await response.text()}
+                    job_result = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # Transient network errors are retried on the normal schedule
+                retry_after = None
+                continue
+
+            status = job_status(job_result)
+            if status not in ACTIVE_STATUSES:
+                return status, job_result
+
+    async def download(self, url, file_path):
+        """Stream a URL to a local file without buffering it in memory."""
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        async with self._session.get(url) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Download failed: {response.status}")
+            with open(file_path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    f.write(chunk)
+        return file_path
+
+    async def run_job(self, data, download_url=None, output_path=None):
+        """
+        Submit a job, wait for it, and optionally download its output.
+
+        Args:
+            data: actionJSON request body
+            download_url: URL the output can be fetched from once the job succeeds
+            output_path: Local path for the downloaded output
+
+        Returns:
+            Dictionary with status, job href, output path, error and stage timings
+        """
+        timings = {}
+        record = {'status': 'failed', 'job_href': None, 'output': None,
+                  'error': None, 'timings': timings}
+        try:
+            stage_start = time.perf_counter()
+            record['job_href'] = await self.submit(data)
+            timings['submit'] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            status, job_result = await self.poll(record['job_href'])
+            timings['poll'] = time.perf_counter() - stage_start
+            record['status'] = status
+            if status != 'succeeded':
+                record['error'] = f"Job finished with status: {status}"
+                return record
+
+            if download_url and output_path:
+                stage_start = time.perf_counter()
+                record['output'] = await self.download(download_url, output_path)
+                timings['download'] = time.perf_counter() - stage_start
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError, KeyError) as e:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+        return record
+
+    async def run_jobs(self, jobs):
+        """
+        Run many jobs concurrently on the current event loop.
+
+        Args:
+            jobs: Iterable of dicts with "data" and optional "download_url"/"output_path"
+
+        Returns:
+            List of job records, in the same order as ``jobs``
+        """
+        return await asyncio.gather(*(
+            self.run_job(job['data'], job.get('download_url'), job.get('output_path'))
+            for job in jobs
+        ))
@@ -0,0 +1,563 @@
+"""
+Concurrent batch executor for actions.py.
+Runs many (images, action JSON) jobs through the actionJSON endpoint with a
+bounded worker pool and reports per-job results and aggregate throughput.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import actions
+import renditions as rend
+import preprocess
+from async_photoshop import AsyncPhotoshopClient
+from ims_token import get_token_provider
+from job_poller import MultiplexedPoller
+from r2_cleanup import schedule_delete
+from rate_limit import adaptive_concurrency
+from job_journal import STAGE_FAILED, STAGE_SUBMITTED, STAGE_UPLOADED, get_job_journal, journal_key
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.psd')
+STAGES = ('upload', 'submit', 'poll', 'download', 'cleanup')
+
+
+def collect_images(directory):
+    """Return the image files in a directory, sorted by name."""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def load_manifest(manifest_path):
+    """
+    Load batch jobs from a JSON manifest.
+
+    The manifest is an array of objects with:
+    - "inputs": list of image paths (or "input": a single image path)
+    - "action": path to the action JSON file
+    - "output": optional output path
+    - "optimize": optional, run the action chain optimizer for this job
+    - "renditions": optional list of output specs such as "jpeg:quality=8,width=2048"
+
+    Relative paths are resolved against the manifest's directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    def resolve(path):
+        return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+    with open(manifest_path, 'r') as f:
+        entries = json.load(f)
+
+    jobs = []
+    for entry in entries:
+        inputs = entry.get('inputs') or [entry['input']]
+        jobs.append({
+            'inputs': [resolve(path) for path in inputs],
+            'action': resolve(entry['action']),
+            'output': resolve(entry['output']) if entry.get('output') else None,
+            'optimize': entry.get('optimize'),
+            'renditions': rend.parse_renditions(entry['renditions']) if entry.get('renditions') else None
+        })
+    return jobs
+
+
+def expand_action_files(paths):
+    """Expand directories in a list of action file paths to the .json files they contain."""
+    action_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            action_files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json')
+            ))
+        else:
+            action_files.append(path)
+    return action_files
+
+
+def build_jobs(images, action_files, output_dir='output_images', renditions=None):
+    """Build one job per (image, action file) pair."""
+    renditions = rend.parse_renditions(renditions)
+    ext = rend.extension(renditions[0])
+    jobs = []
+    for image in images:
+        image_base = os.path.splitext(os.path.basename(image))[0]
+        for action_file in action_files:
+            action_base = os.path.splitext(os.path.basename(action_file))[0]
+            jobs.append({
+                'inputs': [image],
+                'action': action_file,
+                'output': os.path.join(output_dir, f"{image_base}_{action_base}{ext}"),
+                'renditions': renditions
+            })
+    return jobs
+
+
+def preprocess_jobs(jobs, workers=None):
+    """
+    Check every input of the batch up front and re-encode those that need it
+    (see preprocess.py), spreading re-encoding over a process pool.
+
+    Inputs shared by several jobs are prepared once. Each job's inputs are
+    replaced by the files to upload (the originals are kept in
+    "source_inputs" for the report); a job with a rejected input gets an
+    "input_error" and fails without uploading anything. Jobs marked
+    "prepared" (e.g. by run_fanout) are left alone.
+    """
+    jobs = [job for job in jobs if not job.get('prepared')]
+    if not jobs:
+        return
+    inputs = [path for job in jobs for path in job['inputs']]
+    stage_start = time.perf_counter()
+    prepared = dict(zip(inputs, preprocess.prepare_many(inputs, workers=workers)))
+    rejected = 0
+    for job in jobs:
+        errors = [str(prepared[path]) for path in job['inputs'] if isinstance(prepared[path], preprocess.InputError)]
+        if errors:
+            job['input_error'] = '; '.join(errors)
+            rejected += 1
+        else:
+            job['source_inputs'] = job['inputs']
+            job['inputs'] = [prepared[path] for path in job['inputs']]
+            job['prepared'] = True
+    print(f"[BATCH] Checked {len(set(inputs))} inputs in {time.perf_counter() - stage_start:.2f}s"
+          + (f", {rejected} jobs rejected" if rejected else ""))
+
+
+def _new_record(job):
+    return {
+        'inputs': job.get('source_inputs', job['inputs']),
+        'action': job['action'],
+        'output': None,
+        'outputs': [],
+        'status': 'failed',
+        'error': None,
+        'timings': {},
+        'elapsed': None,
+        'cached': False,
+        'resumed': False,
+        'cache_keys': None
+    }
+
+
+def summarize(results, wall_seconds):
+    """Aggregate throughput and mean per-stage timings over job results."""
+    succeeded = sum(1 for r in results if r['status'] == 'succeeded')
+    stage_means = {}
+    for stage in STAGES:
+        values = [r['timings'][stage] for r in results if stage in r['timings']]
+        if values:
+            stage_means[stage] = sum(values) / len(values)
+
+    return {
+        'jobs': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'resumed': sum(1 for r in results if r.get('resumed')),
+        'wall_seconds': wall_seconds,
+        'jobs_per_second': len(results) / wall_seconds if wall_seconds > 0 else 0.0,
+        'mean_stage_seconds': stage_means
+    }
+
+
+def run_batch(jobs, max_workers=8, max_in_flight=200):
+    """
+    Run jobs concurrently with a bounded worker pool.
+
+    Workers only do the upload/submit and download/cleanup stages. While a
+    job runs server-side it is tracked by a single MultiplexedPoller thread,
+    so waiting jobs do not hold a worker. One R2 client is shared by all
+    workers; access tokens come from the shared token cache.
+
+    At most ``max_in_flight`` jobs are in flight. An AIMD controller fed
+    with the latency, errors and 429s of every Adobe API call lowers that
+    limit when the API pushes back and raises it again while it stays
+    healthy (see rate_limit.py).
+
+    Returns:
+        Dictionary with per-job "results" (in job order) and a "summary"
+    """
+    print(f"\n[BATCH] Running {len(jobs)} jobs with {max_workers} workers")
+    started = time.perf_counter()
+    preprocess_jobs(jobs)
+
+    r2_client = actions.get_r2_client()
+    # Warm the token cache so workers start without an IMS round trip
+    if not actions.get_access_token():
+        print("Error: Failed to get access token")
+        return None
+
+    results = [None] * len(jobs)
+    completed = queue.Queue()
+
+    with adaptive_concurrency(max_in_flight) as controller, \
+            MultiplexedPoller() as poller, ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        def job_done(idx):
+            controller.release()
+            completed.put(idx)
+
+        def finish(idx, started_job, poll_future, submitted_at):
+            record = results[idx]
+            try:
+                status, job_result = poll_future.result()
+                record['timings']['poll'] = time.perf_counter() - submitted_at
+                if status == 'succeeded':
+                    record['output'] = actions.finish_job(
+                        r2_client, started_job, jobs[idx].get('output'), record['timings']
+                    )
+                    record['outputs'] = started_job['output_paths']
+                    record['status'] = 'succeeded'
+                    actions.store_result(record['cache_keys'], record['outputs'], r2_client)
+                else:
+                    record['status'] = status
+                    record['error'] = f"Job finished with status: {status}"
+                    actions.cleanup_job(r2_client, started_job, record['timings'])
+                    actions.journal_stage(started_job, STAGE_FAILED, status)
+            except Exception as e:
+                record['status'] = 'failed'
+                record['error'] = str(e)
+            job_done(idx)
+
+        def start(idx):
+            job = jobs[idx]
+            job_started[idx] = time.perf_counter()
+            record = results[idx] = _new_record(job)
+            try:
+                if job.get('input_error'):
+                    raise preprocess.InputError(job['input_error'])
+                action_json = actions.load_action_json(job['action'], job.get('optimize'))
+                renditions = rend.parse_renditions(job.get('renditions'))
+                output_path = job.get('output') or actions.default_output_path(job['inputs'], renditions)
+                hit, record['cache_keys'] = actions.cached_result(
+                    job['inputs'], action_json, output_path, r2_client, renditions
+                )
+                if hit:
+                    record.update(status='succeeded', output=output_path, cached=True,
+                                  outputs=rend.rendition_paths(output_path, renditions))
+                    job_done(idx)
+                    return
+                journal_id = journal_key(job['inputs'], action_json, output_path, renditions) \
+                    if get_job_journal() else None
+                started_job = actions.resume_job(r2_client, journal_id, action_json, timings=record['timings'])
+                if started_job is not None and started_job.get('done'):
+                    record.update(status='succeeded', output=output_path, outputs=started_job['output_paths'],
+                                  resumed=True)
+                    job_done(idx)
+                    return
+                record['resumed'] = started_job is not None
+                if started_job is None:
+                    started_job = actions.start_job(
+                        r2_client, job['inputs'], action_json, timings=record['timings'],
+                        input_urls=job.get('input_urls'), renditions=renditions, journal_id=journal_id
+                    )
+            except Exception as e:
+                started_job = None
+                record['error'] = str(e)
+            if started_job is None:
+                record['error'] = record['error'] or "upload or submit failed"
+                job_done(idx)
+                return
+
+            submitted_at = time.perf_counter()
+            try:
+                poll_future = poller.track(started_job['job_href'], actions.api_headers)
+                poll_future.add_done_callback(
+                    lambda f: pool.submit(finish, idx, started_job, f, submitted_at)
+                )
+            except Exception as e:
+                # The job will never reach finish(): fail it here so the batch does not hang
+                record['error'] = str(e)
+                try:
+                    actions.cleanup_job(r2_client, started_job, record['timings'])
+                    actions.journal_stage(started_job, STAGE_FAILED, 'failed')
+                finally:
+                    job_done(idx)
+
+        def dispatch():
+            for idx in range(len(jobs)):
+                controller.acquire()
+                pool.submit(start, idx)
+
+        job_started = {}
+        threading.Thread(target=dispatch, name='batch-dispatch', daemon=True).start()
+
+        for done in range(1, len(jobs) + 1):
+            idx = completed.get()
+            results[idx]['elapsed'] = time.perf_counter() - job_started[idx]
+            print(f"[BATCH] {done}/{len(jobs)} {results[idx]['status']}: {results[idx]['action']}")
+
+    summary = summarize(results, time.perf_counter() - started)
+    summary['concurrency'] = {'final': controller.limit, **controller.stats}
+    print(f"\n[BATCH] {summary['succeeded']}/{summary['jobs']} succeeded in "
+          f"{summary['wall_seconds']:.1f}s ({summary['jobs_per_second']:.2f} jobs/s)")
+    return {'results': results, 'summary': summary}
+
+
+def run_fanout(input_images, action_files, output_dir='output_images', max_workers=None,
+               use_async=False, optimize=None, renditions=None):
+    """
+    Apply many presets to the same inputs, uploading them only once.
+
+    The inputs are uploaded (or found by content hash) a single time and
+    every preset is submitted as its own job against the same presigned GET
+    URLs, so all jobs run server-side at once and the wall time approaches
+    that of the slowest job. Outputs are written to ``output_dir`` as
+    ``<image>_<preset>.<ext>``, one file per rendition.
+
+    Returns:
+        Dictionary with per-job "results" (in preset order) and a "summary"
+    """
+    try:
+        input_images = preprocess.prepare_inputs(input_images)
+    except preprocess.InputError as e:
+        print(f"Error: {e}")
+        return None
+    jobs = build_jobs(input_images[:1], action_files, output_dir, renditions)
+    for job in jobs:
+        # Already checked above: run_batch skips its own preprocessing pass
+        job.update(inputs=input_images, optimize=optimize, prepared=True)
+    if max_workers is None:
+        max_workers = len(jobs)
+
+    print(f"\n[FANOUT] Applying {len(jobs)} presets to {os.path.basename(input_images[0])}")
+    r2_client = actions.get_r2_client()
+    stage_start = time.perf_counter()
+    input_urls, shared_keys = actions.upload_inputs(r2_client, input_images, actions.make_key_prefix())
+    upload_seconds = time.perf_counter() - stage_start
+    for job in jobs:
+        job['input_urls'] = input_urls
+
+    try:
+        if use_async:
+            batch = asyncio.run(run_batch_async(jobs, max_workers, max_in_flight=len(jobs)))
+        else:
+            batch = run_batch(jobs, max_workers=max_workers, max_in_flight=len(jobs))
+    finally:
+        # Per-job cleanup leaves the shared inputs alone
+        schedule_delete(r2_client, actions.R2_BUCKET_NAME, shared_keys)
+
+    if batch is not None:
+        batch['summary']['shared_upload_seconds'] = upload_seconds
+    return batch
+
+
+async def _run_job_async(client, job, r2_client, upload_slots):
+    """Run one job with uploads/downloads in threads and submit/poll on the event loop."""
+    timings = {}
+    started = time.perf_counter()
+    record = _new_record(job)
+    record['timings'] = timings
+    renditions = rend.parse_renditions(job.get('renditions'))
+    started_job = None
+    finished = False
+
+    try:
+        if job.get('input_error'):
+            raise preprocess.InputError(job['input_error'])
+        action_json = actions.load_action_json(job['action'], job.get('optimize'))
+        output_path = job.get('output') or actions.default_output_path(job['inputs'], renditions)
+        output_paths = rend.rendition_paths(output_path, renditions)
+        hit, cache_keys = await asyncio.to_thread(
+            actions.cached_result, job['inputs'], action_json, output_path, r2_client, renditions
+        )
+        if hit:
+            record.update(status='succeeded', output=output_path, outputs=output_paths, cached=True)
+            record['elapsed'] = time.perf_counter() - started
+            return record
+
+        journal_id = journal_key(job['inputs'], action_json, output_path, renditions) \
+            if get_job_journal() else None
+        started_job = await asyncio.to_thread(actions.resume_job, r2_client, journal_id, action_json, None, timings)
+        record['resumed'] = started_job is not None
+        if started_job is not None and started_job.get('done'):
+            finished = True
+            record.update(status='succeeded', output=output_path, outputs=started_job['output_paths'])
+            record['elapsed'] = time.perf_counter() - started
+            return record
+
+        if started_job is None:
+            key_prefix = actions.make_key_prefix()
+            started_job = {
+                'input_images': job['inputs'],
+                'r2_keys': [],
+                'input_keys': None,
+                'input_urls': job.get('input_urls'),
+                'output_keys': actions.output_keys_for(job['inputs'][0], key_prefix, renditions),
+                'renditions': renditions,
+                'job_href': None,
+                'journal_id': journal_id
+            }
+            async with upload_slots:
+                stage_start = time.perf_counter()
+                if started_job['input_urls'] is None:
+                    started_job['input_urls'], started_job['r2_keys'] = await asyncio.to_thread(
+                        actions.upload_inputs, r2_client, job['inputs'], key_prefix
+                    )
+                    started_job['input_keys'] = actions.input_keys_for(job['inputs'], started_job['r2_keys'])
+                actions.presign_job_urls(r2_client, started_job)
+                timings['upload'] = time.perf_counter() - stage_start
+            actions.journal_stage(started_job, STAGE_UPLOADED)
+
+            data = actions.build_actionjson_request(
+                started_job['input_urls'], action_json, started_job['output_urls'], renditions
+            )
+            stage_start = time.perf_counter()
+            started_job['job_href'] = await client.submit(data)
+            timings['submit'] = time.perf_counter() - stage_start
+            actions.journal_stage(started_job, STAGE_SUBMITTED)
+
+        stage_start = time.perf_counter()
+        record['status'], _ = await client.poll(started_job['job_href'])
+        timings['poll'] = time.perf_counter() - stage_start
+
+        if record['status'] == 'succeeded':
+            async with upload_slots:
+                # Downloads, deletes the temporary objects and marks the journal entry done
+                await asyncio.to_thread(actions.finish_job, r2_client, started_job, output_path, timings)
+            finished = True
+            record['output'] = output_path
+            record['outputs'] = started_job['output_paths']
+            await asyncio.to_thread(actions.store_result, cache_keys, started_job['output_paths'], r2_client)
+        else:
+            record['error'] = f"Job finished with status: {record['status']}"
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = str(e)
+    finally:
+        if started_job is not None and not finished:
+            await asyncio.to_thread(actions.cleanup_job, r2_client, started_job, timings)
+            actions.journal_stage(started_job, STAGE_FAILED, record['status'])
+
+    record['elapsed'] = time.perf_counter() - started
+    return record
+
+
+async def run_batch_async(jobs, max_workers=8, max_in_flight=200):
+    """
+    Run jobs on one event loop with the asyncio Photoshop client.
+
+    Submit and poll are non-blocking, so up to ``max_in_flight`` jobs can
+    wait on the server at once while at most ``max_workers`` R2 transfers
+    run in threads. As in run_batch, the in-flight limit backs off and
+    recovers with the AIMD controller.
+
+    Returns:
+        Dictionary with per-job "results" (in job order) and a "summary"
+    """
+    print(f"\n[BATCH] Running {len(jobs)} jobs on the event loop "
+          f"({max_workers} transfer workers, {max_in_flight} in flight)")
+    started = time.perf_counter()
+    preprocess_jobs(jobs)
+
+    r2_client = actions.get_r2_client()
+    upload_slots = asyncio.Semaphore(max_workers)
+
+    token_provider = get_token_provider(actions.CLIENT_ID, actions.CLIENT_SECRET)
+    with adaptive_concurrency(max_in_flight) as controller:
+        async with AsyncPhotoshopClient(token_provider=token_provider) as client:
+            async def bounded(job):
+                await controller.acquire_async()
+                try:
+                    return await _run_job_async(client, job, r2_client, upload_slots)
+                finally:
+                    controller.release()
+
+            results = await asyncio.gather(*(bounded(job) for job in jobs))
+
+    results = list(results)
+    summary = summarize(results, time.perf_counter() - started)
+    summary['concurrency'] = {'final': controller.limit, **controller.stats}
+    print(f"\n[BATCH] {summary['succeeded']}/{summary['jobs']} succeeded in "
+          f"{summary['wall_seconds']:.1f}s ({summary['jobs_per_second']:.2f} jobs/s)")
+    return {'results': results, 'summary': summary}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run actionJSON jobs over many images concurrently")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--manifest', help="JSON manifest of jobs")
+    source.add_argument('--images', help="Directory of input images")
+    source.add_argument('--fanout', metavar='IMAGES',
+                        help="Apply every --actions preset to these comma-separated inputs, uploaded once")
+    parser.add_argument('--actions', nargs='+', default=[],
+                        help="Action JSON files or directories of them (with --images or --fanout)")
+    parser.add_argument('--output-dir', default='output_images',
+                        help="Output directory (with --images or --fanout)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Maximum concurrent jobs (default: 8, or one per preset with --fanout)")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Submit and poll jobs on one asyncio event loop")
+    parser.add_argument('--max-in-flight', type=int, default=200,
+                        help="Upper bound for the adaptive number of jobs waiting on the server at once")
+    parser.add_argument('--optimize', action='store_true',
+                        help="Remove or merge redundant action steps before submitting")
+    parser.add_argument('--rendition', dest='renditions', action='append', default=[], metavar='SPEC',
+                        help="Output to request, repeatable: psd, jpeg:quality=8,width=2048, "
+                             "png:compression=small (default: psd)")
+    parser.add_argument('--report', help="Write per-job results and summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    try:
+        renditions = rend.parse_renditions(args.renditions) if args.renditions else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.fanout:
+        if not args.actions:
+            parser.error("--actions is required with --fanout")
+        input_images = [path.strip() for path in args.fanout.split(',')]
+        batch = run_fanout(
+            input_images, expand_action_files(args.actions), args.output_dir, args.workers,
+            args.use_async, optimize=True if args.optimize else None, renditions=renditions
+        )
+        return _finish(batch, args.report)
+
+    workers = args.workers or 8
+    if args.manifest:
+        jobs = load_manifest(args.manifest)
+    else:
+        if not args.actions:
+            parser.error("--actions is required with --images")
+        jobs = build_jobs(
+            collect_images(args.images), expand_action_files(args.actions), args.output_dir, renditions
+        )
+
+    if not jobs:
+        print("Error: No jobs to run")
+        return 1
+    for job in jobs:
+        if args.optimize and job.get('optimize') is None:
+            job['optimize'] = True
+        if renditions and not job.get('renditions'):
+            job['renditions'] = renditions
+
+    if args.use_async:
+        batch = asyncio.run(run_batch_async(jobs, workers, args.max_in_flight))
+    else:
+        batch = run_batch(jobs, max_workers=workers, max_in_flight=args.max_in_flight)
+    return _finish(batch, args.report)
+
+
+def _finish(batch, report_path):
+    if batch is None:
+        return 1
+
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(batch, f, indent=2)
+
+    return 0 if batch['summary']['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
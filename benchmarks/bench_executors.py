@@ -0,0 +1,251 @@
+"""
+Load benchmark for the executors against the local mock server.
+
+Starts benchmarks/mock_server.py in-process, points actions.py and
+photoshop_actions.py at it, and runs the same batch at several
+concurrency levels. Reports jobs/sec and p50/p95 seconds for each phase
+(upload, submit, poll, download, cleanup) so throughput changes can be
+measured without touching Adobe, Dropbox or R2.
+
+    python benchmarks/bench_executors.py --levels 1 8 32 --jobs 64 --job-duration 1
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import MockConfig, MockServer  # noqa: E402
+
+PHASES = ('upload', 'submit', 'poll', 'download', 'cleanup')
+EXECUTORS = ('actions', 'actions-async', 'photoshop', 'photoshop-link')
+ACTION_JSON = [
+    {"_obj": "desaturate"},
+    {"_obj": "brightnessEvent", "brightness": 10, "center": 0, "useLegacy": False}
+]
+
+
+class MockDropbox:
+    """The subset of dropbox.Dropbox used by photoshop_actions, backed by mock storage."""
+
+    def __init__(self, base_url, session):
+        self.base_url = base_url
+        self.session = session
+
+    def _url(self, path):
+        return f'{self.base_url}/dropbox{path}'
+
+    def files_upload(self, data, path, mode=None):
+        self.session.put(self._url(path), data=data).raise_for_status()
+        return SimpleNamespace(path_display=path, size=len(data))
+
+    def files_get_temporary_link(self, path):
+        return SimpleNamespace(link=self._url(path))
+
+    def files_get_temporary_upload_link(self, commit_info, duration=14400.0):
+        return SimpleNamespace(link=self._url(commit_info.path))
+
+    def sharing_create_shared_link_with_settings(self, path, settings=None):
+        response = self.session.post(
+            f'{self.base_url}/2/sharing/create_shared_link_with_settings', json={'path': path}
+        )
+        response.raise_for_status()
+        return SimpleNamespace(url=response.json()['url'])
+
+    def files_delete_v2(self, path):
+        response = self.session.post(f'{self.base_url}/2/files/delete_v2', json={'path': path})
+        response.raise_for_status()
+        return SimpleNamespace(metadata=SimpleNamespace(path_display=path))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def phase_stats(records):
+    stats = {}
+    for phase in PHASES:
+        values = [r['timings'][phase] for r in records if phase in r['timings']]
+        if values:
+            stats[phase] = {'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+    return stats
+
+
+def make_inputs(directory, count, size):
+    """Write ``count`` distinct random input files of ``size`` bytes."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f'bench_{i:04d}.png')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def run_actions(inputs, action_file, output_dir, concurrency, use_async):
+    import batch_actions
+
+    jobs = [
+        {'inputs': [path], 'action': action_file,
+         'output': os.path.join(output_dir, os.path.basename(path) + '.psd')}
+        for path in inputs
+    ]
+    if use_async:
+        report = asyncio.run(batch_actions.run_batch_async(jobs, max_workers=concurrency,
+                                                           max_in_flight=concurrency))
+    else:
+        report = batch_actions.run_batch(jobs, max_workers=concurrency, max_in_flight=concurrency)
+    return report['results']
+
+
+def run_photoshop(inputs, action_file, output_dir, concurrency, direct_download=True):
+    import photoshop_actions
+
+    # photoshop-link measures the older shared-link download path
+    photoshop_actions.DROPBOX_DIRECT_DOWNLOAD = direct_download
+
+    def one(path):
+        timings = {}
+        started = time.perf_counter()
+        output = photoshop_actions.execute_photoshop_action(
+            path, action_file, os.path.join(output_dir, os.path.basename(path) + '.psd'), timings
+        )
+        return {
+            'status': 'succeeded' if output else 'failed',
+            'timings': timings,
+            'elapsed': time.perf_counter() - started
+        }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, inputs))
+
+
+def run_level(executor, inputs, action_file, output_dir, concurrency, verbose):
+    runner = {
+        'actions': lambda: run_actions(inputs, action_file, output_dir, concurrency, False),
+        'actions-async': lambda: run_actions(inputs, action_file, output_dir, concurrency, True),
+        'photoshop': lambda: run_photoshop(inputs, action_file, output_dir, concurrency),
+        'photoshop-link': lambda: run_photoshop(inputs, action_file, output_dir, concurrency, False),
+    }[executor]
+
+    sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    with sink:
+        records = runner()
+    wall = time.perf_counter() - started
+
+    succeeded = sum(1 for r in records if r['status'] == 'succeeded')
+    return {
+        'executor': executor,
+        'concurrency': concurrency,
+        'jobs': len(records),
+        'succeeded': succeeded,
+        'wall_seconds': wall,
+        'jobs_per_second': len(records) / wall if wall > 0 else 0.0,
+        'phases': phase_stats(records)
+    }
+
+
+def format_row(result):
+    cells = [
+        f"{result['executor']:<14}",
+        f"{result['concurrency']:>5}",
+        f"{result['succeeded']:>4}/{result['jobs']:<4}",
+        f"{result['jobs_per_second']:>8.2f}",
+    ]
+    for phase in PHASES:
+        stats = result['phases'].get(phase)
+        cells.append(f"{stats['p50']:>6.3f}/{stats['p95']:<6.3f}" if stats else f"{'-':^13}")
+    return ' '.join(cells)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the executors against a local mock server")
+    parser.add_argument('--executors', nargs='+', choices=EXECUTORS, default=list(EXECUTORS))
+    parser.add_argument('--levels', nargs='+', type=int, default=[1, 4, 16],
+                        help="Concurrency levels to run")
+    parser.add_argument('--jobs', type=int, default=32, help="Jobs per concurrency level")
+    parser.add_argument('--image-kb', type=int, default=256, help="Size of each input image")
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--latency-jitter', type=float, default=0.01)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--job-duration', type=float, default=1.0)
+    parser.add_argument('--job-failure-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help="Photoshop API requests per second the mock accepts before answering 429")
+    parser.add_argument('--report', help="Write results as JSON to this path")
+    parser.add_argument('--verbose', action='store_true', help="Show executor output")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        failure_rate=args.failure_rate,
+        job_duration=args.job_duration,
+        job_failure_rate=args.job_failure_rate,
+        rate_limit=args.rate_limit
+    )
+
+    with MockServer(config) as server, tempfile.TemporaryDirectory() as workdir:
+        # The executors read their settings at import time, so configure
+        # the environment before importing them
+        os.environ.update(server.environment())
+        os.environ.update({
+            'IMS_TOKEN_CACHE': os.path.join(workdir, 'ims_token.json'),
+            'RESULT_CACHE': '0',
+            'JOB_JOURNAL': '0',
+            'R2_DEDUP_INPUTS': '0',
+            # Inputs are random bytes, not images
+            'INPUT_CHECK': '0'
+        })
+
+        import photoshop_actions
+        from http_session import get_session
+        photoshop_actions.get_dropbox_client = lambda: MockDropbox(f'{server.url}', get_session())
+
+        action_file = os.path.join(workdir, 'bench_action.json')
+        with open(action_file, 'w') as f:
+            json.dump(ACTION_JSON, f)
+
+        print(f"Mock server at {server.url}: latency {args.latency}s, job duration "
+              f"{args.job_duration}s, failure rate {args.failure_rate}")
+        print(f"{'executor':<14} {'conc':>5} {'ok':>9} {'jobs/s':>8} " +
+              ' '.join(f"{phase + ' p50/p95':^13}" for phase in PHASES))
+
+        results = []
+        for executor in args.executors:
+            for level in args.levels:
+                level_dir = os.path.join(workdir, f'{executor}_{level}')
+                os.makedirs(level_dir)
+                inputs = make_inputs(level_dir, args.jobs, args.image_kb * 1024)
+                result = run_level(executor, inputs, action_file, level_dir, level, args.verbose)
+                results.append(result)
+                print(format_row(result), flush=True)
+
+        print(f"\nServer requests: {json.dumps(server.state.counters, sort_keys=True)}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Report written to {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Benchmark for loading large commented action files.
+
+Builds an action file from json_examples/raindrop.json repeated --scale
+times (1000 by default, about 19 MB) and compares the previous
+character-by-character remove_json_comments with the single-pass JSONC
+loader, cold and with a warm parse cache.
+
+    python benchmarks/bench_jsonc.py --scale 1000 --repeat 3
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'actionJSON-generator', 'src'))
+
+from fluxa.utils.jsonc import load_jsonc_file, loads_jsonc, clear_cache  # noqa: E402
+
+
+def legacy_remove_json_comments(json_string):
+    """The pre-JSONC comment stripper from photoshop_actions.py, kept as a baseline."""
+    lines = json_string.split('\n')
+    cleaned_lines = []
+    in_string = False
+    escape_next = False
+
+    for line in lines:
+        cleaned_line = []
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if escape_next:
+                cleaned_line.append(char)
+                escape_next = False
+                i += 1
+                continue
+            if char == '\\':
+                escape_next = True
+                cleaned_line.append(char)
+                i += 1
+                continue
+            if char == '"':
+                in_string = not in_string
+                cleaned_line.append(char)
+                i += 1
+                continue
+            if not in_string and char == '/' and i + 1 < len(line) and line[i + 1] == '/':
+                break
+            cleaned_line.append(char)
+            i += 1
+        cleaned_lines.append(''.join(cleaned_line))
+
+    result = '\n'.join(cleaned_lines)
+    result = re.sub(r'/\*[\s\S]*?\*/', '', result)
+    return result.strip()
+
+
+def build_large_action_file(source, scale, path):
+    """Concatenate ``scale`` copies of a commented action array into one array."""
+    with open(source) as f:
+        body = f.read().strip()
+    # Drop the outer brackets so every copy's steps land in one array
+    inner = body[body.index('[') + 1:body.rindex(']')]
+    with open(path, 'w') as f:
+        f.write('// Generated by benchmarks/bench_jsonc.py\n[')
+        f.write(',\n'.join([inner] * scale))
+        f.write(']\n')
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JSONC action file loading")
+    parser.add_argument('--source', default=os.path.join(ROOT, 'json_examples', 'raindrop.json'))
+    parser.add_argument('--scale', type=int, default=1000, help="Copies of the source file")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per variant (best is reported)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'large_action.json')
+        build_large_action_file(args.source, args.scale, path)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+
+        def legacy():
+            with open(path) as f:
+                return json.loads(legacy_remove_json_comments(f.read()))
+
+        def single_pass():
+            with open(path, 'rb') as f:
+                return loads_jsonc(f.read())
+
+        def cold():
+            clear_cache()
+            return load_jsonc_file(path)
+
+        legacy_time, expected = best_of(args.repeat, legacy)
+        single_time, result = best_of(args.repeat, single_pass)
+        cold_time, _ = best_of(args.repeat, cold)
+        warm_time, _ = best_of(args.repeat, lambda: load_jsonc_file(path))
+
+    if result != expected:
+        print("Error: single-pass loader disagrees with the legacy loader")
+        return 1
+
+    print(f"{os.path.basename(args.source)} x{args.scale}: {size_mb:.1f} MB, {len(result)} steps")
+    print(f"{'legacy remove_json_comments':<30} {legacy_time:8.3f}s")
+    print(f"{'single-pass loads_jsonc':<30} {single_time:8.3f}s  ({legacy_time / single_time:.1f}x)")
+    print(f"{'load_jsonc_file (cold)':<30} {cold_time:8.3f}s")
+    print(f"{'load_jsonc_file (cached)':<30} {warm_time * 1e6:8.1f}us")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,572 @@
+"""
+Local stand-in for Adobe IMS, the Photoshop actionJSON API, S3/R2 storage and
+the Dropbox download and shared-link endpoints.
+Lets the executors run end to end without live Adobe, Dropbox or R2, with
+configurable latency, failure rate and job duration, so their throughput
+can be measured and regressions caught.
+
+Run standalone:
+    python benchmarks/mock_server.py --port 8787 --job-duration 2
+
+and point the executors at it with the environment variables it prints.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+from xml.etree import ElementTree
+
+S3_NS = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+
+class MockConfig:
+    """Behaviour knobs for the mock server."""
+
+    def __init__(self, latency=0.02, latency_jitter=0.01, failure_rate=0.0,
+                 job_duration=1.0, job_duration_jitter=0.2, job_failure_rate=0.0,
+                 output_bytes=None, token_expires_in=86399, rate_limit=0.0):
+        """
+        Args:
+            latency: Added delay per request, in seconds
+            latency_jitter: Uniform random extra delay per request, in seconds
+            failure_rate: Probability that an API or storage request fails with a 503
+            job_duration: Seconds a submitted job stays running
+            job_duration_jitter: Uniform random extra job duration, in seconds
+            job_failure_rate: Probability that a job finishes with status "failed"
+            output_bytes: Size of each job output; by default the first input is copied
+            token_expires_in: expires_in returned by the token endpoint
+            rate_limit: Photoshop API requests (submit and status) per second
+                accepted before answering 429 with Retry-After; 0 for no limit
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.job_duration = job_duration
+        self.job_duration_jitter = job_duration_jitter
+        self.job_failure_rate = job_failure_rate
+        self.output_bytes = output_bytes
+        self.token_expires_in = token_expires_in
+        self.rate_limit = rate_limit
+
+
+class MockState:
+    """Objects, multipart uploads, jobs and request counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.uploads = {}
+        self.jobs = {}
+        self.counters = {}
+        # Start times of recent Photoshop API requests, for the rate limit
+        self.api_requests = []
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def put_object(self, path, data):
+        with self.lock:
+            self.objects[path] = {
+                'data': data,
+                'etag': f'"{hashlib.md5(data).hexdigest()}"',
+                'modified': time.time()
+            }
+            return self.objects[path]
+
+
+def _decode_aws_chunked(body):
+    """Strip aws-chunked framing (chunk sizes, signatures and trailers)."""
+    out = bytearray()
+    pos = 0
+    while pos < len(body):
+        line_end = body.index(b'\r\n', pos)
+        size = int(body[pos:line_end].split(b';')[0], 16)
+        pos = line_end + 2
+        if size == 0:
+            break
+        out += body[pos:pos + size]
+        pos += size + 2
+    return bytes(out)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Routes IMS, Photoshop API and path-style S3 requests."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FluxaMock/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    @property
+    def state(self):
+        return self.server.state
+
+    # ------------------------------------------------------------------
+    # Plumbing
+    # ------------------------------------------------------------------
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    # Skip trailers up to the terminating blank line
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+            body = bytes(body)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        if 'aws-chunked' in self.headers.get('Content-Encoding', ''):
+            body = _decode_aws_chunked(body)
+        return body
+
+    def _send(self, status, body=b'', content_type='application/json', headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _xml(self, status, root):
+        self._send(status, ElementTree.tostring(root, encoding='utf-8', xml_declaration=True),
+                   content_type='application/xml')
+
+    def _simulate(self, kind):
+        """Apply latency and random failures. Returns False if the request was failed."""
+        self.state.count(kind)
+        delay = self.config.latency + random.random() * self.config.latency_jitter
+        if delay > 0:
+            time.sleep(delay)
+        if kind in ('submit', 'status') and self.config.rate_limit > 0 and not self._admit():
+            self.state.count(f'{kind}_throttled')
+            self._send(429, {'error': 'too many requests'}, headers={'Retry-After': '1'})
+            return False
+        if random.random() < self.config.failure_rate:
+            self.state.count(f'{kind}_failed')
+            self._send(503, {'error': 'injected failure'}, headers={'Retry-After': '0'})
+            return False
+        return True
+
+    def _admit(self):
+        """Sliding one-second window over Photoshop API requests."""
+        now = time.monotonic()
+        with self.state.lock:
+            recent = [t for t in self.state.api_requests if now - t < 1.0]
+            admitted = len(recent) < self.config.rate_limit
+            if admitted:
+                recent.append(now)
+            self.state.api_requests = recent
+            return admitted
+
+    def _base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _route(self):
+        split = urlsplit(self.path)
+        return unquote(split.path), parse_qs(split.query, keep_blank_values=True)
+
+    def do_GET(self):
+        path, query = self._route()
+        if path.startswith('/pie/psdService/status/'):
+            return self._job_status(path.rsplit('/', 1)[1])
+        return self._storage('GET', path, query)
+
+    def do_HEAD(self):
+        path, query = self._route()
+        return self._storage('HEAD', path, query)
+
+    def do_PUT(self):
+        path, query = self._route()
+        return self._storage('PUT', path, query)
+
+    def do_DELETE(self):
+        path, query = self._route()
+        return self._storage('DELETE', path, query)
+
+    def do_POST(self):
+        path, query = self._route()
+        if path == '/ims/token/v2':
+            return self._token()
+        if path == '/pie/psdService/actionJSON':
+            return self._submit()
+        if path == '/2/files/download':
+            return self._dropbox_download()
+        if path == '/2/sharing/create_shared_link_with_settings':
+            return self._dropbox_shared_link()
+        if path == '/2/files/delete_v2':
+            return self._dropbox_delete()
+        return self._storage('POST', path, query)
+
+    # ------------------------------------------------------------------
+    # Dropbox API (files are kept in storage under /dropbox)
+    # ------------------------------------------------------------------
+
+    def _dropbox_download(self):
+        """files/download on the content endpoint, with Range support."""
+        self._read_body()
+        arg = json.loads(self.headers.get('Dropbox-API-Arg', '{}'))
+        return self._storage('GET', '/dropbox' + arg.get('path', ''), {})
+
+    def _dropbox_shared_link(self):
+        body = json.loads(self._read_body() or b'{}')
+        if not self._simulate('dropbox'):
+            return
+        self._send(200, {'url': f"{self._base_url()}/dropbox{body.get('path', '')}?dl=0"})
+
+    def _dropbox_delete(self):
+        """files/delete_v2: removes a file or a folder with everything below it."""
+        body = json.loads(self._read_body() or b'{}')
+        if not self._simulate('dropbox'):
+            return
+        path = '/dropbox' + body.get('path', '')
+        with self.state.lock:
+            matches = [key for key in self.state.objects if key == path or key.startswith(path + '/')]
+            for key in matches:
+                del self.state.objects[key]
+        if not matches:
+            return self._send(409, {'error_summary': 'path_lookup/not_found/'})
+        self._send(200, {'metadata': {'path_display': body.get('path')}})
+
+    # ------------------------------------------------------------------
+    # IMS and Photoshop API
+    # ------------------------------------------------------------------
+
+    def _token(self):
+        self._read_body()
+        if not self._simulate('ims'):
+            return
+        self._send(200, {
+            'access_token': f'mock-token-{uuid.uuid4().hex[:12]}',
+            'token_type': 'bearer',
+            'expires_in': self.config.token_expires_in
+        })
+
+    def _submit(self):
+        body = self._read_body()
+        if not self._simulate('submit'):
+            return
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            return self._send(401, {'error': 'missing bearer token'})
+        try:
+            data = json.loads(body)
+            outputs = data['outputs']
+            input_href = data['inputs'][0]['href']
+        except (ValueError, KeyError, IndexError):
+            return self._send(400, {'error': 'malformed request'})
+
+        job_id = uuid.uuid4().hex
+        duration = self.config.job_duration + random.random() * self.config.job_duration_jitter
+        with self.state.lock:
+            self.state.jobs[job_id] = {
+                'done_at': time.monotonic() + duration,
+                'failed': random.random() < self.config.job_failure_rate,
+                'input_href': input_href,
+                'outputs': outputs,
+                'written': False
+            }
+        self._send(202, {
+            '_links': {'self': {'href': f'{self._base_url()}/pie/psdService/status/{job_id}'}}
+        })
+
+    def _job_status(self, job_id):
+        if not self._simulate('status'):
+            return
+        with self.state.lock:
+            job = self.state.jobs.get(job_id)
+        if job is None:
+            return self._send(404, {'error': 'unknown job'})
+
+        done = time.monotonic() >= job['done_at']
+        if done and not job['failed'] and not job['written']:
+            self._write_outputs(job)
+        if not done:
+            status = 'running'
+        else:
+            status = 'failed' if job['failed'] else 'succeeded'
+
+        self._send(200, {
+            'jobId': job_id,
+            'outputs': [
+                {'status': status, 'type': output.get('type'), '_links': {'renditions': [output]}}
+                for output in job['outputs']
+            ]
+        })
+
+    def _write_outputs(self, job):
+        """Emulate Photoshop writing each output to its presigned PUT URL."""
+        input_path = unquote(urlsplit(job['input_href']).path)
+        with self.state.lock:
+            source = self.state.objects.get(input_path, {}).get('data', b'')
+        data = os.urandom(self.config.output_bytes) if self.config.output_bytes else source
+        for output in job['outputs']:
+            self.state.put_object(unquote(urlsplit(output['href']).path), data)
+        job['written'] = True
+
+    # ------------------------------------------------------------------
+    # Path-style S3 storage (also backs the mock Dropbox links)
+    # ------------------------------------------------------------------
+
+    def _storage(self, method, path, query):
+        body = self._read_body() if method in ('PUT', 'POST') else b''
+        if not self._simulate('storage'):
+            return
+
+        parts = path.lstrip('/').split('/', 1)
+        bucket = parts[0]
+        key = parts[1] if len(parts) > 1 else ''
+
+        if not key:
+            if method == 'GET' and query.get('list-type') == ['2']:
+                return self._list_objects(bucket, query)
+            if method == 'POST' and 'delete' in query:
+                return self._delete_objects(bucket, body)
+            return self._send(400, {'error': 'unsupported bucket operation'})
+
+        if method == 'POST' and 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            with self.state.lock:
+                self.state.uploads[upload_id] = {}
+            root = ElementTree.Element('InitiateMultipartUploadResult', xmlns=S3_NS)
+            ElementTree.SubElement(root, 'Bucket').text = bucket
+            ElementTree.SubElement(root, 'Key').text = key
+            ElementTree.SubElement(root, 'UploadId').text = upload_id
+            return self._xml(200, root)
+        if method == 'PUT' and 'uploadId' in query:
+            with self.state.lock:
+                self.state.uploads[query['uploadId'][0]][int(query['partNumber'][0])] = body
+            return self._send(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+        if method == 'POST' and 'uploadId' in query:
+            with self.state.lock:
+                parts_data = self.state.uploads.pop(query['uploadId'][0])
+            obj = self.state.put_object(path, b''.join(parts_data[n] for n in sorted(parts_data)))
+            root = ElementTree.Element('CompleteMultipartUploadResult', xmlns=S3_NS)
+            ElementTree.SubElement(root, 'Bucket').text = bucket
+            ElementTree.SubElement(root, 'Key').text = key
+            ElementTree.SubElement(root, 'ETag').text = obj['etag']
+            return self._xml(200, root)
+        if method == 'DELETE' and 'uploadId' in query:
+            with self.state.lock:
+                self.state.uploads.pop(query['uploadId'][0], None)
+            return self._send(204)
+
+        if method == 'PUT':
+            copy_source = self.headers.get('x-amz-copy-source')
+            if copy_source:
+                with self.state.lock:
+                    source = self.state.objects.get('/' + unquote(copy_source).lstrip('/'))
+                if source is None:
+                    return self._send(404, content_type='application/xml')
+                obj = self.state.put_object(path, source['data'])
+                root = ElementTree.Element('CopyObjectResult', xmlns=S3_NS)
+                ElementTree.SubElement(root, 'ETag').text = obj['etag']
+                ElementTree.SubElement(root, 'LastModified').text = _iso(obj['modified'])
+                return self._xml(200, root)
+            obj = self.state.put_object(path, body)
+            return self._send(200, headers={'ETag': obj['etag']})
+
+        if method == 'DELETE':
+            with self.state.lock:
+                self.state.objects.pop(path, None)
+            return self._send(204)
+
+        with self.state.lock:
+            obj = self.state.objects.get(path)
+        if obj is None:
+            if method == 'HEAD':
+                return self._send(404, content_type='application/xml')
+            root = ElementTree.Element('Error')
+            ElementTree.SubElement(root, 'Code').text = 'NoSuchKey'
+            return self._xml(404, root)
+
+        data = obj['data']
+        headers = {
+            'ETag': obj['etag'],
+            'Last-Modified': formatdate(obj['modified'], usegmt=True),
+            'Accept-Ranges': 'bytes'
+        }
+        range_header = self.headers.get('Range')
+        if method == 'GET' and range_header and range_header.startswith('bytes='):
+            start, _, end = range_header[6:].partition('-')
+            start = int(start)
+            end = min(int(end), len(data) - 1) if end else len(data) - 1
+            if start >= len(data):
+                return self._send(416, headers={'Content-Range': f'bytes */{len(data)}'})
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            return self._send(206, data[start:end + 1], 'application/octet-stream', headers)
+        if method == 'HEAD':
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        return self._send(200, data, 'application/octet-stream', headers)
+
+    def _list_objects(self, bucket, query):
+        prefix = '/' + bucket + '/' + query.get('prefix', [''])[0]
+        start_after = query.get('continuation-token', [''])[0]
+        max_keys = int(query.get('max-keys', ['1000'])[0])
+        with self.state.lock:
+            matches = sorted(
+                (path, obj) for path, obj in self.state.objects.items()
+                if path.startswith(prefix) and path > start_after
+            )
+        page, truncated = matches[:max_keys], len(matches) > max_keys
+
+        root = ElementTree.Element('ListBucketResult', xmlns=S3_NS)
+        ElementTree.SubElement(root, 'Name').text = bucket
+        ElementTree.SubElement(root, 'Prefix').text = query.get('prefix', [''])[0]
+        ElementTree.SubElement(root, 'KeyCount').text = str(len(page))
+        ElementTree.SubElement(root, 'MaxKeys').text = str(max_keys)
+        ElementTree.SubElement(root, 'IsTruncated').text = 'true' if truncated else 'false'
+        if truncated:
+            ElementTree.SubElement(root, 'NextContinuationToken').text = page[-1][0]
+        for path, obj in page:
+            contents = ElementTree.SubElement(root, 'Contents')
+            ElementTree.SubElement(contents, 'Key').text = path[len(bucket) + 2:]
+            ElementTree.SubElement(contents, 'LastModified').text = _iso(obj['modified'])
+            ElementTree.SubElement(contents, 'ETag').text = obj['etag']
+            ElementTree.SubElement(contents, 'Size').text = str(len(obj['data']))
+            ElementTree.SubElement(contents, 'StorageClass').text = 'STANDARD'
+        return self._xml(200, root)
+
+    def _delete_objects(self, bucket, body):
+        request = ElementTree.fromstring(body)
+        keys = [element.text for element in request.iter() if element.tag.endswith('Key')]
+        with self.state.lock:
+            for key in keys:
+                self.state.objects.pop(f'/{bucket}/{key}', None)
+        self.state.count('delete_objects')
+        root = ElementTree.Element('DeleteResult', xmlns=S3_NS)
+        for key in keys:
+            deleted = ElementTree.SubElement(root, 'Deleted')
+            ElementTree.SubElement(deleted, 'Key').text = key
+        return self._xml(200, root)
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+class MockServer:
+    """
+    Threaded mock server that can be started in-process:
+
+        with MockServer(MockConfig(job_duration=0.5)) as server:
+            os.environ.update(server.environment())
+    """
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or MockConfig()
+        self.httpd.state = MockState()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    def environment(self, bucket='fluxa-mock'):
+        """Environment variables that point both executors at this server."""
+        return {
+            'CLIENT_ID': 'mock-client',
+            'CLIENT_SECRET': 'mock-secret',
+            'IMS_TOKEN_URL': f'{self.url}/ims/token/v2',
+            'PHOTOSHOP_API_URL': self.url,
+            'R2_ENDPOINT_URL': self.url,
+            'R2_ACCOUNT_ID': 'mock',
+            'R2_BUCKET_NAME': bucket,
+            'R2_ACCESS_KEY_ID': 'mock',
+            'R2_SECRET_ACCESS_KEY': 'mock',
+            'DROPBOX_ACCESS_TOKEN': 'mock-dropbox-token',
+            'DROPBOX_CONTENT_URL': self.url
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Photoshop API, IMS and S3 storage server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--latency-jitter', type=float, default=0.01)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--job-duration', type=float, default=1.0)
+    parser.add_argument('--job-duration-jitter', type=float, default=0.2)
+    parser.add_argument('--job-failure-rate', type=float, default=0.0)
+    parser.add_argument('--output-bytes', type=int, default=None)
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help="Photoshop API requests per second before answering 429")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        failure_rate=args.failure_rate,
+        job_duration=args.job_duration,
+        job_duration_jitter=args.job_duration_jitter,
+        job_failure_rate=args.job_failure_rate,
+        output_bytes=args.output_bytes,
+        rate_limit=args.rate_limit
+    )
+    server = MockServer(config, args.host, args.port)
+    print(f"Mock server listening on {server.url}")
+    for name, value in server.environment().items():
+        print(f"export {name}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
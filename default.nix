@@ -8,6 +8,9 @@ in pkgs.mkShell {
         python-dotenv
         dropbox
         boto3
+        aiohttp
+        numpy
+        pillow
       ]))
     ];
 }
@@ -0,0 +1,54 @@
+"""
+Shared HTTP session for the executors.
+One keep-alive connection pool per host, sized for concurrent jobs, with
+retry/backoff on connection errors and transient 5xx responses, so IMS,
+submit, poll and download calls stop paying a TCP+TLS handshake each.
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '32'))
+RETRIES = int(os.getenv('HTTP_RETRIES', '3'))
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
+# POST is left out on purpose: resubmitting a job after a 5xx could run it
+# twice. Connection errors are still retried for every method, since the
+# request never reached the server.
+RETRY_METHODS = frozenset({'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'})
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_session(pool_size=POOL_SIZE, retries=RETRIES):
+    """Create a requests.Session with pooled keep-alive connections and retries."""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide shared session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = build_session()
+        return _session
@@ -0,0 +1,178 @@
+"""
+Expiry-aware Adobe IMS access token cache.
+Tokens are cached in memory and in a locked on-disk file, so parallel
+workers and back-to-back runs reuse one valid token instead of each
+fetching their own.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from http_session import get_session
+from rate_limit import limited_request
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked cache access
+    fcntl = None
+
+IMS_TOKEN_URL = os.getenv('IMS_TOKEN_URL', 'https://ims-na1.adobelogin.com/ims/token/v2')
+IMS_SCOPE = 'openid,AdobeID,read_organizations,firefly_api,ff_apis'
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'fluxa', 'ims_token.json')
+
+# Refresh this many seconds before the token actually expires
+REFRESH_MARGIN = 300
+
+
+def fetch_token(client_id, client_secret, scope=IMS_SCOPE):
+    """
+    Request a new token from IMS.
+
+    Returns:
+        Tuple of (access_token, expires_at epoch seconds), or (None, 0) on failure
+    """
+    params = {
+        'client_secret': client_secret,
+        'grant_type': 'client_credentials',
+        'scope': scope
+    }
+    response = limited_request(
+        get_session(), 'POST', f'{IMS_TOKEN_URL}?client_id={client_id}', service='ims', data=params
+    )
+    result = response.json()
+    token = result.get('access_token')
+    if not token:
+        return None, 0
+    return token, time.time() + float(result.get('expires_in', 3600))
+
+
+class TokenProvider:
+    """
+    Thread- and process-safe access token provider.
+
+    Lookups go memory -> disk cache -> IMS. Disk access is serialized with
+    an exclusive file lock, so when several processes start at once only
+    the first one hits IMS and the rest read its token from the cache.
+    """
+
+    def __init__(self, client_id, client_secret, cache_path=None,
+                 refresh_margin=REFRESH_MARGIN, scope=IMS_SCOPE):
+        """
+        Args:
+            client_id: Adobe client ID
+            client_secret: Adobe client secret
+            cache_path: On-disk cache file (default: IMS_TOKEN_CACHE env or ~/.cache/fluxa/ims_token.json)
+            refresh_margin: Seconds before expiry at which a token is refreshed
+            scope: IMS scope string
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.cache_path = cache_path or os.getenv('IMS_TOKEN_CACHE', DEFAULT_CACHE_PATH)
+        self.refresh_margin = refresh_margin
+        self.scope = scope
+        # Tokens for different credentials or scopes must never be mixed up
+        self.cache_key = hashlib.sha256(f'{client_id}:{scope}'.encode()).hexdigest()[:16]
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+
+    def _is_fresh(self, expires_at):
+        return time.time() < expires_at - self.refresh_margin
+
+    def get(self, force_refresh=False):
+        """Return a valid access token, or None if IMS refused to issue one."""
+        with self._lock:
+            if not force_refresh and self._token and self._is_fresh(self._expires_at):
+                return self._token
+
+            token, expires_at = self._get_from_disk_or_fetch(force_refresh)
+            if token:
+                self._token, self._expires_at = token, expires_at
+            return token
+
+    def peek(self):
+        """Return the in-memory token if it is still fresh, without any I/O."""
+        token, expires_at = self._token, self._expires_at
+        return token if token and self._is_fresh(expires_at) else None
+
+    def expires_in(self):
+        """Seconds until the in-memory token expires (0 if there is none)."""
+        return max(0.0, self._expires_at - time.time()) if self._token else 0.0
+
+    def invalidate(self):
+        """Drop the cached token, e.g. after the API rejected it with a 401."""
+        with self._lock:
+            stale = self._token
+            self._token, self._expires_at = None, 0.0
+
+            def drop(entries):
+                # Another process may already have replaced the stale token
+                if stale and entries.get(self.cache_key, {}).get('access_token') == stale:
+                    del entries[self.cache_key]
+
+            self._update_disk(drop)
+
+    def _get_from_disk_or_fetch(self, force_refresh):
+        result = {}
+
+        def refresh(entries):
+            entry = entries.get(self.cache_key, {})
+            if not force_refresh and entry.get('access_token') and self._is_fresh(entry.get('expires_at', 0)):
+                result['token'], result['expires_at'] = entry['access_token'], entry['expires_at']
+                return
+            token, expires_at = fetch_token(self.client_id, self.client_secret, self.scope)
+            result['token'], result['expires_at'] = token, expires_at
+            if token:
+                entries[self.cache_key] = {'access_token': token, 'expires_at': expires_at}
+
+        self._update_disk(refresh)
+        return result.get('token'), result.get('expires_at', 0)
+
+    def _update_disk(self, update):
+        """Run ``update(entries)`` on the cache file contents while holding its lock."""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            lock_file = open(f'{self.cache_path}.lock', 'a')
+        except OSError:
+            # Unwritable cache location: still work, just without sharing
+            update({})
+            return
+
+        with lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.cache_path, 'r') as f:
+                        entries = json.load(f)
+                except (OSError, ValueError):
+                    entries = {}
+                before = json.dumps(entries, sort_keys=True)
+
+                update(entries)
+
+                if json.dumps(entries, sort_keys=True) != before:
+                    tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+                    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                    with os.fdopen(fd, 'w') as f:
+                        json.dump(entries, f)
+                    os.replace(tmp_path, self.cache_path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_token_provider(client_id, client_secret):
+    """Return the process-wide TokenProvider for a set of credentials."""
+    with _providers_lock:
+        key = (client_id, client_secret)
+        if key not in _providers:
+            _providers[key] = TokenProvider(client_id, client_secret)
+        return _providers[key]
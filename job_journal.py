@@ -0,0 +1,163 @@
+"""
+SQLite journal of actionJSON job stages.
+Each job's uploaded keys, presigned URLs, job href, status and output keys
+are recorded as it moves through upload -> submit -> done, so a run that
+dies mid-poll can be restarted: in-flight jobs are polled again, finished
+ones are skipped, and nothing is uploaded or submitted twice.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+import r2_cas
+from result_cache import canonical_action_hash
+
+JOURNAL_PATH = os.getenv(
+    'JOB_JOURNAL_PATH', os.path.join(os.path.expanduser('~'), '.cache', 'fluxa', 'jobs.sqlite3')
+)
+# Finished and failed entries older than this are pruned when the journal opens
+RETENTION_SECONDS = float(os.getenv('JOB_JOURNAL_RETENTION_DAYS', '7')) * 86400
+
+STAGE_UPLOADED = 'uploaded'
+STAGE_SUBMITTED = 'submitted'
+STAGE_DONE = 'done'
+STAGE_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    r2_keys TEXT NOT NULL DEFAULT '[]',
+    job_href TEXT,
+    status TEXT,
+    output_keys TEXT NOT NULL DEFAULT '[]',
+    data TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_stage ON jobs (stage);
+"""
+
+
+def journal_key(input_images, action_json, output_path, renditions):
+    """
+    Identity of a job across runs: same input content, canonical actions,
+    output path and renditions map to the same journal entry.
+    """
+    parts = [r2_cas.file_sha256(path) for path in input_images]
+    parts.append(canonical_action_hash(action_json))
+    parts.append(os.path.abspath(output_path))
+    parts.append(json.dumps(list(renditions), sort_keys=True))
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class JobJournal:
+    """
+    Thread-safe job journal backed by one SQLite file.
+
+    Entries hold the job dictionary used by actions.py (keys, URLs, href)
+    plus its stage. WAL mode lets several processes share the file.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, retention=RETENTION_SECONDS):
+        """
+        Args:
+            path: SQLite database file (":memory:" for a throwaway journal)
+            retention: Seconds to keep finished and failed entries
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+            self._conn.execute(
+                'DELETE FROM jobs WHERE stage IN (?, ?) AND updated_at < ?',
+                (STAGE_DONE, STAGE_FAILED, time.time() - retention)
+            )
+
+    def get(self, job_id):
+        """
+        Look up a job.
+
+        Returns:
+            Dictionary with "stage", "status" and "job" (the stored job
+            dictionary), or None if the job is not journaled
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row['job_id'],
+            'stage': row['stage'],
+            'status': row['status'],
+            'job': json.loads(row['data']),
+            'updated_at': row['updated_at']
+        }
+
+    def record(self, job_id, stage, job, status=None):
+        """Insert or update a job at ``stage`` with its current job dictionary."""
+        now = time.time()
+        data = {key: value for key, value in job.items() if not key.startswith('_')}
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (job_id, stage, r2_keys, job_href, status, output_keys, data,
+                                  created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (job_id) DO UPDATE SET
+                    stage = excluded.stage,
+                    r2_keys = excluded.r2_keys,
+                    job_href = excluded.job_href,
+                    status = excluded.status,
+                    output_keys = excluded.output_keys,
+                    data = excluded.data,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    job_id, stage, json.dumps(job.get('r2_keys', [])), job.get('job_href'), status,
+                    json.dumps(job.get('output_keys', [])), json.dumps(data), now, now
+                )
+            )
+
+    def forget(self, job_id):
+        """Remove a job from the journal."""
+        with self._lock:
+            self._conn.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+
+    def in_flight(self):
+        """Jobs that were uploaded or submitted but never finished."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT job_id FROM jobs WHERE stage IN (?, ?) ORDER BY created_at',
+                (STAGE_UPLOADED, STAGE_SUBMITTED)
+            ).fetchall()
+        return [self.get(row['job_id']) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_job_journal():
+    """Return the process-wide job journal, or None when JOB_JOURNAL=0."""
+    global _journal
+    if os.getenv('JOB_JOURNAL', '1') in ('0', 'false', 'no'):
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = JobJournal()
+        return _journal
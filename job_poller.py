@@ -0,0 +1,246 @@
+"""
+Adaptive polling for Photoshop API jobs.
+Polls start fast and back off exponentially with jitter, honour
+Retry-After, go through the shared Photoshop API rate limiter, and stop
+as soon as a job reaches a terminal status. A MultiplexedPoller tracks
+many job status URLs from a single thread.
+"""
+
+import time
+import heapq
+import random
+import threading
+from concurrent.futures import Future
+
+import requests
+
+from http_session import get_session
+from rate_limit import limited_request, retry_after_seconds
+
+ACTIVE_STATUSES = ('pending', 'running')
+
+
+def job_status(job_result):
+    """
+    Overall status of a job from its status document.
+
+    A job with several outputs is only finished when every output is; any
+    failed output fails the whole job immediately.
+    """
+    outputs = job_result.get('outputs') or [{}]
+    statuses = [output.get('status', 'failed') for output in outputs]
+    for status in statuses:
+        if status not in ACTIVE_STATUSES and status != 'succeeded':
+            return status
+    if all(status == 'succeeded' for status in statuses):
+        return 'succeeded'
+    return 'running' if 'running' in statuses else 'pending'
+
+
+class Backoff:
+    """Exponential backoff schedule with proportional jitter."""
+
+    def __init__(self, initial=0.5, factor=1.6, maximum=10.0, jitter=0.2):
+        """
+        Args:
+            initial: Delay before the first poll, in seconds
+            factor: Multiplier applied after every poll
+            maximum: Upper bound on a single delay
+            jitter: Fraction of each delay that is randomized, to spread polls out
+        """
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        """Delay before poll number ``attempt`` (0-based)."""
+        base = min(self.maximum, self.initial * (self.factor ** attempt))
+        return base * (1 - self.jitter * random.random())
+
+
+def _check(job_href, headers, session):
+    """
+    Fetch a job status once.
+
+    Returns:
+        Tuple of (status, job_result, retry_after)
+    """
+    try:
+        # Throttled polls are rescheduled by the caller rather than retried here
+        response = limited_request(session, 'GET', job_href, retries=0, headers=headers)
+    except requests.RequestException as e:
+        # Transient network errors are retried on the normal schedule
+        return 'pending', {'error': str(e)}, None
+
+    retry_after = retry_after_seconds(response)
+    if response.status_code == 429 or response.status_code >= 500:
+        return 'pending', {}, retry_after
+    if response.status_code >= 400:
+        # The job URL is unusable (bad token, unknown job): fail fast
+        return 'failed', {'http_status': response.status_code, 'body': response.text}, None
+
+    job_result = response.json()
+    return job_status(job_result), job_result, retry_after
+
+
+def poll_job(job_href, headers, backoff=None, timeout=600.0, session=None, on_status=None):
+    """
+    Poll one job until it reaches a terminal status.
+
+    Args:
+        job_href: The job's _links.self.href
+        headers: Request headers, or a callable returning them (so tokens can refresh)
+        backoff: Backoff schedule (default: Backoff())
+        timeout: Seconds to wait before giving up with status "timeout"
+        session: requests-compatible session (default: the shared http_session)
+        on_status: Optional callback called with each observed status
+
+    Returns:
+        Tuple of (status, job_result)
+    """
+    backoff = backoff or Backoff()
+    session = session or get_session()
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    retry_after = None
+    job_result = {}
+
+    while True:
+        wait = backoff.delay(attempt)
+        if retry_after is not None:
+            wait = max(wait, retry_after)
+        if time.monotonic() + wait > deadline:
+            return 'timeout', job_result
+        time.sleep(wait)
+        attempt += 1
+
+        status, job_result, retry_after = _check(
+            job_href, headers() if callable(headers) else headers, session
+        )
+        if on_status:
+            on_status(status)
+        if status not in ACTIVE_STATUSES:
+            return status, job_result
+
+
+class MultiplexedPoller:
+    """
+    Poll many jobs from one background thread.
+
+    Each tracked job has its own backoff schedule; the thread sleeps until
+    the next job is due, checks it, and reschedules it. ``track`` returns a
+    Future that resolves to (status, job_result).
+
+        poller = MultiplexedPoller()
+        future = poller.track(job_href, headers)
+        status, job_result = future.result()
+    """
+
+    def __init__(self, backoff=None, timeout=600.0, session=None):
+        """
+        Args:
+            backoff: Backoff schedule shared by all jobs (default: Backoff())
+            timeout: Per-job seconds before resolving with status "timeout"
+            session: requests-compatible session (default: the shared http_session)
+        """
+        self.backoff = backoff or Backoff()
+        self.timeout = timeout
+        self.session = session or get_session()
+        self._heap = []
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def track(self, job_href, headers):
+        """Start polling a job. ``headers`` may be a dict or a callable returning one."""
+        future = Future()
+        now = time.monotonic()
+        entry = {
+            'href': job_href,
+            'headers': headers,
+            'future': future,
+            'attempt': 0,
+            'deadline': now + self.timeout,
+            'job_result': {}
+        }
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("poller is closed")
+            self._schedule(entry, now + self.backoff.delay(0))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='job-poller', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def pending(self):
+        """Number of jobs still being polled."""
+        with self._condition:
+            return len(self._heap)
+
+    def close(self):
+        """Stop the poller; jobs still being tracked resolve with status "cancelled"."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _schedule(self, entry, due):
+        self._counter += 1
+        heapq.heappush(self._heap, (due, self._counter, entry))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._heap and self._heap[0][0] <= time.monotonic():
+                        break
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                if self._closed:
+                    remaining = [entry for _, _, entry in self._heap]
+                    self._heap.clear()
+                    break
+                _, _, entry = heapq.heappop(self._heap)
+
+            self._poll(entry)
+
+        for entry in remaining:
+            entry['future'].set_result(('cancelled', entry['job_result']))
+
+    def _poll(self, entry):
+        headers = entry['headers']
+        try:
+            status, job_result, retry_after = _check(
+                entry['href'], headers() if callable(headers) else headers, self.session
+            )
+        except Exception as e:
+            entry['future'].set_exception(e)
+            return
+
+        if job_result:
+            entry['job_result'] = job_result
+        if status not in ACTIVE_STATUSES:
+            entry['future'].set_result((status, job_result))
+            return
+
+        entry['attempt'] += 1
+        delay = self.backoff.delay(entry['attempt'])
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        due = time.monotonic() + delay
+        if due > entry['deadline']:
+            entry['future'].set_result(('timeout', entry['job_result']))
+            return
+
+        with self._condition:
+            self._schedule(entry, due)
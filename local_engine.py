@@ -0,0 +1,670 @@
+"""
+Local NumPy execution of simple action JSON presets.
+Presets made only of curves, levels, brightness/contrast, hue/saturation,
+desaturate, photo filter, gaussian blur and add noise steps (see
+ps_action_docs/atomic_actions/adjustments and filters) are applied directly
+to an 8-bit RGB image in milliseconds, with no upload, job queue or PSD
+download. Layer bookkeeping that leaves the flattened image unchanged
+(selecting, naming, grouping, duplicating, merging) is skipped, and every
+other step is reported as unhandled so callers can use the Photoshop API
+instead.
+
+All steps are applied in order to one flattened image, and adjustment
+layers are baked in where they are created. That order only matches the
+layer stack while every adjustment lands on top of it, so an adjustment
+made after selecting another layer of a multi-layer document (which may
+sit lower in the stack) is reported as unhandled. The non-linear adjustments
+(brightness/contrast, hue/saturation, photo filter, noise) approximate
+Photoshop's results; they do not match it pixel for pixel.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+# Shared JSONC loader from the fluxa package in actionJSON-generator/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'actionJSON-generator', 'src'))
+from fluxa.utils.jsonc import load_jsonc_file
+
+# Channel names used in adjustment descriptors ("grain" is green)
+CHANNELS = {'composite': None, 'red': 0, 'grain': 1, 'green': 1, 'blue': 2}
+# Extensions Pillow can write for local outputs
+OUTPUT_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.tif': 'TIFF', '.tiff': 'TIFF'}
+JPEG_QUALITY = int(os.getenv('LOCAL_JPEG_QUALITY', '95'))
+# Rows per strip when applying per-pixel operations
+STRIP_ROWS = 64
+
+
+class UnhandledStep(Exception):
+    """A step the local engine cannot reproduce."""
+
+
+def _value(value, default=None):
+    """Plain number from a value that may be wrapped as {"_unit": ..., "_value": ...}."""
+    if value is None:
+        return default
+    if isinstance(value, dict):
+        return value.get('_value', default)
+    return value
+
+
+def _channel(adjustment):
+    """Channel index (None for composite) of a per-channel adjustment."""
+    channel = adjustment.get('channel', {'_value': 'composite'})
+    name = channel.get('_value') if isinstance(channel, dict) else channel
+    if name not in CHANNELS:
+        raise UnhandledStep(f"channel {name!r}")
+    return CHANNELS[name]
+
+
+# ----------------------------------------------------------------------
+# Lookup-table adjustments (curves, levels, brightness/contrast)
+# ----------------------------------------------------------------------
+
+def _spline_lut(points):
+    """256-entry table through curve points, using a natural cubic spline like Photoshop."""
+    points = sorted((float(p['horizontal']), float(p['vertical'])) for p in points)
+    xs = np.array([p[0] for p in points])
+    ys = np.array([p[1] for p in points])
+    if len(xs) < 2 or np.any(np.diff(xs) <= 0):
+        raise UnhandledStep("curve needs at least two points with distinct inputs")
+    grid = np.clip(np.arange(256, dtype=np.float64), xs[0], xs[-1])
+    if len(xs) == 2:
+        out = np.interp(grid, xs, ys)
+    else:
+        n = len(xs)
+        h = np.diff(xs)
+        # Second derivatives of the natural spline (zero at both ends)
+        system = np.zeros((n, n))
+        rhs = np.zeros(n)
+        system[0, 0] = system[-1, -1] = 1.0
+        for i in range(1, n - 1):
+            system[i, i - 1:i + 2] = (h[i - 1], 2 * (h[i - 1] + h[i]), h[i])
+            rhs[i] = 6 * ((ys[i + 1] - ys[i]) / h[i] - (ys[i] - ys[i - 1]) / h[i - 1])
+        m = np.linalg.solve(system, rhs)
+        k = np.clip(np.searchsorted(xs, grid, side='right') - 1, 0, n - 2)
+        a = (xs[k + 1] - grid) / h[k]
+        b = 1 - a
+        out = a * ys[k] + b * ys[k + 1] + ((a ** 3 - a) * m[k] + (b ** 3 - b) * m[k + 1]) * h[k] ** 2 / 6
+    return np.clip(np.rint(out), 0, 255).astype(np.uint8)
+
+
+def _per_channel_lut(adjustments, build):
+    """
+    Combine per-channel tables into one (3, 256) table.
+
+    Individual channels are applied first and the composite on top of them.
+    """
+    identity = np.arange(256, dtype=np.uint8)
+    channel_luts = [identity.copy() for _ in range(3)]
+    composite = identity
+    for adjustment in adjustments:
+        channel = _channel(adjustment)
+        lut = build(adjustment)
+        if channel is None:
+            composite = composite[lut]
+        else:
+            channel_luts[channel] = lut[channel_luts[channel]]
+    return np.stack([composite[lut] for lut in channel_luts])
+
+
+def curves_lut(descriptor):
+    """Table for a ``curves`` descriptor."""
+    def build(adjustment):
+        if 'curve' not in adjustment:
+            raise UnhandledStep("curves without curve points")
+        return _spline_lut(adjustment['curve'])
+    return _per_channel_lut(descriptor.get('adjustment', []), build)
+
+
+def levels_lut(descriptor):
+    """Table for a ``levels`` descriptor (input range, gamma, output range per channel)."""
+    def build(adjustment):
+        low, high = adjustment.get('input', [0, 255])
+        out_low, out_high = adjustment.get('output', [0, 255])
+        gamma = float(_value(adjustment.get('gamma'), 1.0))
+        x = np.arange(256, dtype=np.float64)
+        v = np.clip((x - low) / max(high - low, 1), 0, 1) ** (1 / gamma)
+        return np.clip(np.rint(out_low + v * (out_high - out_low)), 0, 255).astype(np.uint8)
+    return _per_channel_lut(descriptor.get('adjustment', []), build)
+
+
+def brightness_contrast_lut(descriptor):
+    """
+    Table for a ``brightnessEvent`` descriptor.
+
+    Brightness bends midtones with a gamma curve (black and white stay put)
+    and contrast scales around mid-grey; legacy mode shifts and scales linearly.
+    """
+    brightness = float(_value(descriptor.get('brightness'), 0))
+    contrast = float(_value(descriptor.get('center'), 0))
+    x = np.arange(256, dtype=np.float64)
+    if descriptor.get('useLegacy'):
+        y = x + brightness
+    else:
+        y = 255 * (x / 255) ** (2 ** (-brightness / 100))
+    y = 127.5 + (y - 127.5) * (1 + contrast / 100)
+    lut = np.clip(np.rint(y), 0, 255).astype(np.uint8)
+    return np.stack([lut] * 3)
+
+
+# ----------------------------------------------------------------------
+# Colour adjustments and filters
+# ----------------------------------------------------------------------
+
+def _max3(rgb):
+    """Per-pixel maximum; much faster than reducing over the length-3 last axis."""
+    return np.maximum(np.maximum(rgb[..., 0], rgb[..., 1]), rgb[..., 2])
+
+
+def _min3(rgb):
+    return np.minimum(np.minimum(rgb[..., 0], rgb[..., 1]), rgb[..., 2])
+
+
+def _luma(rgb):
+    return rgb[..., 0] * 0.299 + rgb[..., 1] * 0.587 + rgb[..., 2] * 0.114
+
+
+def _rgb_to_hsl(rgb):
+    maximum = _max3(rgb)
+    minimum = _min3(rgb)
+    lightness = (maximum + minimum) / 2
+    delta = maximum - minimum
+    saturation = np.where(
+        delta == 0, 0, delta / np.maximum(1 - np.abs(2 * lightness - 1), 1e-6)
+    )
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    safe = np.maximum(delta, 1e-6)
+    hue = np.where(
+        maximum == r, ((g - b) / safe) % 6,
+        np.where(maximum == g, (b - r) / safe + 2, (r - g) / safe + 4)
+    ) / 6
+    hue = np.where(delta == 0, 0, hue)
+    return hue, np.clip(saturation, 0, 1), lightness
+
+
+def _hsl_to_rgb(hue, saturation, lightness):
+    amplitude = saturation * np.minimum(lightness, 1 - lightness)
+    channels = []
+    for n in (0, 8, 4):
+        k = (n + (hue % 1) * 12) % 12
+        channels.append(lightness - amplitude * np.clip(np.minimum(k - 3, 9 - k), -1, 1))
+    return np.stack(channels, axis=-1)
+
+
+def _apply_lightness(rgb, lightness):
+    """Blend towards black (negative) or white (positive) by lightness/100."""
+    if lightness < 0:
+        return rgb * (1 + lightness / 100)
+    if lightness > 0:
+        return rgb + (1 - rgb) * (lightness / 100)
+    return rgb
+
+
+def hue_saturation(rgb, descriptor):
+    """``hueSaturation`` on a float image; only the master (composite) range is supported."""
+    adjustments = descriptor.get('adjustment', [])
+    if any(_channel(adjustment) is not None for adjustment in adjustments):
+        raise UnhandledStep("hue/saturation for individual colour ranges")
+    settings = adjustments[-1] if adjustments else {}
+    hue_shift = float(_value(settings.get('hue'), 0))
+    saturation = float(_value(settings.get('saturation'), 0))
+    lightness = float(_value(settings.get('lightness'), 0))
+
+    if descriptor.get('colorize'):
+        # Colorize keeps each pixel's luminance and replaces hue and saturation.
+        # With both fixed the result depends on luminance only: build a table
+        # over 256 luminance levels and index it.
+        levels = np.linspace(0, 1, 256, dtype=np.float32)
+        table = _hsl_to_rgb(
+            np.full_like(levels, (hue_shift % 360) / 360), np.full_like(levels, saturation / 100), levels
+        )
+        table = _apply_lightness(table, lightness).astype(rgb.dtype)
+        index = np.clip(np.rint(_luma(rgb) * 255), 0, 255).astype(np.uint8)
+        return table[index]
+    hue, sat, light = _rgb_to_hsl(rgb)
+    out = _hsl_to_rgb(hue + hue_shift / 360, np.clip(sat * (1 + saturation / 100), 0, 1), light)
+    return _apply_lightness(out, lightness)
+
+
+def desaturate(rgb, descriptor=None):
+    """``desaturate``: every channel becomes the pixel's HSL lightness."""
+    lightness = (_max3(rgb) + _min3(rgb)) / 2
+    return np.repeat(lightness[..., None], 3, axis=-1)
+
+
+def _lab_to_rgb(luminance, a, b):
+    """sRGB (0-1) of a CIE Lab colour with a D50 white point, as Photoshop uses."""
+    fy = (luminance + 16) / 116
+    fx = fy + a / 500
+    fz = fy - b / 200
+
+    def inverse(t):
+        return t ** 3 if t ** 3 > 0.008856 else (t - 16 / 116) / 7.787
+
+    xyz = np.array([0.96422 * inverse(fx), inverse(fy), 0.82521 * inverse(fz)])
+    linear = np.array([
+        [3.1338561, -1.6168667, -0.4906146],
+        [-0.9787684, 1.9161415, 0.0334540],
+        [0.0719453, -0.2289914, 1.4052427],
+    ]) @ xyz
+    linear = np.clip(linear, 0, 1)
+    return np.where(linear <= 0.0031308, 12.92 * linear, 1.055 * linear ** (1 / 2.4) - 0.055)
+
+
+def color_to_rgb(color):
+    """sRGB (0-1) of a labColor, HSBColorClass or RGBColor descriptor."""
+    kind = color.get('_obj')
+    if kind == 'labColor':
+        return _lab_to_rgb(float(color['luminance']), float(color['a']), float(color['b']))
+    if kind == 'HSBColorClass':
+        hue = float(_value(color.get('hue'), 0)) / 360
+        saturation = float(_value(color.get('saturation'), 0)) / 100
+        brightness = float(_value(color.get('brightness'), 100)) / 100
+        # HSB -> HSL
+        lightness = brightness * (1 - saturation / 2)
+        denominator = min(lightness, 1 - lightness)
+        sat = 0.0 if denominator == 0 else (brightness - lightness) / denominator
+        return _hsl_to_rgb(np.array(hue), np.array(sat), np.array(lightness))
+    if kind == 'RGBColor':
+        green = color.get('grain', color.get('green', 0))
+        return np.array([float(color.get('red', 0)), float(green), float(color.get('blue', 0))]) / 255
+    raise UnhandledStep(f"color {kind!r}")
+
+
+def photo_filter(rgb, descriptor):
+    """
+    ``photoFilter``: multiply by the filter colour at ``density`` percent.
+
+    With preserveLuminosity each pixel is rescaled to its original luma.
+    """
+    if 'color' not in descriptor:
+        raise UnhandledStep("photo filter without a color")
+    color = color_to_rgb(descriptor['color']).astype(rgb.dtype)
+    density = float(_value(descriptor.get('density'), 25)) / 100
+    out = rgb + (rgb * color - rgb) * density
+    if descriptor.get('preserveLuminosity', True):
+        before = _luma(rgb)
+        after = _luma(out)
+        out = out * (before / np.maximum(after, 1e-6))[..., None]
+    return out
+
+
+def _box_sizes(sigma, passes=3):
+    """Box widths whose repeated application approximates a gaussian of ``sigma``."""
+    ideal = np.sqrt(12 * sigma * sigma / passes + 1)
+    lower = int(np.floor(ideal))
+    if lower % 2 == 0:
+        lower -= 1
+    upper = lower + 2
+    m = round((12 * sigma * sigma - passes * lower * lower - 4 * passes * lower - 3 * passes) / (-4 * lower - 4))
+    return [lower if i < m else upper for i in range(passes)]
+
+
+def _box_blur(pixels, radius, axis):
+    """Mean over a 2*radius+1 window along ``axis`` with edge padding, via cumulative sums."""
+    if radius < 1:
+        return pixels
+    padding = [(0, 0)] * pixels.ndim
+    padding[axis] = (radius + 1, radius)
+    sums = np.cumsum(np.pad(pixels, padding, mode='edge'), axis=axis, dtype=np.float32)
+    length = pixels.shape[axis]
+    upper = [slice(None)] * pixels.ndim
+    lower = [slice(None)] * pixels.ndim
+    upper[axis] = slice(2 * radius + 1, 2 * radius + 1 + length)
+    lower[axis] = slice(0, length)
+    return (sums[tuple(upper)] - sums[tuple(lower)]) / (2 * radius + 1)
+
+
+def gaussian_blur(rgb, descriptor):
+    """``gaussianBlur`` with the radius as standard deviation, as three separable box blurs."""
+    sigma = float(_value(descriptor.get('radius'), 0))
+    if sigma < 0.3:
+        return rgb
+    for width in _box_sizes(sigma):
+        radius = (width - 1) // 2
+        rgb = _box_blur(_box_blur(rgb, radius, 0), radius, 1)
+    return rgb
+
+
+def add_noise(rgb, descriptor):
+    """
+    ``addNoise``: uniform noise of +/- amount, or gaussian noise with the
+    same variance. The descriptor's $FlRs seed makes runs repeatable.
+    """
+    amount = float(_value(descriptor.get('noise'), 0)) / 100
+    distribution = _value(descriptor.get('distort'), 'uniformDistribution')
+    rng = np.random.default_rng(descriptor.get('$FlRs', 0))
+    shape = rgb.shape[:-1] + (1,) if descriptor.get('monochromatic') else rgb.shape
+    if distribution == 'gaussianDistribution':
+        noise = rng.standard_normal(shape, dtype=np.float32) * np.float32(amount / np.sqrt(3))
+    else:
+        noise = rng.uniform(-amount, amount, shape).astype(np.float32)
+    return rgb + noise
+
+
+# Adjustments that become (3, 256) lookup tables
+LUT_ADJUSTMENTS = {
+    'curves': curves_lut,
+    'levels': levels_lut,
+    'brightnessEvent': brightness_contrast_lut,
+}
+# Adjustments and filters applied to float RGB in 0-1
+PIXEL_ADJUSTMENTS = {
+    'hueSaturation': hue_saturation,
+    'desaturate': desaturate,
+    'photoFilter': photo_filter,
+    'gaussianBlur': gaussian_blur,
+    'addNoise': add_noise,
+}
+# Operations that need the whole image (neighbouring pixels, one random stream)
+WHOLE_IMAGE = {'gaussianBlur', 'addNoise'}
+# Adjustment types that may be created as adjustment layers
+ADJUSTMENT_LAYERS = {'curves', 'levels', 'brightnessEvent', 'hueSaturation', 'photoFilter'}
+
+
+# ----------------------------------------------------------------------
+# Interpreting action lists
+# ----------------------------------------------------------------------
+
+def _target_ref(step):
+    target = step.get('_target') or [{}]
+    return target[0].get('_ref') if isinstance(target[0], dict) else None
+
+
+def _is_neutral(step):
+    """True for steps that do not change the flattened image."""
+    obj = step.get('_obj')
+    ref = _target_ref(step)
+    if obj == 'select':
+        # Selecting a layer or the RGB channel; selecting a mask would redirect later edits
+        target = (step.get('_target') or [{}])[0]
+        return ref == 'layer' or (ref == 'channel' and target.get('_value') in ('RGB', 'composite'))
+    if obj in ('mergeVisible', 'mergeLayersNew', 'duplicate'):
+        return True
+    if obj == 'make':
+        if ref == 'layerSection':
+            return True
+        if ref == 'layer':
+            # A new empty layer
+            return True
+        if step.get('new', {}).get('_class') == 'channel':
+            # A reveal-all layer mask hides nothing
+            return _value(step.get('using')) == 'revealAll'
+    if obj == 'set' and ref == 'layer':
+        return set(step.get('to', {})) <= {'_obj', 'name', 'color'}
+    return False
+
+
+def compile_actions(action_json):
+    """
+    Turn an action list into local operations.
+
+    Adjustment layers (``make`` + ``set`` on ``adjustmentLayer``) are merged
+    into one operation; ``set`` on the layer right after it may change its
+    opacity. Adjustments are only accepted while they go on top of the
+    layer stack: once layers have been added, selecting a layer makes the
+    position (and so the order) of later adjustments unknown.
+
+    Returns:
+        Tuple of (operations, unhandled) where unhandled lists
+        {"index", "step", "reason"} for every step that cannot run locally
+    """
+    operations = []
+    unhandled = []
+    current = None  # Adjustment layer that "targetEnum" refers to, if known
+    stacked = False  # The document has more than one layer
+    reselected = False  # A layer was selected since then, maybe not the top one
+
+    def reject(index, step, reason):
+        name = step.get('_obj') or next(iter(step), '?')
+        unhandled.append({'index': index, 'step': name, 'reason': reason})
+
+    for index, step in enumerate(action_json):
+        obj = step.get('_obj')
+        ref = _target_ref(step)
+
+        changes_image = (obj == 'make' and ref == 'adjustmentLayer') or obj in LUT_ADJUSTMENTS \
+            or obj in PIXEL_ADJUSTMENTS
+        if changes_image and reselected:
+            reject(index, step, "adjustment after selecting another layer: its place in the stack is unknown")
+            current = None
+            continue
+        if obj in ('make', 'duplicate', 'mergeVisible', 'mergeLayersNew'):
+            stacked = True
+
+        if obj == 'make' and ref == 'adjustmentLayer':
+            descriptor = dict(step.get('using', {}).get('type', {}))
+            if descriptor.get('_obj') not in ADJUSTMENT_LAYERS:
+                reject(index, step, f"{descriptor.get('_obj')} adjustment layer")
+                current = None
+                continue
+            current = {'kind': descriptor['_obj'], 'descriptor': descriptor, 'opacity': 1.0, 'index': index}
+            operations.append(current)
+        elif obj == 'set' and ref == 'adjustmentLayer':
+            to = step.get('to', {})
+            if current is None or to.get('_obj') != current['kind']:
+                reject(index, step, "set on an adjustment layer that cannot be tracked")
+                continue
+            current['descriptor'].update({key: value for key, value in to.items() if key != '_obj'})
+        elif obj == 'set' and ref == 'layer' and set(step.get('to', {})) == {'_obj', 'opacity'}:
+            if current is None:
+                reject(index, step, "opacity of a layer that cannot be tracked")
+                continue
+            current['opacity'] = float(_value(step['to']['opacity'], 100)) / 100
+        elif obj in LUT_ADJUSTMENTS or obj in PIXEL_ADJUSTMENTS:
+            operations.append({'kind': obj, 'descriptor': step, 'opacity': 1.0, 'index': index})
+            current = None
+        elif _is_neutral(step):
+            if obj == 'select' and ref == 'layer':
+                current = None
+                reselected = stacked
+        else:
+            reject(index, step, "not supported locally")
+            current = None
+
+    # Check parameters now, so unsupported variants are reported up front
+    compiled = []
+    for operation in operations:
+        try:
+            if operation['kind'] in LUT_ADJUSTMENTS:
+                operation['lut'] = LUT_ADJUSTMENTS[operation['kind']](operation['descriptor'])
+            elif operation['kind'] == 'photoFilter':
+                color_to_rgb(operation['descriptor'].get('color', {'_obj': 'RGBColor'}))
+            compiled.append(operation)
+        except (UnhandledStep, KeyError, TypeError, ValueError) as e:
+            unhandled.append({'index': operation['index'], 'step': operation['kind'], 'reason': str(e)})
+    unhandled.sort(key=lambda item: item['index'])
+    return compiled, unhandled
+
+
+def _fuse_luts(operations):
+    """Merge runs of lookup-table operations into single tables (opacity baked in)."""
+    fused = []
+    for operation in operations:
+        if 'lut' not in operation:
+            fused.append(operation)
+            continue
+        lut = operation['lut']
+        if operation['opacity'] < 1:
+            identity = np.arange(256, dtype=np.float64)
+            lut = np.rint(identity + (lut - identity) * operation['opacity']).astype(np.uint8)
+        if fused and 'lut' in fused[-1]:
+            previous = fused[-1]['lut']
+            lut = np.stack([lut[channel][previous[channel]] for channel in range(3)])
+            fused[-1] = {'kind': 'lut', 'lut': lut, 'opacity': 1.0}
+        else:
+            fused.append({'kind': 'lut', 'lut': lut, 'opacity': 1.0})
+    return fused
+
+
+def _apply_operation(pixels, operation):
+    if 'lut' in operation:
+        lut = operation['lut']
+        return np.stack([lut[channel][pixels[..., channel]] for channel in range(3)], axis=-1)
+    rgb = pixels.astype(np.float32) / 255
+    out = PIXEL_ADJUSTMENTS[operation['kind']](rgb, operation['descriptor'])
+    if operation['opacity'] < 1:
+        out = rgb + (out - rgb) * np.float32(operation['opacity'])
+    return np.clip(np.rint(out * 255), 0, 255).astype(np.uint8)
+
+
+def apply_operations(pixels, operations, strip_rows=STRIP_ROWS):
+    """
+    Apply compiled operations to an (H, W, 3) uint8 array.
+
+    Consecutive lookup-table operations are fused into one table. Runs of
+    per-pixel operations are applied strip by strip (``strip_rows`` rows
+    at a time), so their float temporaries stay in cache instead of
+    streaming the whole image through memory once per step; blur and noise
+    work on the whole image.
+    """
+    stage = []
+
+    def run_stage(pixels, stage):
+        if not stage:
+            return pixels
+        out = np.empty_like(pixels)
+        for row in range(0, pixels.shape[0], strip_rows):
+            strip = pixels[row:row + strip_rows]
+            for operation in stage:
+                strip = _apply_operation(strip, operation)
+            out[row:row + strip_rows] = strip
+        return out
+
+    for operation in _fuse_luts(operations):
+        if operation['kind'] in WHOLE_IMAGE:
+            pixels = _apply_operation(run_stage(pixels, stage), operation)
+            stage = []
+        else:
+            stage.append(operation)
+    return run_stage(pixels, stage)
+
+
+def unhandled_steps(action_json):
+    """Steps of an action list that cannot run locally (empty if all of them can)."""
+    return compile_actions(action_json)[1]
+
+
+def load_image(path):
+    """
+    Read an image as an (H, W, 3) uint8 array plus its alpha channel (or None).
+    Other modes, including 16-bit, are converted to 8-bit RGB.
+    """
+    with Image.open(path) as image:
+        image.load()
+        alpha = None
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+            alpha = np.asarray(image)[..., 3]
+        pixels = np.asarray(image.convert('RGB'))
+    return pixels, alpha
+
+
+def save_image(pixels, alpha, path):
+    """Write an RGB array (and alpha, where the format supports it) to ``path``."""
+    ext = os.path.splitext(path)[1].lower()
+    image = Image.fromarray(pixels, 'RGB')
+    if alpha is not None and OUTPUT_FORMATS[ext] != 'JPEG':
+        image.putalpha(Image.fromarray(alpha, 'L'))
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    options = {'quality': JPEG_QUALITY} if OUTPUT_FORMATS[ext] == 'JPEG' else {}
+    image.save(path, OUTPUT_FORMATS[ext], **options)
+
+
+def execute_locally(input_image, action_json, output_path=None, allow_partial=False, timings=None):
+    """
+    Run an action list on a local image.
+
+    Args:
+        input_image: Path of the input image
+        action_json: Action list, or the path of an action JSON file
+        output_path: JPEG, PNG or TIFF path (default: output_images/<name>_output<input ext>)
+        allow_partial: Run the supported steps even if others are unhandled
+        timings: Optional dict that receives load/apply/save seconds
+
+    Returns:
+        Output path, or None if steps are unhandled and ``allow_partial`` is False
+
+    Raises:
+        ValueError: If ``output_path`` is not a JPEG, PNG or TIFF path
+    """
+    if isinstance(action_json, str):
+        action_json = load_jsonc_file(action_json)
+    if timings is None:
+        timings = {}
+
+    operations, unhandled = compile_actions(action_json)
+    for item in unhandled:
+        print(f"  [LOCAL] Unhandled step {item['index']} ({item['step']}): {item['reason']}")
+    if unhandled and not allow_partial:
+        print(f"[LOCAL] {len(unhandled)} of {len(action_json)} steps cannot run locally")
+        return None
+
+    if output_path is None:
+        base_name, ext = os.path.splitext(os.path.basename(input_image))
+        if ext.lower() not in OUTPUT_FORMATS:
+            ext = '.png'
+        output_path = os.path.join('output_images', f"{base_name}_output{ext}")
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext not in OUTPUT_FORMATS:
+        raise ValueError(f"local outputs must be one of {', '.join(sorted(OUTPUT_FORMATS))}, not {ext or 'no extension'}")
+
+    stage_start = time.perf_counter()
+    pixels, alpha = load_image(input_image)
+    timings['load'] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    pixels = apply_operations(pixels, operations)
+    timings['apply'] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    save_image(pixels, alpha, output_path)
+    timings['save'] = time.perf_counter() - stage_start
+
+    print(f"[LOCAL] {len(operations)} operations in {timings['apply'] * 1000:.1f} ms -> {output_path}")
+    return output_path
+
+
+if __name__ == '__main__':
+    check = '--check' in sys.argv
+    allow_partial = '--allow-partial' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg not in ('--check', '--allow-partial')]
+
+    if check and len(args) >= 1:
+        # List what each action file would need the Photoshop API for
+        status = 0
+        for action_file in args:
+            unhandled = unhandled_steps(load_jsonc_file(action_file))
+            verdict = "local" if not unhandled else f"{len(unhandled)} unhandled"
+            print(f"{action_file}: {verdict}")
+            for item in unhandled:
+                print(f"  step {item['index']} ({item['step']}): {item['reason']}")
+            status = status or bool(unhandled)
+        sys.exit(1 if status else 0)
+
+    if len(args) < 2:
+        print("Usage: python local_engine.py <input_image> <action_json_file> [output_path] [--allow-partial]")
+        print("       python local_engine.py --check <action_json_file> ...")
+        print("\nExamples:")
+        print("  python local_engine.py input_images/image.jpg json_examples/sepia.json")
+        print("  python local_engine.py --check json_examples/*.json")
+        sys.exit(1)
+
+    try:
+        result = execute_locally(args[0], args[1], args[2] if len(args) > 2 else None, allow_partial)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if result:
+        print(f"\n✓ Success! Output: {result}")
+        sys.exit(0)
+    else:
+        print("\n✗ Not run locally; use actions.py or photoshop_actions.py for this preset")
+        sys.exit(1)
@@ -6,12 +6,33 @@ Executes Photoshop actions defined in JSON files on images.
 import os
 import sys
 import json
-import re
 import time
+import uuid
 import requests
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import dropbox
 from dotenv import load_dotenv
 
+from ims_token import get_token_provider
+from http_session import get_session
+from result_cache import get_result_cache, result_key
+import renditions as rend
+import preview
+from preprocess import InputError, prepare_inputs
+from job_poller import poll_job
+from rate_limit import limited_request
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to exclusive lock file creation
+    fcntl = None
+
+# Shared JSONC loader from the fluxa package in actionJSON-generator/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'actionJSON-generator', 'src'))
+from fluxa.utils.jsonc import load_jsonc_file, strip_comments
+from fluxa.utils.optimizer import optimize_actions, format_report
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -21,89 +42,297 @@ load_dotenv()
 DROPBOX_ACCESS_TOKEN = os.getenv('DROPBOX_ACCESS_TOKEN')
 CLIENT_ID = os.getenv('CLIENT_ID')
 CLIENT_SECRET = os.getenv('CLIENT_SECRET')
+PHOTOSHOP_API_URL = os.getenv('PHOTOSHOP_API_URL', 'https://image.adobe.io')
+JOB_TIMEOUT = float(os.getenv('PHOTOSHOP_JOB_TIMEOUT', '600'))
+OPTIMIZE_ACTIONS = os.getenv('OPTIMIZE_ACTIONS', '0') in ('1', 'true', 'yes')
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_TIMEOUT = 60
+# Outputs are streamed straight from the Dropbox files API; set to 0 to go
+# through a shared link instead
+DROPBOX_DIRECT_DOWNLOAD = os.getenv('DROPBOX_DIRECT_DOWNLOAD', '1') not in ('0', 'false', 'no')
+DROPBOX_CONTENT_URL = os.getenv('DROPBOX_CONTENT_URL', 'https://content.dropboxapi.com')
+# Files larger than one range are fetched as parallel ranged requests
+DROPBOX_RANGE_SIZE = int(float(os.getenv('DROPBOX_DOWNLOAD_CHUNK_MB', '16')) * 1024 * 1024)
+DROPBOX_DOWNLOAD_CONCURRENCY = int(os.getenv('DROPBOX_DOWNLOAD_CONCURRENCY', '4'))
+# Every job works in its own folder under this one, deleted when the job ends
+DROPBOX_WORK_DIR = os.getenv('DROPBOX_WORK_DIR', '/fluxa-jobs').rstrip('/')
 
 # ============================================================================
 # Helper Functions
 # ============================================================================
 
 def get_access_token(client_id, client_secret):
-    """Get Adobe access token using client credentials."""
-    params = {
-        'client_secret': client_secret,
-        'grant_type': 'client_credentials',
-        'scope': 'openid,AdobeID,read_organizations,firefly_api,ff_apis'
-    }
-    response = requests.post(
-        f'https://ims-na1.adobelogin.com/ims/token/v2?client_id={client_id}', 
-        data=params
-    )
-    return response.json().get('access_token')
+    """Get Adobe access token using client credentials (cached until shortly before expiry)."""
+    return get_token_provider(client_id, client_secret).get()
+
+def get_dropbox_client():
+    """Create a Dropbox client that shares the pooled HTTP session."""
+    return dropbox.Dropbox(DROPBOX_ACCESS_TOKEN, session=get_session())
 
 def remove_json_comments(json_string):
-    """Remove comments from a JSON string, being careful not to remove // inside string values."""
-    lines = json_string.split('\n')
-    cleaned_lines = []
-    in_string = False
-    escape_next = False
-    
-    for line in lines:
-        cleaned_line = []
-        i = 0
-        while i < len(line):
-            char = line[i]
-            
-            if escape_next:
-                cleaned_line.append(char)
-                escape_next = False
-                i += 1
-                continue
-            
-            if char == '\\':
-                escape_next = True
-                cleaned_line.append(char)
-                i += 1
-                continue
-            
-            if char == '"':
-                in_string = not in_string
-                cleaned_line.append(char)
-                i += 1
-                continue
-            
-            # Only remove // if we're not inside a string
-            if not in_string and char == '/' and i + 1 < len(line) and line[i + 1] == '/':
-                # Found a comment - skip the rest of the line
-                break
+    """Remove // and /* */ comments from a JSON string, leaving comment-like text inside strings alone."""
+    return strip_comments(json_string).strip()
+
+def _expected_size(response, offset):
+    """Total size of the file being downloaded, from Content-Range or Content-Length."""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    if 'Content-Length' in response.headers:
+        return int(response.headers['Content-Length']) + (offset if response.status_code == 206 else 0)
+    return None
+
+def download_image(url, file_path, chunk_size=DOWNLOAD_CHUNK_SIZE, max_retries=DOWNLOAD_RETRIES):
+    """
+    Stream an image from a URL to a file with constant memory use.
+    
+    Chunks are written to ``<file_path>.part``, which is renamed into place
+    only when complete and removed if the download fails. Connections that
+    drop during this call are resumed with HTTP Range requests, from where
+    the partial file left off; a ``.part`` left by an earlier run is never
+    resumed.
+    
+    Args:
+        url: URL to download
+        file_path: Destination path
+        chunk_size: Bytes held in memory at a time
+        max_retries: Resume attempts after a dropped connection
+    
+    Returns:
+        file_path on success, or None if the download failed
+    """
+    tmp_path = f"{file_path}.part"
+    try:
+        os.makedirs(os.path.dirname(file_path) if os.path.dirname(file_path) else '.', exist_ok=True)
+        # Bytes from another run may belong to a different file: start empty
+        with open(tmp_path, 'wb'):
+            pass
+        retries = 0
+        
+        while True:
+            offset = os.path.getsize(tmp_path) if os.path.exists(tmp_path) else 0
+            headers = {'Range': f'bytes={offset}-'} if offset else {}
             
-            cleaned_line.append(char)
-            i += 1
+            try:
+                with get_session().get(url, headers=headers, stream=True, allow_redirects=True,
+                                  timeout=DOWNLOAD_TIMEOUT) as response:
+                    if response.status_code == 416 and offset:
+                        # The partial file already holds every byte
+                        break
+                    if response.status_code not in (200, 206):
+                        print(f"Failed to download image. Status code: {response.status_code}")
+                        return None
+                    
+                    # A 200 means the server ignored the Range header: start over
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+                    expected = _expected_size(response, offset)
+                    with open(tmp_path, mode) as file:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            file.write(chunk)
+                
+                if expected is None or os.path.getsize(tmp_path) >= expected:
+                    break
+                raise requests.ConnectionError("connection closed before the download completed")
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                retries += 1
+                if retries > max_retries:
+                    print(f"Download failed after {max_retries} resume attempts: {e}")
+                    return None
+                print(f"Download interrupted ({e}); resuming from byte {os.path.getsize(tmp_path) if os.path.exists(tmp_path) else 0}")
         
-        cleaned_lines.append(''.join(cleaned_line))
-    
-    result = '\n'.join(cleaned_lines)
-    # Remove multi-line comments (but be careful with strings)
-    # For multi-line comments, we need a more careful approach
-    # Simple approach: remove /* */ comments that don't span strings
-    result = re.sub(r'/\*[\s\S]*?\*/', '', result)
-    return result.strip()
+        os.replace(tmp_path, file_path)
+        print(f"Image downloaded successfully and saved to {file_path}")
+        return file_path
+    except Exception as e:
+        print(f"An error occurred while downloading image: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-def download_image(url, file_path):
-    """Download an image from a URL and save it to a file."""
+def _dropbox_download_range(dropbox_path, tmp_path, start, end, max_retries=DOWNLOAD_RETRIES):
+    """
+    Fetch bytes ``start``..``end`` of a Dropbox file into ``tmp_path`` at the same offset.
+    
+    Dropped connections resume from the last byte written. ``end`` may be
+    None for "to the end of the file".
+    
+    Returns:
+        Total size of the file, from the response's Content-Range
+    """
+    offset = start
+    retries = 0
+    while True:
+        try:
+            with get_session().post(
+                f'{DROPBOX_CONTENT_URL}/2/files/download',
+                headers={
+                    'Authorization': f'Bearer {DROPBOX_ACCESS_TOKEN}',
+                    'Dropbox-API-Arg': json.dumps({'path': dropbox_path}),
+                    'Range': f"bytes={offset}-{'' if end is None else end}"
+                },
+                stream=True,
+                timeout=DOWNLOAD_TIMEOUT
+            ) as response:
+                if response.status_code == 416:
+                    # Nothing at or after ``offset``: an empty file, or every byte is already here
+                    return _expected_size(response, offset)
+                if response.status_code not in (200, 206):
+                    raise requests.HTTPError(
+                        f"Dropbox download failed: {response.status_code} {response.text[:200]}"
+                    )
+                total = _expected_size(response, offset)
+                if response.status_code == 200:
+                    # Range ignored: the body is the whole file
+                    offset = 0
+                with open(tmp_path, 'r+b') as file:
+                    file.seek(offset)
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+                        offset += len(chunk)
+            if total is None:
+                # No size to check against: trust the closed stream
+                return total
+            last = (total - 1) if end is None or response.status_code == 200 else min(end, total - 1)
+            if offset > last:
+                return total
+            raise requests.ConnectionError("connection closed before the range completed")
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            retries += 1
+            if retries > max_retries:
+                raise
+            print(f"Download interrupted ({e}); resuming from byte {offset}")
+
+def download_from_dropbox(dropbox_path, file_path, range_size=None, concurrency=None):
+    """
+    Stream a file straight from the Dropbox files API to a local path.
+    
+    Unlike a shared link, this needs no extra API calls and leaves no
+    public link behind. The first request fetches the first ``range_size``
+    bytes and learns the file size; larger files fetch their remaining
+    ranges in parallel. Bytes go to ``<file_path>.part``, renamed into
+    place once complete.
+    
+    Returns:
+        file_path on success, or None if the download failed
+    """
+    range_size = range_size or DROPBOX_RANGE_SIZE
+    tmp_path = f"{file_path}.part"
     try:
-        response = requests.get(url, allow_redirects=True)
-        if response.status_code == 200:
-            os.makedirs(os.path.dirname(file_path) if os.path.dirname(file_path) else '.', exist_ok=True)
-            with open(file_path, 'wb') as file:
-                file.write(response.content)
-            print(f"Image downloaded successfully and saved to {file_path}")
-            return file_path
-        else:
-            print(f"Failed to download image. Status code: {response.status_code}")
-            return None
+        os.makedirs(os.path.dirname(file_path) if os.path.dirname(file_path) else '.', exist_ok=True)
+        with open(tmp_path, 'wb'):
+            pass
+        size = _dropbox_download_range(dropbox_path, tmp_path, 0, range_size - 1)
+        if size is not None and size > range_size:
+            ranges = [
+                (start, min(start + range_size, size) - 1) for start in range(range_size, size, range_size)
+            ]
+            workers = min(concurrency or DROPBOX_DOWNLOAD_CONCURRENCY, len(ranges))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_dropbox_download_range, dropbox_path, tmp_path, start, end)
+                    for start, end in ranges
+                ]
+                for future in futures:
+                    future.result()
+        os.replace(tmp_path, file_path)
+        print(f"Image downloaded successfully and saved to {file_path}")
+        return file_path
     except Exception as e:
-        print(f"An error occurred while downloading image: {e}")
+        print(f"An error occurred while downloading {dropbox_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return None
 
+def download_via_shared_link(dbx, dropbox_path, file_path):
+    """Download a Dropbox file through a (possibly existing) shared link."""
+    try:
+        shared_link_metadata = dbx.sharing_create_shared_link_with_settings(dropbox_path)
+    except Exception as e:
+        # Link already exists, get the existing one
+        shared_link_metadata = e.error.get_shared_link_already_exists().get_metadata()
+    
+    common_link = shared_link_metadata.url
+    direct_link = common_link.replace("www.dropbox.com", "dl.dropboxusercontent.com").replace("dl=0", "dl=1")
+    print(f"Download link: {direct_link}")
+    return download_image(direct_link, file_path)
+
+def make_job_dir():
+    """Unique Dropbox folder for one job's input and outputs."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{DROPBOX_WORK_DIR}/{timestamp}_{uuid.uuid4().hex[:8]}"
+
+def cleanup_dropbox_job(dbx, job_dir):
+    """Delete a job's Dropbox folder with its input and outputs."""
+    print(f"Cleaning up Dropbox folder: {job_dir}")
+    try:
+        dbx.files_delete_v2(job_dir)
+    except Exception as e:
+        print(f"Warning: Could not delete {job_dir}: {e}")
+
+def _try_lock(lock_path):
+    """Open and exclusively lock ``lock_path``; None if another run holds it."""
+    if not fcntl:
+        # No flock (Windows): the lock file's existence is the lock
+        try:
+            return os.fdopen(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY), 'w')
+        except FileExistsError:
+            return None
+    while True:
+        lock_file = open(lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        # The previous holder unlinks the file before letting go of it, so a
+        # lock on a file that is no longer at lock_path is worthless: retry
+        try:
+            if os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path)):
+                return lock_file
+        except FileNotFoundError:
+            pass
+        lock_file.close()
+
+def claim_output_path(output_path):
+    """
+    Reserve a local output path for this run.
+    
+    Each run holds an exclusive flock on a ``<output>.lock`` file while it
+    writes. If another live run holds ``output_path``, the next free
+    ``<name>_2.<ext>``, ``<name>_3.<ext>``, ... is used instead, so
+    concurrent runs never write the same file. The kernel drops the flock
+    of a crashed process, so its leftover lock file is simply locked again.
+    
+    Returns:
+        Tuple of (output_path, lock_file); pass lock_file to release_output_path when done
+    """
+    os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else '.', exist_ok=True)
+    base, ext = os.path.splitext(output_path)
+    n = 1
+    while True:
+        candidate = output_path if n == 1 else f"{base}_{n}{ext}"
+        lock_file = _try_lock(f"{os.path.splitext(candidate)[0]}.lock")
+        if lock_file is None:
+            n += 1
+            continue
+        # The pid is only informational; the flock is what holds the path
+        lock_file.truncate(0)
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        return candidate, lock_file
+
+def release_output_path(lock_file):
+    """Remove a lock file from claim_output_path and then release it."""
+    try:
+        os.remove(lock_file.name)
+    except FileNotFoundError:
+        pass
+    lock_file.close()
+
 def load_action_json_from_file(json_file_path):
     """
     Load action JSON from a file.
@@ -115,12 +344,8 @@ def load_action_json_from_file(json_file_path):
         Action JSON array, or None if failed
     """
     try:
-        with open(json_file_path, 'r') as f:
-            content = f.read()
-            # Remove comments if any
-            content = remove_json_comments(content)
-            action_json = json.loads(content)
-            return action_json
+        # Comments are allowed; parses are cached until the file changes
+        return load_jsonc_file(json_file_path)
     except Exception as e:
         print(f"Error loading action JSON from file: {e}")
         import traceback
@@ -131,7 +356,8 @@ def load_action_json_from_file(json_file_path):
 # Main Processing Function
 # ============================================================================
 
-def execute_photoshop_action(input_image_path, action_json_file, output_image_path=None):
+def execute_photoshop_action(input_image_path, action_json_file, output_image_path=None, timings=None,
+                             optimize=None, renditions=None):
     """
     Execute a Photoshop action JSON on an image using Adobe Photoshop API.
     
@@ -139,9 +365,16 @@ def execute_photoshop_action(input_image_path, action_json_file, output_image_pa
         input_image_path: Path to the input image file
         action_json_file: Path to JSON file containing the action JSON
         output_image_path: Optional path for output image (default: auto-generated)
+        timings: Optional dict that receives per-stage wall times in seconds
+            (preprocess, upload, submit, poll, download, cleanup)
+        optimize: Remove or merge redundant action steps before submitting
+            (default: OPTIMIZE_ACTIONS)
+        renditions: Outputs to request, as specs ("jpeg:quality=8,width=2048")
+            or dicts (default: one PSD). With several, each is saved next to
+            output_image_path with its own extension.
     
     Returns:
-        Path to the processed image file, or None if processing failed
+        Path to the processed image file (the first rendition), or None if processing failed
     """
     # Validate environment variables
     if not DROPBOX_ACCESS_TOKEN:
@@ -170,49 +403,136 @@ def execute_photoshop_action(input_image_path, action_json_file, output_image_pa
         print("Error: Failed to load action JSON from file")
         return None
     
+    if optimize is None:
+        optimize = OPTIMIZE_ACTIONS
+    if optimize:
+        action_json_array, report = optimize_actions(action_json_array)
+        print(f"Optimized action JSON: {format_report(report)}")
+    
     print(f"Action JSON loaded: {json.dumps(action_json_array, indent=2)}")
     
+    renditions = rend.parse_renditions(renditions)
+    
+    # Generate output path with _output suffix for 1-1 mapping
+    if output_image_path is None:
+        os.makedirs("output_images", exist_ok=True)
+        # Get base filename without directory path
+        base_name = os.path.basename(input_image_path)
+        # Split filename and extension
+        name_without_ext, ext = os.path.splitext(base_name)
+        # Create output filename: original_name_output.ext
+        output_filename = f"{name_without_ext}_output{ext}"
+        output_image_path = os.path.join("output_images", output_filename)
+    
+    # Reject an input the API cannot take before uploading it
+    if timings is None:
+        timings = {}
+    stage_start = time.perf_counter()
+    try:
+        input_image_path = prepare_inputs([input_image_path])[0]
+    except InputError as e:
+        print(f"Error: {e}")
+        return None
+    timings['preprocess'] = time.perf_counter() - stage_start
+    
+    # A concurrent run writing the same output gets a numbered name instead
+    output_image_path, lock_file = claim_output_path(output_image_path)
+    try:
+        return _run_dropbox_job(
+            input_image_path, action_json_array, output_image_path, renditions, timings
+        )
+    finally:
+        release_output_path(lock_file)
+
+def _run_dropbox_job(input_image_path, action_json_array, output_image_path, renditions, timings):
+    """Run one job in its own Dropbox folder, which is deleted afterwards."""
+    output_paths = rend.rendition_paths(output_image_path, renditions)
+    
+    # Same image and actions as an earlier run: reuse its outputs
+    result_cache = get_result_cache()
+    if result_cache is not None:
+        cache_keys = [
+            result_key([input_image_path], action_json_array, rend.rendition_id(rendition))
+            for rendition in renditions
+        ]
+        if all(result_cache.get(key, path) for key, path in zip(cache_keys, output_paths)):
+            print(f"Reused cached result: {output_image_path}")
+            return output_image_path
+    
+    if timings is None:
+        timings = {}
+    
     # Initialize Dropbox client
-    dbx = dropbox.Dropbox(DROPBOX_ACCESS_TOKEN)
+    dbx = get_dropbox_client()
+    job_dir = make_job_dir()
+    try:
+        downloaded_paths = _process_in_dropbox(
+            dbx, job_dir, input_image_path, action_json_array, output_paths, renditions, timings
+        )
+    finally:
+        stage_start = time.perf_counter()
+        cleanup_dropbox_job(dbx, job_dir)
+        timings['cleanup'] = time.perf_counter() - stage_start
+    if not downloaded_paths:
+        return None
     
-    # Upload input image to Dropbox
+    if result_cache is not None:
+        for key, path in zip(cache_keys, downloaded_paths):
+            result_cache.put(key, path)
+    print(f"Successfully processed image saved to: {', '.join(downloaded_paths)}")
+    return downloaded_paths[0]
+
+def _process_in_dropbox(dbx, job_dir, input_image_path, action_json_array, output_paths, renditions, timings):
+    """
+    Upload, submit, poll and download one job inside ``job_dir``.
+    
+    Returns:
+        Downloaded output paths, or None if a stage failed
+    """
+    stage_start = time.perf_counter()
+    
+    # Upload input image to this job's Dropbox folder
     file_name = os.path.basename(input_image_path)
-    dropbox_input_path = f'/{file_name}'
+    dropbox_input_path = f'{job_dir}/{file_name}'
     
     print(f"Uploading image to Dropbox: {dropbox_input_path}")
     with open(input_image_path, 'rb') as f:
-        dbx.files_upload(f.read(), dropbox_input_path, mode=dropbox.files.WriteMode.overwrite)
+        dbx.files_upload(f.read(), dropbox_input_path, mode=dropbox.files.WriteMode.add)
     
     # Get Dropbox temporary link for input
     input_link = dbx.files_get_temporary_link(dropbox_input_path).link
     print(f"Input link: {input_link}")
     
-    # Prepare output path - use UUID for Dropbox to avoid conflicts
-    # (final output filename will be set later)
-    output_file_name = f'temp_{file_name}'
-    output_file_path = f'/{output_file_name}'
-    
-    # Get Dropbox temporary upload link for output
-    output_link = dbx.files_get_temporary_upload_link(
-        commit_info=dropbox.files.CommitInfo(
-            path=output_file_path, 
-            mode=dropbox.files.WriteMode.overwrite
+    # Prepare output paths - one temporary Dropbox file per rendition
+    # (final output filenames will be set later)
+    name_without_ext = os.path.splitext(file_name)[0]
+    output_file_paths = []
+    outputs = []
+    for idx, rendition in enumerate(renditions):
+        suffix = rend.rendition_suffix(renditions, idx)
+        output_file_path = f'{job_dir}/temp_{name_without_ext}{suffix}{rend.extension(rendition)}'
+        
+        # Get Dropbox temporary upload link for output
+        output_link = dbx.files_get_temporary_upload_link(
+            commit_info=dropbox.files.CommitInfo(
+                path=output_file_path, 
+                mode=dropbox.files.WriteMode.overwrite
+            )
         )
-    )
-    print(f"Output path: {output_file_path}")
+        output_file_paths.append(output_file_path)
+        outputs.append(rend.output_spec(rendition, output_link.link, storage="dropbox"))
+        print(f"Output path: {output_file_path}")
+    timings['upload'] = time.perf_counter() - stage_start
     
     # Prepare data for Adobe API
     data = {
         "inputs": [{"storage": "dropbox", "href": input_link}],
         "options": {"actionJSON": action_json_array},
-        "outputs": [{
-            "storage": "dropbox", 
-            "type": "image/vnd.adobe.photoshop", 
-            "href": output_link.link
-        }]
+        "outputs": outputs
     }
     
     # Get Adobe access token
+    stage_start = time.perf_counter()
     print("Getting Adobe access token...")
     access_token = get_access_token(CLIENT_ID, CLIENT_SECRET)
     if not access_token:
@@ -221,8 +541,8 @@ def execute_photoshop_action(input_image_path, action_json_file, output_image_pa
     
     # Call Adobe Photoshop API
     print("Calling Adobe Photoshop API...")
-    response = requests.post(
-        'https://image.adobe.io/pie/psdService/actionJSON',
+    response = limited_request(
+        get_session(), 'POST', f'{PHOTOSHOP_API_URL}/pie/psdService/actionJSON',
         headers={
             'Authorization': f'Bearer {access_token}',
             'x-api-key': CLIENT_ID
@@ -231,79 +551,104 @@ def execute_photoshop_action(input_image_path, action_json_file, output_image_pa
     )
     
     result = response.json()
+    timings['submit'] = time.perf_counter() - stage_start
     print(f"API Response: {json.dumps(result, indent=2)}")
     
-    # Poll for job status
-    status = "running"
-    job_result = None
+    # Poll for job status (starts fast, backs off, stops on any terminal status)
     print("Polling for job status...")
+    stage_start = time.perf_counter()
+    status, job_result = poll_job(
+        result['_links']['self']['href'],
+        {
+            'Authorization': f'Bearer {access_token}',
+            'x-api-key': CLIENT_ID
+        },
+        timeout=JOB_TIMEOUT,
+        on_status=lambda status: print(f"Job status: {status}")
+    )
     
-    while status == "running" or status == "pending":
-        job_response = requests.get(
-            result['_links']['self']['href'], 
-            headers={
-                'Authorization': f'Bearer {access_token}',
-                'x-api-key': CLIENT_ID
-            }
-        )
-        job_result = job_response.json()
-        status = job_result["outputs"][0]['status']
-        print(f"Job status: {status}")
-        time.sleep(1)
-    
+    timings['poll'] = time.perf_counter() - stage_start
     print(f"Job completed. Final result: {json.dumps(job_result, indent=2)}")
-    
-    # Get shared link for the output file
-    try:
-        shared_link_metadata = dbx.sharing_create_shared_link_with_settings(output_file_path)
-    except Exception as e:
-        # Link already exists, get the existing one
-        shared_link_metadata = e.error.get_shared_link_already_exists().get_metadata()
-    
-    common_link = shared_link_metadata.url
-    direct_link = common_link.replace("www.dropbox.com", "dl.dropboxusercontent.com").replace("dl=0", "dl=1")
-    print(f"Download link: {direct_link}")
-    
-    # Download the processed image
-    os.makedirs("output_images", exist_ok=True)
-    
-    # Generate output path with _output suffix for 1-1 mapping
-    if output_image_path is None:
-        # Get base filename without directory path
-        base_name = os.path.basename(input_image_path)
-        # Split filename and extension
-        name_without_ext, ext = os.path.splitext(base_name)
-        # Create output filename: original_name_output.ext
-        output_filename = f"{name_without_ext}_output{ext}"
-        output_image_path = os.path.join("output_images", output_filename)
-    
-    # Download and save the image
-    downloaded_path = download_image(direct_link, output_image_path)
-    
-    if downloaded_path:
-        print(f"Successfully processed image saved to: {downloaded_path}")
-        return downloaded_path
-    else:
-        print("Failed to download processed image")
+    if status != "succeeded":
+        print(f"Error: Job finished with status: {status}")
         return None
+    
+    stage_start = time.perf_counter()
+    downloaded_paths = []
+    for output_file_path, output_path in zip(output_file_paths, output_paths):
+        # Download and save the image
+        if DROPBOX_DIRECT_DOWNLOAD:
+            downloaded_path = download_from_dropbox(output_file_path, output_path)
+        else:
+            downloaded_path = download_via_shared_link(dbx, output_file_path, output_path)
+        if not downloaded_path:
+            print("Failed to download processed image")
+            return None
+        downloaded_paths.append(downloaded_path)
+    timings['download'] = time.perf_counter() - stage_start
+    return downloaded_paths
 
 # ============================================================================
 # Main Entry Point
 # ============================================================================
 
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: python aeroplane_remove.py <input_image_path> <action_json_file> [output_image_path]")
+    # None leaves the choice to OPTIMIZE_ACTIONS
+    optimize = True if '--optimize' in sys.argv else None
+    try:
+        argv, preview_edge, final = preview.split_preview_args(arg for arg in sys.argv[1:] if arg != '--optimize')
+        args, rendition_specs = rend.split_rendition_args(argv)
+        renditions = rend.parse_renditions(rendition_specs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if final:
+        saved = preview.load_preview('photoshop_actions')
+        if saved is None:
+            print("Error: No preview to finalize; run with --preview first")
+            sys.exit(1)
+        print(f"[PREVIEW] Running the last preview at full resolution: {saved['action_json_file']}")
+        input_path = saved['input_images'][0]
+        action_json_file = saved['action_json_file']
+        output_path = saved['output_path']
+        renditions = rend.parse_renditions(saved['renditions'])
+        if saved['optimize']:
+            optimize = True
+    elif len(args) < 2:
+        print("Usage: python aeroplane_remove.py <input_image_path> <action_json_file> [output_image_path] "
+              "[--optimize] [--rendition SPEC ...] [--preview[=LONG_EDGE]]")
+        print("       python aeroplane_remove.py --final")
         print("\nExample:")
         print("  python aeroplane_remove.py input_images/image.jpg action.json")
         print("  python aeroplane_remove.py input_images/image.jpg action.json output_images/result.jpg")
+        print("  python aeroplane_remove.py input_images/image.jpg action.json --rendition jpeg:quality=8,width=2048")
+        print("  python aeroplane_remove.py input_images/image.jpg action.json --preview=768")
         sys.exit(1)
-    
-    input_path = sys.argv[1]
-    action_json_file = sys.argv[2]
-    output_path = sys.argv[3] if len(sys.argv) > 3 else None
-    
-    result_path = execute_photoshop_action(input_path, action_json_file, output_path)
+    else:
+        input_path = args[0]
+        action_json_file = args[1]
+        output_path = args[2] if len(args) > 2 else None
+    
+    if preview_edge and not final:
+        # Reject a missing or unreadable input before building a proxy from it
+        try:
+            proxy_path = preview.make_proxy(prepare_inputs([input_path])[0], preview_edge)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        result_path = execute_photoshop_action(
+            proxy_path, action_json_file,
+            preview.preview_output_path(input_path), optimize=optimize,
+            renditions=preview.preview_renditions()
+        )
+        if result_path:
+            preview.save_preview('photoshop_actions', [input_path], action_json_file, output_path,
+                                 rendition_specs, optimize=optimize, long_edge=preview_edge)
+            print("[PREVIEW] Run with --final for the full-resolution output")
+    else:
+        result_path = execute_photoshop_action(
+            input_path, action_json_file, output_path, optimize=optimize, renditions=renditions
+        )
     
     if result_path:
         print(f"\n✓ Success! Processed image saved to: {result_path}")
@@ -0,0 +1,253 @@
+"""
+Input preprocessing before upload.
+Inputs used to be uploaded byte for byte, so a corrupt file, an unsupported
+format or an image over the Photoshop API limits only failed after the full
+upload and job wait. Each input's header is now checked first, which takes
+milliseconds, and inputs can be re-encoded to fit a byte budget. Re-encoding
+several inputs runs in a process pool.
+"""
+
+import io
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from PIL import Image
+
+import r2_cas
+
+INPUT_CHECK = os.getenv('INPUT_CHECK', '1') not in ('0', 'false', 'no')
+# Largest width or height accepted (Photoshop documents max out at 30000px)
+MAX_DIMENSION = int(os.getenv('INPUT_MAX_DIMENSION', '30000'))
+# Largest pixel count accepted; Pillow itself refuses images over about 179 megapixels
+MAX_PIXELS = int(float(os.getenv('INPUT_MAX_MEGAPIXELS', '150')) * 1000 * 1000)
+MAX_INPUT_BYTES = int(float(os.getenv('INPUT_MAX_MB', '1024')) * 1024 * 1024)
+# Re-encode inputs larger than this; 0 uploads them as they are
+INPUT_BUDGET_BYTES = int(float(os.getenv('INPUT_BUDGET_MB', '0')) * 1024 * 1024)
+PREPROCESS_WORKERS = int(os.getenv('PREPROCESS_WORKERS', str(os.cpu_count() or 1)))
+CACHE_DIR = os.getenv(
+    'PREPROCESS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'fluxa', 'preprocessed')
+)
+
+# Formats uploaded as they are; other formats Pillow can read are re-encoded
+SUPPORTED_FORMATS = ('JPEG', 'PNG', 'TIFF', 'PSD')
+JPEG_QUALITIES = (92, 85, 75)
+# Images are scaled down by this factor until they fit the budget, but not below MIN_DIMENSION
+DOWNSCALE_STEP = 0.8
+MIN_DIMENSION = 256
+
+
+class InputError(ValueError):
+    """An input image that the Photoshop API would reject."""
+
+
+def open_image(path):
+    """
+    Image.open for inputs, without Pillow's DecompressionBombWarning.
+
+    Large inputs are expected here and inspect_image enforces MAX_PIXELS,
+    so the warning is noise. Pillow's global limit is left alone; images
+    past its hard limit still raise Image.DecompressionBombError.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        return Image.open(path)
+
+
+def inspect_image(path):
+    """
+    Read and check an image's header without decoding its pixels.
+
+    Returns:
+        Dictionary with format, width, height, mode, alpha and bytes
+
+    Raises:
+        InputError: If the file is missing, unreadable or over the limits
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        raise InputError(f"{path}: file not found")
+    if size == 0:
+        raise InputError(f"{path}: file is empty")
+
+    try:
+        with open_image(path) as image:
+            info = {
+                'format': image.format,
+                'width': image.width,
+                'height': image.height,
+                'mode': image.mode,
+                'alpha': image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info,
+                'bytes': size
+            }
+            image.verify()
+    except Image.DecompressionBombError as e:
+        raise InputError(f"{path}: too many pixels ({e})")
+    except (OSError, SyntaxError, ValueError) as e:
+        raise InputError(f"{path}: not a readable image ({e})")
+
+    if not info['width'] or not info['height']:
+        raise InputError(f"{path}: image has no pixels")
+    if max(info['width'], info['height']) > MAX_DIMENSION:
+        raise InputError(
+            f"{path}: {info['width']}x{info['height']} exceeds the {MAX_DIMENSION}px limit"
+        )
+    if info['width'] * info['height'] > MAX_PIXELS:
+        raise InputError(
+            f"{path}: {info['width']}x{info['height']} exceeds the {MAX_PIXELS / 1000 / 1000:.0f} megapixel limit"
+        )
+    return info
+
+
+def _encode(image, image_format, quality, icc_profile):
+    buffer = io.BytesIO()
+    if image_format == 'PNG':
+        image.save(buffer, 'PNG', optimize=True, icc_profile=icc_profile)
+    else:
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, icc_profile=icc_profile)
+    return buffer.getvalue()
+
+
+def transcode(path, info, budget_bytes=0):
+    """
+    Re-encode an image as JPEG (PNG if it has alpha), lowering the JPEG
+    quality and then the resolution until it fits ``budget_bytes``.
+
+    Results are cached by input content and budget, so running the same
+    input again re-uses the file (and its R2 upload).
+
+    Returns:
+        Path of the re-encoded image
+
+    Raises:
+        InputError: If the image cannot fit the budget
+    """
+    image_format = 'PNG' if info['alpha'] else 'JPEG'
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    out_dir = os.path.join(CACHE_DIR, f"{r2_cas.file_sha256(path)[:16]}_{budget_bytes}")
+    out_path = os.path.join(out_dir, base_name + ('.png' if info['alpha'] else '.jpg'))
+    if os.path.exists(out_path):
+        return out_path
+
+    with open_image(path) as image:
+        icc_profile = image.info.get('icc_profile')
+        if info['alpha']:
+            image = image.convert('RGBA')
+        elif image.mode not in ('RGB', 'L', 'CMYK'):
+            image = image.convert('RGB')
+        else:
+            image.load()
+
+        qualities = (None,) if image_format == 'PNG' else JPEG_QUALITIES
+        while True:
+            for quality in qualities:
+                data = _encode(image, image_format, quality, icc_profile)
+                if not budget_bytes or len(data) <= budget_bytes:
+                    break
+            else:
+                if max(image.size) * DOWNSCALE_STEP < MIN_DIMENSION:
+                    raise InputError(f"{path}: cannot fit {budget_bytes / 1024 / 1024:.1f} MB")
+                image = image.resize(
+                    (max(1, round(image.width * DOWNSCALE_STEP)), max(1, round(image.height * DOWNSCALE_STEP))),
+                    Image.Resampling.LANCZOS
+                )
+                continue
+            break
+
+    if image.size != (info['width'], info['height']):
+        print(f"[PREPROCESS] Scaled {os.path.basename(path)} to {image.width}x{image.height} to fit the budget")
+    os.makedirs(out_dir, exist_ok=True)
+    temp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, out_path)
+    return out_path
+
+
+def _needs_transcode(info, budget_bytes):
+    # PSDs are never re-encoded: that would flatten their layers
+    if info['format'] == 'PSD':
+        return False
+    return info['format'] not in SUPPORTED_FORMATS or bool(budget_bytes and info['bytes'] > budget_bytes)
+
+
+def _check(path, budget_bytes):
+    """Header check of one input: its info if it needs re-encoding, None if not, or the InputError."""
+    try:
+        info = inspect_image(path)
+        if _needs_transcode(info, budget_bytes):
+            return info
+        if info['bytes'] > MAX_INPUT_BYTES:
+            raise InputError(
+                f"{path}: {info['bytes'] / 1024 / 1024:.0f} MB exceeds the "
+                f"{MAX_INPUT_BYTES / 1024 / 1024:.0f} MB limit (set INPUT_BUDGET_MB to re-encode it)"
+            )
+        return None
+    except InputError as e:
+        return e
+
+
+def _transcode_or_error(path, info, budget_bytes):
+    try:
+        return transcode(path, info, budget_bytes)
+    except InputError as e:
+        return e
+    except (OSError, ValueError) as e:
+        return InputError(f"{path}: re-encoding failed ({e})")
+
+
+def prepare_many(paths, budget_bytes=None, workers=None):
+    """
+    Check a list of inputs and re-encode the ones that need it.
+
+    Headers are checked in this process, so bad inputs are reported
+    without waiting on anything else. Inputs to re-encode are spread over
+    a process pool of up to ``workers`` (default PREPROCESS_WORKERS).
+
+    Returns:
+        List with, per input, the path to upload or the InputError it raised
+    """
+    paths = list(paths)
+    if not INPUT_CHECK:
+        return paths
+    if budget_bytes is None:
+        budget_bytes = INPUT_BUDGET_BYTES
+
+    unique = list(dict.fromkeys(paths))
+    outcomes = {}
+    to_transcode = {}
+    for path in unique:
+        checked = _check(path, budget_bytes)
+        if isinstance(checked, dict):
+            to_transcode[path] = checked
+        else:
+            outcomes[path] = checked or path
+
+    workers = min(workers or PREPROCESS_WORKERS, len(to_transcode))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            transcoded = pool.map(_transcode_or_error, to_transcode, to_transcode.values(), repeat(budget_bytes))
+            outcomes.update(zip(to_transcode, transcoded))
+    else:
+        for path, info in to_transcode.items():
+            outcomes[path] = _transcode_or_error(path, info, budget_bytes)
+    return [outcomes[path] for path in paths]
+
+
+def prepare_inputs(paths, budget_bytes=None, workers=None):
+    """
+    Check the inputs of one job and re-encode them if needed.
+
+    Returns:
+        List of paths to upload, in input order
+
+    Raises:
+        InputError: Naming every input that was rejected
+    """
+    prepared = prepare_many(paths, budget_bytes, workers)
+    errors = [str(outcome) for outcome in prepared if isinstance(outcome, InputError)]
+    if errors:
+        raise InputError('; '.join(errors))
+    return prepared
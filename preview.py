@@ -0,0 +1,135 @@
+"""
+Proxy-resolution previews for the executors.
+While iterating on an action JSON, ``--preview`` downsamples the inputs to a
+small long edge before upload and asks for a small JPEG instead of the PSD,
+so each round trip moves a fraction of the data. The parameters of the last
+preview are saved per executor, and ``--final`` later runs the same job once
+at full resolution with the outputs originally asked for.
+"""
+
+import os
+import json
+
+from PIL import Image
+
+import r2_cas
+from preprocess import open_image
+
+PREVIEW_LONG_EDGE = int(os.getenv('PREVIEW_LONG_EDGE', '1024'))
+# Photoshop API JPEG quality (1-12) of preview outputs
+PREVIEW_JPEG_QUALITY = int(os.getenv('PREVIEW_JPEG_QUALITY', '7'))
+PROXY_DIR = os.getenv(
+    'PREVIEW_PROXY_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'fluxa', 'previews')
+)
+STATE_PATH = os.getenv(
+    'PREVIEW_STATE', os.path.join(os.path.expanduser('~'), '.cache', 'fluxa', 'previews.json')
+)
+
+
+def make_proxy(image_path, long_edge=PREVIEW_LONG_EDGE):
+    """
+    Downsampled copy of an image whose longer side is at most ``long_edge``.
+
+    Proxies are cached by input content and edge and keep the input's file
+    name, so iterating re-uses the same proxy (and, with R2 input dedup,
+    the same upload). JPEG inputs are decoded at reduced scale.
+
+    Returns:
+        Path of the proxy, or ``image_path`` itself if it is already small enough
+    """
+    with open_image(image_path) as image:
+        if max(image.size) <= long_edge:
+            return image_path
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        proxy_dir = os.path.join(PROXY_DIR, f"{r2_cas.file_sha256(image_path)[:16]}_{long_edge}")
+        proxy_path = os.path.join(proxy_dir, base_name + ('.png' if has_alpha else '.jpg'))
+        if os.path.exists(proxy_path):
+            return proxy_path
+
+        image.draft('RGB', (long_edge, long_edge))
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.thumbnail((long_edge, long_edge), Image.Resampling.LANCZOS)
+        os.makedirs(proxy_dir, exist_ok=True)
+        temp_path = f"{proxy_path}.{os.getpid()}.tmp"
+        if has_alpha:
+            image.save(temp_path, 'PNG')
+        else:
+            image.save(temp_path, 'JPEG', quality=90)
+        os.replace(temp_path, proxy_path)
+    return proxy_path
+
+
+def preview_renditions():
+    """Outputs requested for a preview: one small JPEG instead of the PSD."""
+    return [{'format': 'jpeg', 'quality': PREVIEW_JPEG_QUALITY}]
+
+
+def preview_output_path(input_image):
+    """Default local path of a preview output."""
+    base_name = os.path.splitext(os.path.basename(input_image))[0]
+    return f"output_images/{base_name}_preview.jpg"
+
+
+def _load_state():
+    try:
+        with open(STATE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_preview(executor, input_images, action_json_file, output_path=None, rendition_specs=(),
+                 optimize=False, long_edge=PREVIEW_LONG_EDGE):
+    """
+    Remember a preview's parameters for ``executor`` ("actions",
+    "photoshop_actions"), so ``--final`` can run it at full resolution.
+
+    ``output_path`` and ``rendition_specs`` are the ones meant for the
+    final run (None and () for the executor's defaults).
+    """
+    state = _load_state()
+    state[executor] = {
+        'input_images': [os.path.abspath(path) for path in input_images],
+        'action_json_file': os.path.abspath(action_json_file),
+        'output_path': output_path and os.path.abspath(output_path),
+        'renditions': list(rendition_specs),
+        'optimize': bool(optimize),
+        'long_edge': long_edge
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(STATE_PATH)), exist_ok=True)
+    temp_path = f"{STATE_PATH}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, STATE_PATH)
+
+
+def load_preview(executor):
+    """Parameters of ``executor``'s last preview, or None if there was none."""
+    return _load_state().get(executor)
+
+
+def split_preview_args(argv):
+    """
+    Pull ``--preview[=LONG_EDGE]`` and ``--final`` out of a raw argument list.
+
+    Returns:
+        Tuple of (remaining_args, long_edge or None, final)
+
+    Raises:
+        ValueError: If the long edge is not a positive integer
+    """
+    remaining, long_edge, final = [], None, False
+    for arg in argv:
+        if arg == '--preview':
+            long_edge = PREVIEW_LONG_EDGE
+        elif arg.startswith('--preview='):
+            value = arg.split('=', 1)[1]
+            if not value.isdigit() or int(value) <= 0:
+                raise ValueError(f"Preview long edge must be a positive number of pixels: {value}")
+            long_edge = int(value)
+        elif arg == '--final':
+            final = True
+        else:
+            remaining.append(arg)
+    return remaining, long_edge, final
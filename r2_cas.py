@@ -0,0 +1,136 @@
+"""
+Content-addressed input storage for R2.
+Inputs are stored under the SHA-256 of their bytes, so an image that was
+already uploaded (for another preset, or by an earlier run) is reused and
+only a fresh presigned GET URL is minted. Objects expire by TTL: a hit on
+an ageing object refreshes it, and a sweep deletes objects nobody used
+within the TTL.
+"""
+
+import os
+import sys
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+
+import r2_transfer
+from r2_cleanup import delete_keys
+
+CAS_PREFIX = 'cas/inputs/'
+INPUT_TTL = timedelta(hours=float(os.getenv('R2_INPUT_TTL_HOURS', '24')))
+PRESIGN_EXPIRATION = 3600
+
+_digest_cache = {}
+_digest_lock = threading.Lock()
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file, memoized by path, size and mtime."""
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        if cache_key in _digest_cache:
+            return _digest_cache[cache_key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+
+    with _digest_lock:
+        _digest_cache[cache_key] = digest.hexdigest()
+    return _digest_cache[cache_key]
+
+
+def cas_key(local_path):
+    """Content-addressed R2 key for a local file; the extension keeps the type visible."""
+    ext = os.path.splitext(local_path)[1].lower()
+    return f"{CAS_PREFIX}{file_sha256(local_path)}{ext}"
+
+
+def _key_lock(key):
+    # Parallel jobs on the same image upload it once instead of racing
+    with _key_locks_lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def ensure_uploaded(s3_client, bucket, local_path, ttl=INPUT_TTL):
+    """
+    Make sure a file's content is stored in R2 under its content hash.
+
+    Returns:
+        Tuple of (object_key, uploaded) where ``uploaded`` is False when an
+        existing object was reused
+    """
+    key = cas_key(local_path)
+    with _key_lock(key):
+        try:
+            head = s3_client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+            head = None
+
+        if head is None:
+            r2_transfer.upload_file(s3_client, bucket, local_path, key)
+            return key, True
+
+        # Refresh objects past half their TTL so a sweep cannot delete an
+        # input that is still in use. A self-copy resets LastModified.
+        if datetime.now(timezone.utc) - head['LastModified'] > ttl / 2:
+            s3_client.copy_object(
+                Bucket=bucket,
+                Key=key,
+                CopySource={'Bucket': bucket, 'Key': key},
+                MetadataDirective='REPLACE',
+                Metadata=head.get('Metadata', {})
+            )
+        return key, False
+
+
+def upload_input(s3_client, bucket, local_path, expiration=PRESIGN_EXPIRATION, ttl=INPUT_TTL):
+    """
+    Upload an input once per content and return a presigned GET URL for it.
+
+    Returns:
+        Tuple of (presigned_url, object_key, uploaded)
+    """
+    key, uploaded = ensure_uploaded(s3_client, bucket, local_path, ttl)
+    url = s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket, 'Key': key},
+        ExpiresIn=expiration
+    )
+    return url, key, uploaded
+
+
+def sweep_expired_inputs(s3_client, bucket, ttl=INPUT_TTL):
+    """Delete content-addressed inputs that were not used within the TTL. Returns the count."""
+    cutoff = datetime.now(timezone.utc) - ttl
+    expired = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=CAS_PREFIX):
+        for obj in page.get('Contents', []):
+            if obj['LastModified'] < cutoff:
+                expired.append(obj['Key'])
+
+    return len(expired) - len(delete_keys(s3_client, bucket, expired))
+
+
+if __name__ == '__main__':
+    import actions
+
+    parser = argparse.ArgumentParser(description="Delete content-addressed inputs older than the TTL")
+    parser.add_argument('--ttl-hours', type=float, default=INPUT_TTL.total_seconds() / 3600)
+    args = parser.parse_args()
+
+    deleted = sweep_expired_inputs(
+        actions.get_r2_client(), actions.R2_BUCKET_NAME, timedelta(hours=args.ttl_hours)
+    )
+    print(f"Deleted {deleted} expired inputs")
+    sys.exit(0)
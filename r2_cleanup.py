@@ -0,0 +1,253 @@
+"""
+Background cleanup of temporary R2 objects.
+Finished jobs hand their temporary input and output keys to a queue that a
+background thread flushes with multi-object DeleteObjects calls (up to 1000
+keys each), so deletes leave the critical path of every job. A sweeper
+removes temp_input_* and output_* objects left behind by runs that crashed
+before cleaning up.
+"""
+
+import os
+import sys
+import time
+import atexit
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+# DeleteObjects accepts at most this many keys per request
+MAX_BATCH = 1000
+# Seconds the flusher waits for more keys before sending a partial batch
+FLUSH_INTERVAL = float(os.getenv('R2_CLEANUP_FLUSH_SECONDS', '0.5'))
+ASYNC_CLEANUP = os.getenv('R2_ASYNC_CLEANUP', '1') not in ('0', 'false', 'no')
+
+TEMP_PREFIXES = ('temp_input_', 'output_')
+STALE_AGE = timedelta(hours=float(os.getenv('R2_TEMP_MAX_AGE_HOURS', '6')))
+
+
+def delete_keys(s3_client, bucket, keys):
+    """
+    Delete keys with as few DeleteObjects requests as possible.
+
+    Returns:
+        List of keys that could not be deleted
+    """
+    failed = []
+    for start in range(0, len(keys), MAX_BATCH):
+        chunk = keys[start:start + MAX_BATCH]
+        try:
+            response = s3_client.delete_objects(
+                Bucket=bucket,
+                Delete={'Objects': [{'Key': key} for key in chunk], 'Quiet': True}
+            )
+        except Exception as e:
+            print(f"  Warning: Could not delete {len(chunk)} objects: {e}")
+            failed.extend(chunk)
+            continue
+        for error in response.get('Errors', []):
+            print(f"  Warning: Could not delete {error.get('Key')}: {error.get('Message')}")
+            failed.append(error.get('Key'))
+    return failed
+
+
+class DeleteQueue:
+    """
+    Thread-safe queue of R2 keys deleted in batches by a background thread.
+
+    A batch is sent as soon as MAX_BATCH keys are waiting, or after
+    ``flush_interval`` seconds otherwise. ``flush`` waits until everything
+    queued so far is deleted; the process-wide queue is flushed at exit.
+    """
+
+    def __init__(self, s3_client, bucket, flush_interval=FLUSH_INTERVAL, batch_size=MAX_BATCH):
+        """
+        Args:
+            s3_client: boto3 S3 client for R2
+            bucket: Bucket the keys live in
+            flush_interval: Seconds to wait for more keys before a partial batch
+            batch_size: Keys per DeleteObjects request (at most MAX_BATCH)
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.flush_interval = flush_interval
+        self.batch_size = min(batch_size, MAX_BATCH)
+        self.stats = {'deleted': 0, 'failed': 0, 'requests': 0}
+        self._pending = []
+        self._in_progress = 0
+        self._urgent = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def enqueue(self, keys):
+        """Queue keys for deletion and return immediately."""
+        keys = [key for key in keys if key]
+        if not keys:
+            return
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("delete queue is closed")
+            self._pending.extend(keys)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='r2-cleanup', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def pending(self):
+        """Number of keys queued or being deleted."""
+        with self._condition:
+            return len(self._pending) + self._in_progress
+
+    def flush(self, timeout=None):
+        """
+        Delete everything queued so far without waiting for a full batch.
+
+        Returns:
+            True if the queue drained within ``timeout`` seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._urgent = True
+            self._condition.notify_all()
+            while self._pending or self._in_progress:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def close(self):
+        """Flush and stop the background thread."""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._urgent = False
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # Give other jobs a moment to add their keys to this batch
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.batch_size and not (self._urgent or self._closed):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._in_progress = len(batch)
+
+            failed = delete_keys(self.s3_client, self.bucket, batch)
+
+            with self._condition:
+                self.stats['requests'] += 1
+                self.stats['deleted'] += len(batch) - len(failed)
+                self.stats['failed'] += len(failed)
+                self._in_progress = 0
+                self._condition.notify_all()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_delete_queue(s3_client, bucket):
+    """Return the process-wide delete queue for ``bucket``, created with ``s3_client`` on first use."""
+    with _queues_lock:
+        if bucket not in _queues:
+            _queues[bucket] = DeleteQueue(s3_client, bucket)
+        return _queues[bucket]
+
+
+def schedule_delete(s3_client, bucket, keys):
+    """
+    Delete temporary keys in the background (or right away with
+    R2_ASYNC_CLEANUP=0).
+    """
+    if ASYNC_CLEANUP:
+        get_delete_queue(s3_client, bucket).enqueue(keys)
+    else:
+        delete_keys(s3_client, bucket, list(keys))
+
+
+@atexit.register
+def flush_all():
+    """Drain every delete queue, so a finishing process leaves no temporary objects behind."""
+    with _queues_lock:
+        queues = list(_queues.values())
+    for queue in queues:
+        queue.flush()
+
+
+def find_stale_objects(s3_client, bucket, max_age=STALE_AGE, prefixes=TEMP_PREFIXES, keep=()):
+    """
+    List temporary objects older than ``max_age``.
+
+    Args:
+        keep: Keys to leave alone even if they are old, e.g. those of
+            jobs the job journal still tracks
+
+    Returns:
+        List of object keys
+    """
+    cutoff = datetime.now(timezone.utc) - max_age
+    keep = set(keep)
+    stale = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for prefix in prefixes:
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if obj['LastModified'] < cutoff and obj['Key'] not in keep:
+                    stale.append(obj['Key'])
+    return stale
+
+
+def sweep_stale_objects(s3_client, bucket, max_age=STALE_AGE, prefixes=TEMP_PREFIXES, keep=()):
+    """Delete temporary objects older than ``max_age``. Returns the number deleted."""
+    stale = find_stale_objects(s3_client, bucket, max_age, prefixes, keep)
+    return len(stale) - len(delete_keys(s3_client, bucket, stale))
+
+
+def journaled_keys():
+    """Temporary keys of jobs the job journal still tracks as in flight."""
+    from job_journal import get_job_journal
+
+    journal = get_job_journal()
+    if journal is None:
+        return set()
+    keys = set()
+    for entry in journal.in_flight():
+        keys.update(entry['job'].get('r2_keys', []))
+        keys.update(entry['job'].get('output_keys', []))
+    return keys
+
+
+if __name__ == '__main__':
+    import actions
+
+    parser = argparse.ArgumentParser(
+        description="Delete temporary R2 objects (temp_input_*, output_*) left behind by crashed runs"
+    )
+    parser.add_argument('--max-age-hours', type=float, default=STALE_AGE.total_seconds() / 3600,
+                        help="Only delete objects older than this")
+    parser.add_argument('--dry-run', action='store_true', help="List stale objects without deleting them")
+    args = parser.parse_args()
+
+    client = actions.get_r2_client()
+    max_age = timedelta(hours=args.max_age_hours)
+    if args.dry_run:
+        stale = find_stale_objects(client, actions.R2_BUCKET_NAME, max_age, keep=journaled_keys())
+        for key in stale:
+            print(key)
+        print(f"{len(stale)} stale temporary objects")
+    else:
+        deleted = sweep_stale_objects(client, actions.R2_BUCKET_NAME, max_age, keep=journaled_keys())
+        print(f"Deleted {deleted} stale temporary objects")
+    sys.exit(0)
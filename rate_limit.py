@@ -0,0 +1,385 @@
+"""
+Throttling for Adobe API calls.
+A process-wide token bucket per service (Photoshop API, IMS) spaces out
+requests and pauses every caller when a 429 arrives, for as long as its
+Retry-After asks. An AIMD controller sizes the number of jobs in flight:
+it grows while latency and error rate stay healthy and shrinks on 429s,
+errors or latency inflation, so batches settle near the highest throughput
+the API accepts without hand-tuned worker counts.
+"""
+
+import os
+import time
+import asyncio
+import collections
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+# Requests per second and burst size per service; a rate of 0 disables the limiter
+RATES = {
+    'photoshop': (float(os.getenv('ADOBE_RATE_LIMIT', '20')), int(os.getenv('ADOBE_RATE_BURST', '40'))),
+    'ims': (float(os.getenv('IMS_RATE_LIMIT', '5')), int(os.getenv('IMS_RATE_BURST', '5'))),
+}
+# Times a throttled (429) request is re-sent after waiting out its Retry-After
+THROTTLE_RETRIES = int(os.getenv('ADOBE_THROTTLE_RETRIES', '5'))
+# Pause applied on a 429 without a Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+ADAPTIVE_CONCURRENCY = os.getenv('ADAPTIVE_CONCURRENCY', '1') not in ('0', 'false', 'no')
+# In-flight limit an adaptive batch starts at before slow start raises it
+ADAPTIVE_INITIAL = int(os.getenv('ADAPTIVE_INITIAL_CONCURRENCY', '4'))
+
+
+def retry_after_seconds(response):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by threads and event loops.
+
+    Each request reserves a token; when the bucket is empty the caller
+    sleeps until its token is due, so waiting callers are served in order.
+    ``throttle`` empties the bucket, blocks everyone until a server's
+    Retry-After has passed and lowers the rate; every successful request
+    (``recover``) wins back a little of it, up to the configured rate.
+    """
+
+    # Rate multiplier applied on each 429
+    THROTTLE_FACTOR = 0.75
+    # Lowest fraction of the configured rate that throttling can drop to
+    MIN_RATE_FRACTION = 0.05
+    # Fraction of the configured rate regained per successful request
+    RECOVERY_FRACTION = 0.05
+
+    def __init__(self, rate, burst=1):
+        """
+        Args:
+            rate: Tokens added per second (0 or less: unlimited)
+            burst: Bucket capacity, i.e. requests allowed back to back
+        """
+        self.rate = rate
+        self.max_rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token and return how long the caller has to wait for it."""
+        now = time.monotonic()
+        with self._lock:
+            wait = max(0.0, self._blocked_until - now)
+            if self.rate <= 0:
+                return wait
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def acquire(self):
+        """Block until a request may be sent. Returns the seconds waited."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        """Wait on the event loop until a request may be sent. Returns the seconds waited."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def throttle(self, retry_after=None):
+        """Hold back every caller for ``retry_after`` seconds after a 429."""
+        if retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self._tokens = min(self._tokens, 0.0)
+            if self.max_rate > 0:
+                self.rate = max(self.max_rate * self.MIN_RATE_FRACTION, self.rate * self.THROTTLE_FACTOR)
+
+    def recover(self):
+        """Raise a throttled rate back towards the configured one after a success."""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.RECOVERY_FRACTION)
+
+
+class AIMDController:
+    """
+    Additive-increase/multiplicative-decrease limit on concurrent jobs.
+
+    Callers hold a slot per job (``acquire``/``release``). Request outcomes
+    are fed in with ``record``; once per window (one sample per slot, at
+    least ``min_window``) the limit is adjusted:
+
+    - healthy window (error rate and median latency within bounds): the
+      limit doubles while still in slow start, then grows by ``increase``
+    - unhealthy window: the limit is multiplied by ``decrease``
+    - a 429 decreases the limit at once (at most once per ``cooldown``)
+
+    The latency baseline is the lowest window median seen so far.
+    """
+
+    def __init__(self, initial=ADAPTIVE_INITIAL, minimum=1, maximum=64, increase=1, decrease=0.5,
+                 latency_tolerance=2.0, error_threshold=0.05, min_window=10, cooldown=1.0,
+                 adaptive=True):
+        """
+        Args:
+            initial: Starting limit
+            minimum: Lowest limit
+            maximum: Highest limit
+            increase: Slots added after a healthy window (after slow start)
+            decrease: Factor applied to the limit after an unhealthy window or a 429
+            latency_tolerance: Window median latency above baseline times this is unhealthy
+            error_threshold: Window error rate above this is unhealthy
+            min_window: Fewest samples per window
+            cooldown: Seconds between two decreases
+            adaptive: If False, the limit stays at ``initial``
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.error_threshold = error_threshold
+        self.min_window = min_window
+        self.cooldown = cooldown
+        self.adaptive = adaptive
+        self._limit = float(min(self.maximum, max(self.minimum, initial)))
+        self._slow_start = True
+        self._active = 0
+        self._latencies = []
+        self._errors = 0
+        self._baseline = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        # (loop, future) per coroutine waiting in acquire_async
+        self._async_waiters = collections.deque()
+        self.stats = {'peak': int(self._limit), 'increases': 0, 'decreases': 0, 'throttled': 0}
+
+    @property
+    def limit(self):
+        """Current number of slots."""
+        return int(self._limit)
+
+    @property
+    def active(self):
+        """Slots currently held."""
+        return self._active
+
+    def try_acquire(self):
+        """Take a slot if one is free."""
+        with self._condition:
+            if self._active >= int(self._limit):
+                return False
+            self._active += 1
+            return True
+
+    def acquire(self):
+        """Block until a slot is free and take it."""
+        with self._condition:
+            while self._active >= int(self._limit):
+                self._condition.wait()
+            self._active += 1
+
+    async def acquire_async(self):
+        """Wait on the event loop until a slot is free and take it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._active < int(self._limit):
+                    self._active += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._condition:
+                    try:
+                        self._async_waiters.remove((loop, waiter))
+                    except ValueError:
+                        # Already woken by release(): hand the free slot on
+                        self._wake_async(1)
+                raise
+
+    def _wake_async(self, count=None):
+        """Wake ``count`` (default: all) acquire_async waiters; call with the condition held."""
+        while self._async_waiters and (count is None or count > 0):
+            loop, waiter = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_resolve, waiter)
+            if count is not None:
+                count -= 1
+
+    def release(self):
+        """Give a slot back."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+            self._wake_async(1)
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record(self, latency, ok=True, throttled=False):
+        """
+        Feed in the outcome of one request.
+
+        Args:
+            latency: Request wall time in seconds
+            ok: False for failed requests (5xx, connection errors)
+            throttled: True for a 429
+        """
+        if not self.adaptive:
+            return
+        with self._condition:
+            if throttled:
+                self.stats['throttled'] += 1
+                self._decrease()
+                return
+            self._latencies.append(latency)
+            if not ok:
+                self._errors += 1
+            if len(self._latencies) < max(self.min_window, int(self._limit)):
+                return
+
+            window = sorted(self._latencies)
+            median = window[len(window) // 2]
+            error_rate = self._errors / len(window)
+            self._latencies = []
+            self._errors = 0
+            if self._baseline is None or median < self._baseline:
+                self._baseline = median
+
+            if error_rate > self.error_threshold or median > self._baseline * self.latency_tolerance:
+                self._decrease()
+            elif self._limit < self.maximum:
+                self._limit = min(self.maximum, self._limit * 2 if self._slow_start else self._limit + self.increase)
+                self.stats['increases'] += 1
+                self.stats['peak'] = max(self.stats['peak'], int(self._limit))
+                self._condition.notify_all()
+                self._wake_async()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._slow_start = False
+        self._limit = max(self.minimum, self._limit * self.decrease)
+        self.stats['decreases'] += 1
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_buckets = {}
+_controllers = []
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiter(service='photoshop'):
+    """Return the process-wide token bucket for ``service`` ("photoshop" or "ims")."""
+    with _registry_lock:
+        if service not in _buckets:
+            rate, burst = RATES[service]
+            _buckets[service] = TokenBucket(rate, burst)
+        return _buckets[service]
+
+
+def observe(service, status_code, latency, retry_after=None):
+    """
+    Report the outcome of an Adobe API request.
+
+    A 429 throttles the service's bucket and a success lets it recover;
+    every outcome feeds the attached concurrency controllers. ``status_code`` is None for connection errors.
+    """
+    throttled = status_code == 429
+    ok = status_code is not None and status_code < 500
+    if throttled:
+        get_rate_limiter(service).throttle(retry_after)
+    elif ok:
+        get_rate_limiter(service).recover()
+    with _registry_lock:
+        controllers = list(_controllers)
+    for controller in controllers:
+        controller.record(latency, ok=ok, throttled=throttled)
+
+
+@contextmanager
+def adaptive_concurrency(maximum, minimum=1):
+    """
+    Create an AIMDController fed by every observed Adobe request while the
+    block runs.
+
+    It starts at ADAPTIVE_INITIAL (or ``maximum`` if that is lower) and
+    slow start doubles the limit after each healthy window, so a batch
+    does not open with a burst the API may throttle; 429s, errors or
+    latency inflation back it off, and it probes upwards again once
+    requests are healthy. With ADAPTIVE_CONCURRENCY=0 it stays at ``maximum``.
+    """
+    initial = min(maximum, ADAPTIVE_INITIAL) if ADAPTIVE_CONCURRENCY else maximum
+    controller = AIMDController(initial=initial, minimum=minimum, maximum=maximum,
+                                adaptive=ADAPTIVE_CONCURRENCY)
+    if not ADAPTIVE_CONCURRENCY:
+        yield controller
+        return
+    with _registry_lock:
+        _controllers.append(controller)
+    try:
+        yield controller
+    finally:
+        with _registry_lock:
+            _controllers.remove(controller)
+
+
+def limited_request(session, method, url, service='photoshop', retries=THROTTLE_RETRIES, **kwargs):
+    """
+    Send a request through the service's rate limiter.
+
+    429 responses are re-sent (up to ``retries`` times) once the bucket's
+    Retry-After pause has passed; the server did not accept the request, so
+    this is safe even for job submissions.
+
+    Returns:
+        The last response
+    """
+    bucket = get_rate_limiter(service)
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except Exception:
+            observe(service, None, time.perf_counter() - started)
+            raise
+        observe(service, response.status_code, time.perf_counter() - started, retry_after_seconds(response))
+        if response.status_code != 429 or attempt == retries:
+            return response
+        response.close()
@@ -0,0 +1,154 @@
+"""
+Output renditions for Photoshop API jobs.
+A job can ask for several outputs at once, e.g. the layered PSD plus a web
+JPEG at a chosen quality and width. Each rendition gets its own storage
+key and local path, so callers that only need a small JPEG can request and
+download just that instead of the full PSD.
+"""
+
+import os
+
+PSD_TYPE = 'image/vnd.adobe.photoshop'
+
+# format name -> (media type, file extension)
+FORMATS = {
+    'psd': (PSD_TYPE, '.psd'),
+    'jpeg': ('image/jpeg', '.jpg'),
+    'png': ('image/png', '.png'),
+    'tiff': ('image/tiff', '.tif'),
+}
+FORMAT_ALIASES = {'jpg': 'jpeg', 'tif': 'tiff'}
+PNG_COMPRESSION = ('small', 'medium', 'large')
+JPEG_QUALITY_RANGE = (1, 12)
+
+DEFAULT_RENDITIONS = ({'format': 'psd'},)
+
+
+def parse_rendition(spec):
+    """
+    Parse a rendition spec such as ``psd``, ``jpeg:quality=8,width=2048`` or
+    ``png:compression=small``.
+
+    Returns:
+        Rendition dict with "format" and any of "quality", "width", "compression"
+
+    Raises:
+        ValueError: If the format or an option is not supported
+    """
+    name, _, options = spec.strip().partition(':')
+    name = FORMAT_ALIASES.get(name.lower(), name.lower())
+    if name not in FORMATS:
+        raise ValueError(f"Unsupported output format: {name} (use one of {', '.join(FORMATS)})")
+
+    rendition = {'format': name}
+    for option in filter(None, (part.strip() for part in options.split(','))):
+        key, _, value = option.partition('=')
+        key = key.strip().lower()
+        value = value.strip()
+        if key == 'quality' and name == 'jpeg':
+            quality = int(value)
+            low, high = JPEG_QUALITY_RANGE
+            if not low <= quality <= high:
+                raise ValueError(f"JPEG quality must be between {low} and {high}: {quality}")
+            rendition['quality'] = quality
+        elif key == 'width':
+            width = int(value)
+            if width <= 0:
+                raise ValueError(f"Width must be positive: {width}")
+            rendition['width'] = width
+        elif key == 'compression' and name == 'png':
+            if value not in PNG_COMPRESSION:
+                raise ValueError(f"PNG compression must be one of {', '.join(PNG_COMPRESSION)}: {value}")
+            rendition['compression'] = value
+        else:
+            raise ValueError(f"Unsupported option for {name}: {option}")
+    return rendition
+
+
+def parse_renditions(specs):
+    """Parse a list of rendition specs; an empty list means the default PSD output."""
+    if not specs:
+        return [dict(rendition) for rendition in DEFAULT_RENDITIONS]
+    return [parse_rendition(spec) if isinstance(spec, str) else spec for spec in specs]
+
+
+def media_type(rendition):
+    """Media type the Photoshop API expects in ``outputs[].type``."""
+    return FORMATS[rendition['format']][0]
+
+
+def extension(rendition):
+    """File extension for a rendition, including the dot."""
+    return FORMATS[rendition['format']][1]
+
+
+def rendition_id(rendition):
+    """
+    Stable identifier of a rendition, used in result cache keys.
+
+    A plain PSD maps to its media type so cache entries from before
+    renditions existed stay valid.
+    """
+    options = ';'.join(f"{key}={rendition[key]}" for key in sorted(rendition) if key != 'format')
+    return f"{media_type(rendition)};{options}" if options else media_type(rendition)
+
+
+def output_spec(rendition, href, storage='external'):
+    """Entry for the request's ``outputs`` array."""
+    spec = {'storage': storage, 'type': media_type(rendition), 'href': href}
+    for key in ('quality', 'width', 'compression'):
+        if key in rendition:
+            spec[key] = rendition[key]
+    return spec
+
+
+def rendition_suffix(renditions, index):
+    """
+    Name suffix that keeps renditions sharing an extension apart.
+
+    The first rendition of each extension gets no suffix; later ones are
+    told apart by width, or by position when the width is the same.
+    """
+    rendition = renditions[index]
+    ext = extension(rendition)
+    earlier = [r for r in renditions[:index] if extension(r) == ext]
+    if not earlier:
+        return ''
+    if 'width' in rendition and all(r.get('width') != rendition['width'] for r in earlier):
+        return f"_{rendition['width']}w"
+    return f"_{index + 1}"
+
+
+def rendition_paths(output_path, renditions):
+    """
+    Local paths for each rendition of a job.
+
+    A single rendition is written to ``output_path`` as given; with several,
+    each gets ``output_path``'s base name plus its own extension.
+    """
+    if len(renditions) == 1:
+        return [output_path]
+    base = os.path.splitext(output_path)[0]
+    return [
+        f"{base}{rendition_suffix(renditions, idx)}{extension(rendition)}"
+        for idx, rendition in enumerate(renditions)
+    ]
+
+
+def split_rendition_args(argv):
+    """
+    Pull repeatable ``--rendition SPEC`` options out of a raw argument list.
+
+    Returns:
+        Tuple of (remaining_args, rendition_specs)
+    """
+    remaining, specs = [], []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--rendition':
+            specs.append(next(args, ''))
+        elif arg.startswith('--rendition='):
+            specs.append(arg.split('=', 1)[1])
+        else:
+            remaining.append(arg)
+    return remaining, specs
@@ -0,0 +1,167 @@
+"""
+Local result cache for executor outputs, optionally backed by R2.
+Results are keyed on the content hash of every input image plus a hash of
+the canonicalized action JSON, so re-running a preset on the same image
+returns the stored output without uploading, submitting or polling.
+The local cache is size-bounded with least-recently-used eviction.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+from botocore.exceptions import ClientError
+
+import r2_cas
+import r2_transfer
+from renditions import PSD_TYPE
+
+CACHE_DIR = os.getenv(
+    'RESULT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'fluxa', 'results')
+)
+CACHE_MAX_BYTES = int(float(os.getenv('RESULT_CACHE_MAX_MB', '4096')) * 1024 * 1024)
+R2_PREFIX = 'cache/results/'
+
+
+def canonical_action_hash(action_json):
+    """Hash of an action list that ignores key order and whitespace."""
+    canonical = json.dumps(action_json, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def result_key(input_images, action_json, output_type=PSD_TYPE):
+    """Cache key for running ``action_json`` on ``input_images`` (order matters)."""
+    parts = [r2_cas.file_sha256(path) for path in input_images]
+    parts.append(canonical_action_hash(action_json))
+    parts.append(output_type)
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of job outputs on local disk.
+
+    Recency is tracked with each entry's mtime, which is bumped on every
+    hit, so the cache needs no index file and survives across processes.
+    When an R2 client is given, misses fall through to R2 and stores are
+    copied there too, sharing results between machines.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, r2_client=None, bucket=None):
+        """
+        Args:
+            cache_dir: Directory for cached outputs
+            max_bytes: Total size above which least recently used entries are evicted
+            r2_client: Optional boto3 S3 client for the shared R2 tier
+            bucket: R2 bucket name (required with r2_client)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.r2_client = r2_client
+        self.bucket = bucket
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key, dest_path):
+        """
+        Copy a cached output to ``dest_path``.
+
+        Returns:
+            True on a hit, False on a miss
+        """
+        entry = self._entry_path(key)
+        if not os.path.exists(entry) and not self._fetch_from_r2(key, entry):
+            return False
+
+        try:
+            os.utime(entry)
+            os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+            shutil.copyfile(entry, dest_path)
+        except FileNotFoundError:
+            # Evicted by another process between the check and the copy
+            return False
+        return True
+
+    def put(self, key, src_path):
+        """Store an output file under ``key`` and evict old entries if over budget."""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_path = f'{entry}.{os.getpid()}.{threading.get_ident()}.tmp'
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, entry)
+
+        if self.r2_client is not None:
+            r2_transfer.upload_file(self.r2_client, self.bucket, entry, f'{R2_PREFIX}{key}')
+
+        self.evict()
+
+    def _fetch_from_r2(self, key, entry):
+        if self.r2_client is None:
+            return False
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        try:
+            r2_transfer.download_file(self.r2_client, self.bucket, f'{R2_PREFIX}{key}', entry)
+        except ClientError:
+            return False
+        self.evict()
+        return True
+
+    def size(self):
+        """Total bytes currently held in the local cache."""
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache(r2_client=None, bucket=None):
+    """
+    Return the process-wide result cache, or None when RESULT_CACHE=0.
+
+    The R2 tier is only used when RESULT_CACHE_R2=1 and a client is given.
+    """
+    global _cache
+    if os.getenv('RESULT_CACHE', '1') in ('0', 'false', 'no'):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            use_r2 = os.getenv('RESULT_CACHE_R2', '0') in ('1', 'true', 'yes') and r2_client is not None
+            _cache = ResultCache(
+                r2_client=r2_client if use_r2 else None,
+                bucket=bucket if use_r2 else None
+            )
+        return _cache
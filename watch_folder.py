@@ -0,0 +1,365 @@
+"""
+Watch-folder daemon for actions.py.
+Runs the given presets on every image dropped into a folder, in one
+long-running process. New files are picked up through Linux inotify (with a
+polling fallback elsewhere) and submitted as soon as they are completely
+written. One R2 client, the HTTP pools and the IMS token stay warm between
+jobs, so an image does not pay for interpreter startup, imports, a token
+fetch and a new boto3 client.
+"""
+
+import os
+import sys
+import time
+import select
+import signal
+import struct
+import argparse
+import threading
+import ctypes
+import ctypes.util
+from collections import deque
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import actions
+import renditions as rend
+from batch_actions import IMAGE_EXTENSIONS, build_jobs, expand_action_files
+from ims_token import get_token_provider
+
+# A file is processed once it has not changed for this long
+WATCH_SETTLE_SECONDS = float(os.getenv('WATCH_SETTLE_SECONDS', '1.0'))
+# ... or, for a JPEG or PNG without its end marker, for this long
+WATCH_INCOMPLETE_SECONDS = float(os.getenv('WATCH_INCOMPLETE_SECONDS', '30'))
+WATCH_POLL_INTERVAL = float(os.getenv('WATCH_POLL_INTERVAL', '1.0'))
+# How often the token warmer checks the access token's expiry
+TOKEN_CHECK_INTERVAL = float(os.getenv('WATCH_TOKEN_CHECK_INTERVAL', '60'))
+
+# Names of files that are still being written by common tools
+PARTIAL_SUFFIXES = ('.part', '.partial', '.tmp', '.crdownload', '.download', '~')
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class InotifyEvents:
+    """File events of one directory from Linux inotify, through ctypes."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1: {os.strerror(err)}")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch {directory}: {os.strerror(err)}")
+        self.directory = directory
+
+    def read(self, timeout):
+        """
+        Wait up to ``timeout`` seconds for events.
+
+        Returns:
+            List of (file name, closed) pairs, where closed means the file was
+            closed after writing or moved into the directory. A None name
+            means events were lost and the directory should be rescanned.
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, mask, _, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, False))
+            elif name:
+                events.append((os.fsdecode(name), bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO))))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingEvents:
+    """The same events as InotifyEvents, from rescanning the directory."""
+
+    def __init__(self, directory, interval=WATCH_POLL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._stamps = scan_directory(directory)
+
+    def read(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        stamps = scan_directory(self.directory)
+        changed = [(name, False) for name, stamp in stamps.items() if self._stamps.get(name) != stamp]
+        self._stamps = stamps
+        return changed
+
+    def close(self):
+        pass
+
+
+def scan_directory(directory):
+    """Map the file names in a directory to their (size, mtime) stamps."""
+    stamps = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    stamps[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+    return stamps
+
+
+def open_events(directory, poll=False):
+    """inotify events for ``directory``, or polling where inotify is unavailable."""
+    if not poll:
+        try:
+            return InotifyEvents(directory)
+        except (OSError, AttributeError) as e:
+            print(f"[WATCH] inotify unavailable ({e}); polling every {WATCH_POLL_INTERVAL}s")
+    return PollingEvents(directory)
+
+
+def is_candidate(name):
+    """Whether a file name looks like a finished input image."""
+    lower = name.lower()
+    return not name.startswith('.') and not lower.endswith(PARTIAL_SUFFIXES) and lower.endswith(IMAGE_EXTENSIONS)
+
+
+def looks_complete(path):
+    """
+    Whether a JPEG or PNG ends with its end marker, i.e. its writer is not
+    just pausing half way. Other formats have no trailer and always pass.
+    """
+    lower = path.lower()
+    if not lower.endswith(('.jpg', '.jpeg', '.png')):
+        return True
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 64))
+            tail = f.read()
+    except OSError:
+        return False
+    return (b'IEND' if lower.endswith('.png') else b'\xff\xd9') in tail
+
+
+def keep_token_warm(provider, stop, interval=TOKEN_CHECK_INTERVAL):
+    """
+    Refresh the access token in the background before it gets close to
+    expiry, so jobs never wait for IMS. Runs until ``stop`` is set.
+    """
+    while not stop.wait(interval):
+        if provider.expires_in() < provider.refresh_margin + 2 * interval:
+            if provider.get(force_refresh=True):
+                print("[WATCH] Refreshed access token")
+            else:
+                print("Warning: Failed to refresh access token")
+
+
+class FolderWatcher:
+    """
+    Feeds the images landing in a directory to a bounded thread pool.
+
+    A file is ready once it has been unchanged for ``settle`` seconds and,
+    with inotify, its writer closed it or it was moved in, so partially
+    written files are not submitted. JPEGs and PNGs must also end with their
+    end marker, unless they stay unchanged for WATCH_INCOMPLETE_SECONDS.
+
+    ``make_jobs(path)`` turns a ready file into jobs (callables returning
+    True on success), which run on at most ``workers`` threads; jobs beyond
+    that wait in a queue. A file is processed again only if it changes.
+    """
+
+    def __init__(self, directory, make_jobs, workers=4, settle=WATCH_SETTLE_SECONDS, poll=False,
+                 existing=False):
+        self.directory = directory
+        self.make_jobs = make_jobs
+        self.workers = workers
+        self.settle = settle
+        self.events = open_events(directory, poll)
+        self.requires_close = isinstance(self.events, InotifyEvents)
+        self.pending = {}
+        self.ready = deque()
+        self.done = {}
+        self.slots = threading.BoundedSemaphore(workers)
+        self.counts = {'succeeded': 0, 'failed': 0}
+        self._counts_lock = threading.Lock()
+        stamps = scan_directory(directory)
+        if existing:
+            self._note(stamps, closed=True)
+        else:
+            self.done.update(stamps)
+
+    def _note(self, names, closed):
+        now = time.monotonic()
+        for name in names:
+            if not is_candidate(name):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                self.pending.pop(name, None)
+                continue
+            self.pending[name] = {'stamp': (stat.st_size, stat.st_mtime_ns), 'changed': now, 'closed': closed}
+
+    def _settle(self):
+        """Move files that stopped changing from pending to the ready queue."""
+        now = time.monotonic()
+        for name, entry in list(self.pending.items()):
+            if now - entry['changed'] < self.settle or (self.requires_close and not entry['closed']):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                del self.pending[name]
+                continue
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            if stamp != entry['stamp']:
+                entry.update(stamp=stamp, changed=now)
+                continue
+            if now - entry['changed'] < WATCH_INCOMPLETE_SECONDS and \
+                    not looks_complete(os.path.join(self.directory, name)):
+                continue
+            del self.pending[name]
+            if stat.st_size and self.done.get(name) != stamp:
+                self.done[name] = stamp
+                print(f"[WATCH] New image: {name}")
+                self.ready.extend((name, job) for job in self.make_jobs(os.path.join(self.directory, name)))
+
+    def _run_one(self, name, job):
+        try:
+            ok = job()
+        except Exception as e:
+            print(f"Error: {name}: {e}")
+            ok = False
+        finally:
+            self.slots.release()
+        with self._counts_lock:
+            self.counts['succeeded' if ok else 'failed'] += 1
+
+    def run(self, stop):
+        """Watch until ``stop`` is set, then wait for the jobs in flight."""
+        mode = 'inotify' if self.requires_close else 'polling'
+        print(f"[WATCH] Watching {self.directory} ({mode}, {self.workers} workers)")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='watch') as pool:
+            try:
+                while not stop.is_set():
+                    timeout = 0.05 if self.ready else min(0.25, self.settle or 0.25)
+                    events = self.events.read(timeout)
+                    if any(name is None for name, _ in events):
+                        self._note(scan_directory(self.directory), closed=True)
+                    for name, closed in events:
+                        if name is not None:
+                            self._note([name], closed)
+                    self._settle()
+                    while self.ready and self.slots.acquire(blocking=False):
+                        pool.submit(self._run_one, *self.ready.popleft())
+            finally:
+                self.events.close()
+                if self.ready:
+                    print(f"[WATCH] Stopping; {len(self.ready)} queued jobs were not started")
+                print("[WATCH] Waiting for jobs in flight...")
+        return self.counts
+
+
+def make_job_factory(action_files, output_dir='output_images', optimize=None, renditions=None):
+    """
+    Build the jobs for an image: one per preset in ``action_files``, run
+    through actions.py with one R2 client shared by all jobs.
+
+    Returns:
+        Function of an image path that returns its list of jobs
+    """
+    r2_client = actions.get_r2_client()
+
+    def run_job(job):
+        timings = {}
+        started = time.perf_counter()
+        result = actions.process_with_actionjson(
+            job['inputs'], job['action'], job['output'], r2_client=r2_client,
+            timings=timings, optimize=optimize, renditions=job['renditions']
+        )
+        stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+        print(f"[WATCH] {'done' if result else 'failed'}: {os.path.basename(job['inputs'][0])} x "
+              f"{os.path.basename(job['action'])} in {time.perf_counter() - started:.2f}s ({stages})")
+        return bool(result)
+
+    def make_jobs(image_path):
+        return [partial(run_job, job) for job in build_jobs([image_path], action_files, output_dir, renditions)]
+
+    return make_jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run presets on every image dropped into a folder")
+    parser.add_argument('directory', help="Folder to watch, e.g. input_images")
+    parser.add_argument('--actions', nargs='+', required=True,
+                        help="Action JSON files or directories of them")
+    parser.add_argument('--output-dir', default='output_images', help="Output directory")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Maximum concurrent jobs, one per image and preset (default: 4)")
+    parser.add_argument('--settle', type=float, default=WATCH_SETTLE_SECONDS,
+                        help="Seconds a file must stay unchanged before it is processed")
+    parser.add_argument('--poll', action='store_true', help="Poll the folder instead of using inotify")
+    parser.add_argument('--existing', action='store_true',
+                        help="Also process the images already in the folder at startup")
+    parser.add_argument('--optimize', action='store_true',
+                        help="Remove or merge redundant action steps before submitting")
+    parser.add_argument('--rendition', dest='renditions', action='append', default=[], metavar='SPEC',
+                        help="Output to request, repeatable: psd, jpeg:quality=8,width=2048, "
+                             "png:compression=small (default: psd)")
+    args = parser.parse_args(argv)
+
+    try:
+        renditions = rend.parse_renditions(args.renditions) if args.renditions else None
+    except ValueError as e:
+        parser.error(str(e))
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+    action_files = expand_action_files(args.actions)
+    if not action_files:
+        parser.error("no action files found")
+
+    # Warm up everything jobs share before the first image lands
+    provider = get_token_provider(actions.CLIENT_ID, actions.CLIENT_SECRET)
+    if not provider.get():
+        print("Error: Failed to get access token")
+        return 1
+    make_jobs = make_job_factory(action_files, args.output_dir, True if args.optimize else None, renditions)
+    watcher = FolderWatcher(args.directory, make_jobs, args.workers, args.settle, args.poll, args.existing)
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    threading.Thread(target=keep_token_warm, args=(provider, stop), name='token-warmer', daemon=True).start()
+
+    counts = watcher.run(stop)
+    print(f"[WATCH] Stopped: {counts['succeeded']} jobs succeeded, {counts['failed']} failed")
+    return 0 if counts['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())